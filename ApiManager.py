@@ -1,59 +1,180 @@
 import asyncio
 import logging
-from tkinter import messagebox
+import threading
+import time
 
 import aiohttp
 
+from AppCatalog import CatalogBuilder
+from AppClassifier import classify
+from AppListCache import AppListCache
+from AppListParser import AppListStreamParser
+from Metrics import metrics
+
+
+def _run_inline(callback):
+    callback()
+
 
 class ApiManager:
-    def __init__(self, api_url="https://api.steampowered.com/ISteamApps/GetAppList/v2/"):
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, api_url="https://api.steampowered.com/ISteamApps/GetAppList/v2/", cache=None,
+                 cache_ttl=AppListCache.DEFAULT_TTL, dispatch=_run_inline):
+        """
+        Args:
+            api_url (str): The GetAppList endpoint.
+            cache (AppListCache): The on-disk app list cache; a default one is created when omitted.
+            cache_ttl (int): Seconds a cached list is served before it is revalidated.
+            dispatch (callable): Runs a callback on the UI thread; results of background work go through it.
+        """
         self.api_url = api_url
+        self.cache = cache if cache is not None else AppListCache(ttl=cache_ttl)
+        self.dispatch = dispatch
+        self._session = None
 
-    async def fetch_data(self):
-        connector = aiohttp.TCPConnector(limit=10)  # Connection pooling
-        timeout = aiohttp.ClientTimeout(total=60)  # Timeout for requests
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            try:
-                async with session.get(self.api_url) as response:
+        # A long-lived event loop thread owns the HTTP session; callers submit coroutines to it
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="api-loop", daemon=True)
+        self._loop_thread.start()
+
+    def submit(self, coro):
+        """
+        Schedule a coroutine on the API event loop thread.
+        Returns:
+            concurrent.futures.Future: The coroutine's result.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def close(self):
+        """Close the HTTP session and stop the event loop thread."""
+        if self._loop.is_closed():
+            return
+        if self._session is not None:
+            self.submit(self._session.close()).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join(timeout=5)
+        self._loop.close()
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=10)  # Connection pooling
+            timeout = aiohttp.ClientTimeout(total=60)  # Timeout for requests
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    async def fetch_apps(self, conditional=False):
+        """
+        Download the app list, parsing `applist.apps` incrementally as the body arrives and adding
+        each app to a CatalogBuilder straight away, so the list never exists as Python objects.
+        Args:
+            conditional (bool): Send the cached ETag/Last-Modified validators with the request.
+        Returns:
+            tuple: (builder, headers); builder is a CatalogBuilder holding every app, or None when the
+            server answered 304 Not Modified.
+        """
+        headers = self.cache.validators() if conditional else {}
+        session = await self._get_session()
+        try:
+            with metrics.span("api.fetch"):
+                async with session.get(self.api_url, headers=headers) as response:
+                    if response.status == 304:
+                        metrics.inc("api.not_modified")
+                        return None, response.headers
                     response.raise_for_status()
-                    return await response.json()
-            except aiohttp.ClientError as e:
-                logging.error(f"Failed to fetch data: {e}")
-                raise Exception("Failed to fetch data due to network issues")
+                    parser = AppListStreamParser()
+                    builder = CatalogBuilder()
+                    parse_seconds = 0.0
+                    async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                        metrics.inc("api.bytes_downloaded", len(chunk))
+                        started = time.perf_counter()
+                        for name, appid in parser.feed(chunk):
+                            builder.add(name, appid)
+                        parse_seconds += time.perf_counter() - started
+                    for name, appid in parser.close():
+                        builder.add(name, appid)
+                    # Decoding overlaps the download; this is the share of api.fetch spent parsing and storing
+                    metrics.observe("api.parse", parse_seconds)
+                    return builder, response.headers
+        except aiohttp.ClientError as e:
+            logging.error(f"Failed to fetch data: {e}")
+            raise Exception("Failed to fetch data due to network issues")
 
-    async def get_dedicated_servers(self, app_ids, update_server_listbox):
+    async def get_dedicated_servers(self, on_catalog, on_error=None):
+        """
+        Revalidate the server list against the API and publish any change through `dispatch`.
+        Args:
+            on_catalog (callable): Called on the UI thread with the new AppCatalog.
+            on_error (callable): Called on the UI thread with an error message if no list could be loaded.
+        """
+        loop = asyncio.get_running_loop()
         try:
-            data = await self.fetch_data()
-            apps = data["applist"]["apps"]
+            try:
+                builder, headers = await self.fetch_apps(conditional=self.cache.exists())
+            except Exception as e:
+                cached = await loop.run_in_executor(None, self.cache.load)
+                if cached is None:
+                    raise
+                logging.warning(f"Using the cached server list, the Steam API is unreachable: {e}")
+                self.dispatch(lambda: on_catalog(cached))
+                return
 
-            # Efficient filtering and sorting
-            dedicated_servers = (
-                (app["name"], app["appid"]) for app in apps if "" in app["name"].lower()
-            )
-            sorted_servers = sorted(dedicated_servers, key=lambda x: x[0].lower())
+            if builder is None:
+                logging.info("Cached server list is up to date.")
+                self.cache.touch()
+                return
 
-            # Batch update app_ids
-            app_ids.update({name: appid for name, appid in sorted_servers})
+            with metrics.span("catalog.build"):
+                catalog = await loop.run_in_executor(None, builder.finish)
+            # Classified once per refresh and saved with the catalog, so filtering by category is free later
+            with metrics.span("catalog.classify"):
+                await loop.run_in_executor(None, lambda: classify(catalog, self.cache.load_app_types()))
+            with metrics.span("cache.save"):
+                await loop.run_in_executor(None, self.cache.save, catalog, headers.get("ETag"),
+                                           headers.get("Last-Modified"))
 
-            # Debounced UI update (assume `update_server_listbox` is already debounced)
-            update_server_listbox()
+            self.dispatch(lambda: on_catalog(catalog))
         except Exception as e:
             logging.error(f"Error processing the API response: {e}")
-            messagebox.showerror("API Error", f"There was an error processing the API response: {str(e)}")
+            if on_error is not None:
+                error_message = f"There was an error processing the API response: {str(e)}"
+                self.dispatch(lambda: on_error(error_message))
+
+    async def load_servers(self, on_catalog, on_error=None, force_refresh=False, have_servers=False):
+        """Serve the cached server list first, then revalidate it once it is stale (or when forced)."""
+        loop = asyncio.get_running_loop()
+        if not have_servers:
+            with metrics.span("cache.load"):
+                cached = await loop.run_in_executor(None, self.cache.load)
+            if cached is not None:
+                have_servers = True
+                self.dispatch(lambda: on_catalog(cached))
+        if have_servers and not force_refresh and not self.cache.is_stale():
+            return
+        await self.get_dedicated_servers(on_catalog, on_error)
 
-    def get_dedicated_servers_thread(self, app_ids, update_server_listbox):
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(self.get_dedicated_servers(app_ids, update_server_listbox))
+    def get_dedicated_servers_thread(self, on_catalog, on_error=None, force_refresh=False, have_servers=False):
+        """
+        Load the server list on the API loop thread without blocking the caller.
+        Args:
+            on_catalog (callable): Called on the UI thread with each AppCatalog loaded (cached, then fresh).
+            on_error (callable): Called on the UI thread with an error message if no list could be loaded.
+            force_refresh (bool): Revalidate even if the cache is younger than its TTL.
+            have_servers (bool): The caller already shows a catalog, so the cached copy is not re-read.
+        Returns:
+            concurrent.futures.Future: Completes once the list has been loaded and revalidated.
+        """
+        return self.submit(self.load_servers(on_catalog, on_error, force_refresh, have_servers))
 
 
 if __name__ == "__main__":
     # Example usage
     api_manager = ApiManager()
-    app_ids = {}  # Use a regular dict instead of OrderedDict
 
 
-    def update_server_listbox():
-        print("Server list updated.")
+    def show_catalog(catalog):
+        print(f"Server list updated: {len(catalog)} apps.")
 
 
-    api_manager.get_dedicated_servers_thread(app_ids, update_server_listbox)
+    api_manager.get_dedicated_servers_thread(show_catalog, print, force_refresh=True).result()
+    api_manager.close()
@@ -0,0 +1,257 @@
+import struct
+import sys
+from array import array
+
+MAGIC = b"SMCAT\x02"
+_HEADER = struct.Struct("<6s?xIQQ")  # magic, little-endian arrays, count, names size, lowered size
+
+
+def _offsets():
+    offsets = array('I')
+    if offsets.itemsize != 4:
+        offsets = array('L')
+    return offsets
+
+
+class CatalogView:
+    """
+    A read-only sequence of app names for a list of catalog positions, e.g. search results.
+    Names are decoded only when they are indexed, so a listbox showing a window of 200k results
+    only ever decodes the rows on screen.
+    """
+
+    def __init__(self, catalog, indices):
+        self.catalog = catalog
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.catalog.name(i) for i in self.indices[item]]
+        return self.catalog.name(self.indices[item])
+
+    def appid(self, position):
+        """The App ID shown at `position`."""
+        return self.catalog.appid(self.indices[position])
+
+
+class CatalogBuilder:
+    """
+    Collects apps straight into the catalog's columns as they are parsed, so the app list never
+    exists as Python objects: each app costs its bytes in two buffers plus three array slots.
+    `finish` sorts the columns once all apps are in.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.appids = array('I')
+        self.names = bytearray()
+        self.name_offsets = _offsets()
+        self.name_offsets.append(0)
+        self.lowered = bytearray()
+        self.lowered_offsets = _offsets()
+        self.lowered_offsets.append(0)
+
+    def __len__(self):
+        return len(self.appids)
+
+    def add(self, name, appid):
+        """Append one app; apps may come in any order and duplicates are kept."""
+        self.appids.append(int(appid))
+        self.names += name.encode('utf-8')
+        self.name_offsets.append(len(self.names))
+        self.lowered += name.lower().replace('\n', ' ').encode('utf-8') + b'\n'
+        self.lowered_offsets.append(len(self.lowered))
+
+    def finish(self):
+        """
+        Sort the collected apps by lowered name into an AppCatalog. The builder is emptied.
+        Returns:
+            AppCatalog: The catalog.
+        """
+        # The lowered names without their newlines, which would sort "ab\t" before "ab"
+        keys = bytes(self.lowered).split(b'\n')[:-1]
+        # UTF-8 bytes sort in code point order, the order `prefix_range` bisects in
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        appids = array('I', (self.appids[index] for index in order))
+        names, name_offsets = self._gather(self.names, self.name_offsets, order)
+        lowered, lowered_offsets = bytearray(), _offsets()
+        lowered_offsets.append(0)
+        for index in order:
+            lowered += keys[index] + b'\n'
+            lowered_offsets.append(len(lowered))
+            keys[index] = None  # Freed as the buffer that replaces it grows
+        self._reset()
+        return AppCatalog(appids, names, name_offsets, bytes(lowered), lowered_offsets)
+
+    @staticmethod
+    def _gather(buffer, offsets, order):
+        """Copy the entries of an offset-indexed buffer in the given order; returns (bytes, offsets)."""
+        gathered, gathered_offsets = bytearray(), _offsets()
+        gathered_offsets.append(0)
+        for index in order:
+            gathered += buffer[offsets[index]:offsets[index + 1]]
+            gathered_offsets.append(len(gathered))
+        return bytes(gathered), gathered_offsets
+
+
+class AppCatalog:
+    """
+    The Steam app list in columnar form, sorted case-insensitively by name.
+
+    App IDs are a typed array; the names are one UTF-8 buffer with an offset array, and a second
+    buffer holds the lowered names, each followed by a newline, for searching. That is a few bytes
+    per app instead of a str, an int and a dict entry, apps sharing a name are all kept, and the
+    whole catalog is written to and read back from disk as a handful of raw buffers.
+
+    `categories` holds one AppClassifier category per app; it is filled in by `classify` and
+    saved with the rest of the catalog.
+    """
+
+    def __init__(self, appids, names_buffer, name_offsets, lowered_buffer, lowered_offsets, categories=None):
+        self.appids = appids
+        self.categories = categories if categories is not None else array('B', bytes(len(appids)))
+        self.names_buffer = names_buffer
+        self.name_offsets = name_offsets
+        self.lowered_buffer = lowered_buffer
+        self.lowered_offsets = lowered_offsets
+        self._appid_order = None
+
+    @classmethod
+    def empty(cls):
+        return cls.from_pairs(())
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """
+        Build a catalog from (name, appid) pairs.
+        Args:
+            pairs (iterable): (name, appid) tuples in any order; duplicates are kept.
+        Returns:
+            AppCatalog: The catalog.
+        """
+        builder = CatalogBuilder()
+        for name, appid in pairs:
+            builder.add(name, appid)
+        return builder.finish()
+
+    def __len__(self):
+        return len(self.appids)
+
+    def name(self, index):
+        return self.names_buffer[self.name_offsets[index]:self.name_offsets[index + 1]].decode('utf-8')
+
+    def appid(self, index):
+        return self.appids[index]
+
+    def category(self, index):
+        return self.categories[index]
+
+    def lowered_name(self, index):
+        return self.lowered_buffer[self.lowered_offsets[index]:self.lowered_offsets[index + 1] - 1].decode('utf-8')
+
+    def items(self):
+        """Yield (name, appid) for every app, in catalog order."""
+        for index in range(len(self.appids)):
+            yield self.name(index), self.appids[index]
+
+    def view(self, indices=None):
+        """A CatalogView of the given positions, or of the whole catalog."""
+        return CatalogView(self, range(len(self)) if indices is None else indices)
+
+    def find_appid(self, appid):
+        """
+        Find an app by ID.
+        Returns:
+            list: The positions of every entry with that App ID (usually one, possibly none).
+        """
+        if self._appid_order is None:
+            order = _offsets()
+            order.extend(sorted(range(len(self.appids)), key=self.appids.__getitem__))
+            self._appid_order = order
+        order, appids, appid = self._appid_order, self.appids, int(appid)
+        low, high = 0, len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if appids[order[middle]] < appid:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        while low < len(order) and appids[order[low]] == appid:
+            found.append(order[low])
+            low += 1
+        return sorted(found)
+
+    def prefix_range(self, prefix):
+        """
+        Find the apps whose name starts with `prefix`, case-insensitively.
+        Returns:
+            range: Catalog positions; names are sorted, so the matches are contiguous.
+        """
+        key = prefix.lower().encode('utf-8')
+        buffer, offsets = self.lowered_buffer, self.lowered_offsets
+
+        def lowest(above):
+            low, high = 0, len(self.appids)
+            while low < high:
+                middle = (low + high) // 2
+                start = offsets[middle]
+                candidate = buffer[start:min(start + len(key), offsets[middle + 1] - 1)]
+                if candidate < key or (above and candidate == key):
+                    low = middle + 1
+                else:
+                    high = middle
+            return low
+
+        return range(lowest(False), lowest(True))
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the catalog's buffers."""
+        return (len(self.names_buffer) + len(self.lowered_buffer) + len(self.categories) +
+                self.appids.itemsize * len(self.appids) +
+                self.name_offsets.itemsize * (len(self.name_offsets) + len(self.lowered_offsets)))
+
+    def to_bytes(self):
+        """Serialize to the binary catalog format: a header followed by the raw arrays and buffers."""
+        header = _HEADER.pack(MAGIC, sys.byteorder == 'little', len(self.appids), len(self.names_buffer),
+                              len(self.lowered_buffer))
+        return b''.join((header, self.appids.tobytes(), self.name_offsets.tobytes(), self.lowered_offsets.tobytes(),
+                         self.categories.tobytes(), self.names_buffer, self.lowered_buffer))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Load a catalog written by `to_bytes`.
+        Raises:
+            ValueError: The data is not a complete catalog.
+        """
+        view = memoryview(data)
+        if len(view) < _HEADER.size:
+            raise ValueError("Truncated catalog header")
+        magic, little_endian, count, names_size, lowered_size = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("Not an app catalog")
+        arrays = (array('I'), _offsets(), _offsets(), array('B'))
+        position = _HEADER.size
+        for column, length in zip(arrays, (count, count + 1, count + 1, count)):
+            size = column.itemsize * length
+            if position + size > len(view):
+                raise ValueError("Truncated catalog")
+            column.frombytes(view[position:position + size])
+            if little_endian != (sys.byteorder == 'little'):
+                column.byteswap()
+            position += size
+        if position + names_size + lowered_size != len(view):
+            raise ValueError("Catalog size does not match its header")
+        names_buffer = bytes(view[position:position + names_size])
+        lowered_buffer = bytes(view[position + names_size:])
+        appids, name_offsets, lowered_offsets, categories = arrays
+        if name_offsets[-1] != names_size or lowered_offsets[-1] != lowered_size:
+            raise ValueError("Catalog offsets do not match its buffers")
+        return cls(appids, names_buffer, name_offsets, lowered_buffer, lowered_offsets, categories)
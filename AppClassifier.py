@@ -0,0 +1,80 @@
+from array import array
+from bisect import bisect_right
+
+GAME, SERVER, TOOL, DLC, SOUNDTRACK, DEMO, VIDEO = range(7)
+
+CATEGORY_NAMES = {GAME: "game", SERVER: "server", TOOL: "tool", DLC: "dlc", SOUNDTRACK: "soundtrack",
+                  DEMO: "demo", VIDEO: "video"}
+CATEGORIES = {name: category for category, name in CATEGORY_NAMES.items()}
+DEFAULT_CATEGORIES = frozenset({SERVER})
+
+# The `common.type` SteamCMD's app_info_print reports, for apps whose metadata has been cached
+STEAM_TYPES = {"game": GAME, "dlc": DLC, "tool": TOOL, "application": TOOL, "demo": DEMO, "music": SOUNDTRACK,
+               "video": VIDEO, "series": VIDEO, "episode": VIDEO}
+
+# Whole words and phrases, applied in this order over the lowered names so a later category wins:
+# "Foo Dedicated Server Demo" is a server. A trailing newline anchors a keyword to the end of a name.
+_KEYWORDS = (
+    (VIDEO, ("trailer", "teaser", "movie", "documentary")),
+    (DLC, ("dlc", "season pass", "expansion pack", "expansion pass", "deluxe content", "upgrade", "skin pack",
+           "skins pack", "costume pack", "content pack", "character pack", "map pack", "weapon pack",
+           "supporter pack")),
+    (TOOL, ("sdk", "editor", "mod tools", "mod tool", "modtools", "authoring tools", "workshop tools", "dev kit",
+            "devkit", "benchmark")),
+    (DEMO, ("demo", "playtest", "trial")),
+    (SOUNDTRACK, ("soundtrack", "soundtracks", "ost", "original score", "artbook", "art book")),
+    (SERVER, ("dedicated server", "server\n", "server files", "server build", "server tool", "server tools",
+              "srcds", "hlds")),
+)
+_WORD_BYTES = frozenset(b"abcdefghijklmnopqrstuvwxyz0123456789") | frozenset(range(0x80, 0x100))
+
+
+def _keyword_matches(buffer, keyword):
+    """Yield the offsets where `keyword` occurs in `buffer` as a whole word."""
+    keyword = keyword.encode('utf-8')
+    check_end = not keyword.endswith(b'\n')
+    find = buffer.find
+    position = find(keyword)
+    while position != -1:
+        end = position + len(keyword)
+        if ((position == 0 or buffer[position - 1] not in _WORD_BYTES) and
+                (not check_end or end == len(buffer) or buffer[end] not in _WORD_BYTES)):
+            yield position
+        position = find(keyword, position + 1)
+
+
+def classify(catalog, app_types=None):
+    """
+    Tag every app in a catalog with a category, once per catalog refresh.
+
+    The keywords are found with `bytes.find` over the catalog's lowered name buffer as a whole, so
+    classifying 200k apps is a few dozen scans in C rather than a Python loop over every name.
+    Steam's own type, where it is known, overrides the name heuristics.
+    Args:
+        catalog (AppCatalog): The catalog; its `categories` column is replaced.
+        app_types (dict): appid -> Steam app type (e.g. "Tool", "DLC") from cached app info.
+    Returns:
+        array: The new categories column.
+    """
+    buffer, offsets = catalog.lowered_buffer, catalog.lowered_offsets
+    categories = array('B', bytes(len(catalog)))
+    for category, keywords in _KEYWORDS:
+        for keyword in keywords:
+            for position in _keyword_matches(buffer, keyword):
+                categories[bisect_right(offsets, position) - 1] = category
+    for appid, steam_type in (app_types or {}).items():
+        category = STEAM_TYPES.get(str(steam_type).lower())
+        if category is None:
+            continue
+        for i in catalog.find_appid(appid):
+            # Steam files dedicated servers under "Tool"; the name tells them apart
+            if not (category == TOOL and categories[i] == SERVER):
+                categories[i] = category
+    catalog.categories = categories
+    return categories
+
+
+def counts(catalog):
+    """Number of apps in each category, by category name."""
+    column = catalog.categories.tobytes()
+    return {name: column.count(bytes((category,))) for category, name in CATEGORY_NAMES.items()}
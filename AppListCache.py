@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from AppCatalog import AppCatalog
+
+
+def default_cache_dir():
+    """Per-user directory for the app list cache and other local state."""
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "DedicatedServerManager")
+
+
+class AppListCache:
+    """On-disk copy of the Steam app list, in the AppCatalog format, plus the HTTP validators it was served with."""
+
+    DATA_FILE = "applist.catalog"
+    LEGACY_DATA_FILE = "applist.json.gz"
+    META_FILE = "applist.meta.json"
+    APP_TYPES_FILE = "apptypes.json"
+    DEFAULT_TTL = 6 * 60 * 60  # Seconds before the cached list is revalidated against the API
+    _app_types_lock = threading.Lock()  # Shared: RemoteBuilds records types through its own instances
+
+    def __init__(self, cache_dir=None, ttl=DEFAULT_TTL):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.ttl = ttl
+        self.data_path = os.path.join(self.cache_dir, self.DATA_FILE)
+        self.meta_path = os.path.join(self.cache_dir, self.META_FILE)
+        self.app_types_path = os.path.join(self.cache_dir, self.APP_TYPES_FILE)
+
+    def exists(self):
+        return os.path.isfile(self.data_path) and os.path.isfile(self.meta_path)
+
+    def load_meta(self):
+        """Return the cache metadata (etag, last_modified, fetched_at), or an empty dict."""
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self):
+        """
+        Read the cached app list.
+        Returns:
+            AppCatalog: The cached catalog, or None if there is no usable cache.
+        """
+        if not self.exists():
+            return None
+        try:
+            # The file is the catalog's own buffers, so loading is one read and a few copies
+            with open(self.data_path, 'rb') as f:
+                return AppCatalog.from_bytes(f.read())
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable app list cache: {e}")
+            # Without its validators the next fetch is unconditional, so a 304 cannot leave us with no list
+            try:
+                os.remove(self.meta_path)
+            except OSError:
+                pass
+            return None
+
+    def is_stale(self):
+        fetched_at = self.load_meta().get("fetched_at", 0)
+        return time.time() - fetched_at >= self.ttl
+
+    def validators(self):
+        """Return the conditional request headers for revalidating the cached list."""
+        meta = self.load_meta()
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def save(self, catalog, etag=None, last_modified=None):
+        """
+        Atomically replace the cached app list.
+        Args:
+            catalog (AppCatalog): The app list to store.
+            etag (str): The ETag header the list was served with.
+            last_modified (str): The Last-Modified header the list was served with.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(catalog.to_bytes())
+            os.replace(tmp_path, self.data_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        try:
+            os.remove(os.path.join(self.cache_dir, self.LEGACY_DATA_FILE))
+        except FileNotFoundError:
+            pass
+        self._write_meta({"etag": etag, "last_modified": last_modified, "fetched_at": time.time()})
+
+    def touch(self):
+        """Mark the cached list as freshly revalidated (the server answered 304 Not Modified)."""
+        meta = self.load_meta()
+        meta["fetched_at"] = time.time()
+        self._write_meta(meta)
+
+    def load_app_types(self):
+        """Return the Steam app types seen in app info so far, as {appid (str): type}."""
+        try:
+            with open(self.app_types_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record_app_types(self, app_types):
+        """
+        Remember Steam app types for the classifier; they are applied on the next catalog refresh.
+        Args:
+            app_types (dict): appid -> the `common.type` of its app info.
+        """
+        with self._app_types_lock:
+            known = self.load_app_types()
+            updates = {str(appid): app_type for appid, app_type in app_types.items()
+                       if known.get(str(appid)) != app_type}
+            if not updates:
+                return
+            known.update(updates)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = self.app_types_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(known, f)
+            os.replace(tmp_path, self.app_types_path)
+
+    def _write_meta(self, meta):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
@@ -0,0 +1,74 @@
+import codecs
+import json
+import re
+
+_APPS_ARRAY = re.compile(r'"apps"\s*:\s*\[')
+_WHITESPACE_AND_COMMAS = re.compile(r'[\s,]*')
+
+
+class AppListStreamParser:
+    """
+    Incremental parser for the GetAppList response.
+
+    Chunks of the HTTP body are fed in as they arrive and every complete entry of `applist.apps`
+    is returned as soon as it has been read, so neither the whole document nor the decoded list
+    of app dicts is ever held in memory.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._in_array = False
+        self.done = False
+
+    def feed(self, chunk):
+        """
+        Parse the next chunk of the response body.
+        Args:
+            chunk (bytes): The next piece of the body.
+        Returns:
+            list: (name, appid) tuples completed by this chunk.
+        """
+        if self.done:
+            return []
+        self._buffer += self._decoder.decode(chunk)
+        return self._drain()
+
+    def close(self):
+        """Finish parsing and make sure the apps array was read to the end."""
+        self._buffer += self._decoder.decode(b"", final=True)
+        apps = self._drain()
+        if not self.done:
+            raise ValueError("Truncated app list: the apps array was not terminated")
+        return apps
+
+    def _drain(self):
+        if not self._in_array:
+            match = _APPS_ARRAY.search(self._buffer)
+            if match is None:
+                # Keep enough of the tail to recognise a marker split across chunks
+                self._buffer = self._buffer[-32:]
+                return []
+            self._buffer = self._buffer[match.end():]
+            self._in_array = True
+
+        apps = []
+        buffer = self._buffer
+        pos = 0
+        while True:
+            pos = _WHITESPACE_AND_COMMAS.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            if buffer[pos] == ']':
+                self.done = True
+                pos += 1
+                break
+            try:
+                app, pos_end = self._json.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # The entry continues in the next chunk
+            apps.append((app["name"], app["appid"]))
+            pos = pos_end
+        self._buffer = buffer[pos:]
+        return apps
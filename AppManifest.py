@@ -0,0 +1,124 @@
+import collections
+import logging
+import os
+import threading
+
+import Vdf
+
+STATE_FULLY_INSTALLED = 4  # StateFlags bit set once an app is completely installed
+
+InstalledApp = collections.namedtuple(
+    'InstalledApp', ['appid', 'buildid', 'state_flags', 'size_on_disk', 'last_updated', 'installdir', 'path'])
+
+
+def _int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_manifest(path):
+    """
+    Read one appmanifest_*.acf file.
+    Returns:
+        InstalledApp: The app described by the manifest.
+    """
+    state = Vdf.get(Vdf.load(path), 'AppState')
+    if not isinstance(state, dict):
+        raise Vdf.VdfError(f"{path} has no AppState section")
+    return InstalledApp(
+        appid=str(Vdf.get(state, 'appid', '')),
+        buildid=str(Vdf.get(state, 'buildid', '')),
+        state_flags=_int(Vdf.get(state, 'StateFlags')),
+        size_on_disk=_int(Vdf.get(state, 'SizeOnDisk')),
+        last_updated=_int(Vdf.get(state, 'LastUpdated')),
+        installdir=Vdf.get(state, 'installdir', ''),
+        path=path,
+    )
+
+
+class ManifestIndex:
+    """
+    Index of the apps installed in one Steam library (a directory holding `steamapps`).
+
+    Parsed manifests are cached together with the file's mtime and size and are only re-read
+    when either changes. Looking up one app stats just its own `appmanifest_<appid>.acf`, so the
+    answer costs the same however many manifests the library holds; `apps()` rescans the
+    directory and re-parses only the manifests that changed.
+    """
+
+    _libraries = {}
+    _libraries_lock = threading.Lock()
+
+    def __init__(self, library_path):
+        self.library_path = library_path
+        self.steamapps = os.path.join(library_path, 'steamapps')
+        self._entries = {}  # manifest path -> ((mtime_ns, size), InstalledApp)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_library(cls, library_path):
+        """The shared index for a library, created on first use."""
+        key = os.path.normcase(os.path.abspath(library_path))
+        with cls._libraries_lock:
+            index = cls._libraries.get(key)
+            if index is None:
+                index = cls._libraries[key] = cls(library_path)
+            return index
+
+    def _load(self, path, stat):
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._entries.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        try:
+            app = parse_manifest(path)
+        except (OSError, Vdf.VdfError) as e:
+            logging.warning(f"Skipping unreadable app manifest {path}: {e}")
+            app = None
+        self._entries[path] = (signature, app)
+        return app
+
+    def get(self, appid):
+        """
+        Look up one installed app.
+        Returns:
+            InstalledApp: The app, or None if it has no (readable) manifest in this library.
+        """
+        path = os.path.join(self.steamapps, f'appmanifest_{appid}.acf')
+        with self._lock:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                self._entries.pop(path, None)
+                return None
+            app = self._load(path, stat)
+        return app if app is not None and app.appid == str(appid) else None
+
+    def is_installed(self, appid):
+        app = self.get(appid)
+        return app is not None and bool(app.state_flags & STATE_FULLY_INSTALLED)
+
+    def apps(self):
+        """Rescan the library and return every installed app, keyed by appid."""
+        found = {}
+        with self._lock:
+            seen = set()
+            try:
+                entries = list(os.scandir(self.steamapps))
+            except OSError:
+                entries = []
+            for entry in entries:
+                if not (entry.name.startswith('appmanifest_') and entry.name.endswith('.acf')):
+                    continue
+                seen.add(entry.path)
+                try:
+                    app = self._load(entry.path, entry.stat())
+                except OSError:
+                    continue
+                if app is not None:
+                    found[app.appid] = app
+            for stale in set(self._entries) - seen:
+                del self._entries[stale]
+        return found
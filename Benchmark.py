@@ -0,0 +1,288 @@
+"""
+Benchmarks for the hot paths, run against synthetic fixtures so they need neither Steam nor a display.
+
+    python Benchmark.py --output results.json
+    python Benchmark.py --output new.json --compare results.json
+
+Fixtures are generated in a temporary directory: a GetAppList response with `--apps` entries served by
+a local HTTP stub (with ETag revalidation), a steamapps tree with `--manifests` appmanifest files, and
+FakeSteamCmd replaying a recorded install at `--speed` times real time. The search benchmarks time the
+index that ServerInstaller.filter_servers and update_server_listbox hand their queries to.
+"""
+import argparse
+import hashlib
+import http.server
+import json
+import logging
+import os
+import platform
+import random
+import shlex
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import FakeSteamCmd
+import Vdf
+from ApiManager import ApiManager
+from AppCatalog import AppCatalog
+from AppClassifier import classify, counts
+from AppListCache import AppListCache
+from AppListParser import AppListStreamParser
+from AppManifest import ManifestIndex
+from RemoteBuilds import remote_builds
+from SearchIndex import ServerSearchIndex
+from ServerManager import ServerManager
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def generate_app_list(count, seed=0):
+    """A GetAppList v2 response body with `count` apps, a few percent of them dedicated servers."""
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(5000)]
+    words += ["Counter", "Strike", "Valheim", "Rust", "Ark", "Soundtrack", "Demo", "Tool", "Editor"]
+    apps = []
+    for appid in range(10, 10 + count):
+        name = " ".join(rng.choice(words).title() for _ in range(rng.randint(1, 5)))
+        if rng.random() < 0.03:
+            name += " Dedicated Server"
+        apps.append({"appid": appid, "name": name})
+    return json.dumps({"applist": {"apps": apps}}).encode('utf-8')
+
+
+def serve_app_list(body):
+    """Serve `body` from a local GetAppList stub; returns (server, url)."""
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/ISteamApps/GetAppList/v2/"
+
+
+def generate_library(path, count, seed=0):
+    """A Steam library with `count` installed apps; returns their app IDs."""
+    rng = random.Random(seed)
+    steamapps = os.path.join(path, 'steamapps')
+    os.makedirs(steamapps, exist_ok=True)
+    appids = [str(appid) for appid in rng.sample(range(10, 3000000), count)]
+    for appid in appids:
+        manifest = {"AppState": {"appid": appid, "name": f"App {appid}", "StateFlags": "4",
+                                 "installdir": f"app{appid}", "LastUpdated": str(int(time.time())),
+                                 "SizeOnDisk": str(rng.randint(1, 1 << 34)), "buildid": "1000"}}
+        with open(os.path.join(steamapps, f'appmanifest_{appid}.acf'), 'w', encoding='utf-8') as f:
+            f.write(Vdf.dumps(manifest))
+    return appids
+
+
+def write_recording(path, size, steps=40, interval=0.05):
+    """Record a synthetic install the way FakeSteamCmd replays it, with `interval` seconds per line."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in FakeSteamCmd._synthetic_output("APPID", size, steps, validate=False):
+            f.write(f"@{interval} {line}\n")
+
+
+def measure(func, repeat):
+    """Run `func` `repeat` times; returns the timing summary."""
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - started)
+    return {"seconds": statistics.median(runs), "min": min(runs), "runs": runs}
+
+
+def bench_catalog(results, tmp, args):
+    body = generate_app_list(args.apps)
+    server, url = serve_app_list(body)
+    cache_dirs = iter(range(args.repeat + 1))
+    try:
+        def cold_fetch():
+            # Fresh cache each run: download, parse, sort and save the whole list
+            api_manager = ApiManager(api_url=url, cache=AppListCache(os.path.join(tmp, f"cache{next(cache_dirs)}")))
+            try:
+                api_manager.submit(api_manager.get_dedicated_servers(lambda catalog: None)).result()
+            finally:
+                api_manager.close()
+
+        results["api.get_dedicated_servers.cold"] = measure(cold_fetch, args.repeat)
+
+        api_manager = ApiManager(api_url=url, cache=AppListCache(os.path.join(tmp, "cache_warm")))
+        catalogs = []
+        try:
+            api_manager.submit(api_manager.get_dedicated_servers(catalogs.append)).result()
+            results["api.get_dedicated_servers.revalidate"] = measure(
+                lambda: api_manager.submit(api_manager.get_dedicated_servers(catalogs.append)).result(),
+                args.repeat)
+            results["cache.load"] = measure(api_manager.cache.load, args.repeat)
+            results["cache.load"]["bytes"] = os.path.getsize(api_manager.cache.data_path)
+        finally:
+            api_manager.close()
+    finally:
+        server.shutdown()
+    results["api.get_dedicated_servers.cold"]["bytes"] = len(body)
+    pairs = parse_app_list(body)
+    results["catalog.from_pairs"] = measure(lambda: AppCatalog.from_pairs(pairs), 1)
+    results["catalog.from_pairs"]["catalog_bytes"] = catalogs[-1].nbytes
+    results["catalog.classify"] = measure(lambda: classify(catalogs[-1]), args.repeat)
+    results["catalog.classify"]["categories"] = counts(catalogs[-1])
+    return catalogs[-1]
+
+
+def parse_app_list(body):
+    parser = AppListStreamParser()
+    return parser.feed(body) + parser.close()
+
+
+def bench_search(results, catalog, args):
+    index = ServerSearchIndex(catalog, categories=None)
+    # update_server_listbox: the full, presorted list
+    results["search.update_server_listbox"] = measure(lambda: index.search(""), args.repeat)
+
+    # filter_servers: a user typing a query one key at a time
+    def type_query(query="dedicated serv"):
+        for end in range(1, len(query) + 1):
+            index.search(query[:end])
+
+    results["search.filter_servers.keystrokes"] = measure(type_query, args.repeat)
+    results["search.filter_servers.keystrokes"]["keystrokes"] = len("dedicated serv")
+    # The first key scans every name; later keys only rescan the previous matches
+    results["search.filter_servers.first_key"] = measure(lambda: (index.search(""), index.search("a")), args.repeat)
+
+    # The default view: dedicated servers only
+    index = ServerSearchIndex(catalog)
+    results["search.filter_servers.keystrokes.servers"] = measure(lambda: type_query("counter"), args.repeat)
+    results["search.filter_servers.keystrokes.servers"]["visible"] = len(index)
+
+
+def bench_manifests(results, tmp, args):
+    library = os.path.join(tmp, "library")
+    appids = generate_library(library, args.manifests)
+
+    def lookup_all_cold():
+        index = ManifestIndex(library)
+        for appid in appids:
+            index.is_installed(appid)
+
+    def lookup_all_warm():
+        for appid in appids:
+            ServerManager.is_server_installed(library, appid)
+
+    lookup_all_warm()
+    results["manifest.is_server_installed.cold"] = measure(lookup_all_cold, args.repeat)
+    results["manifest.is_server_installed.warm"] = measure(lookup_all_warm, args.repeat)
+    results["manifest.scan_library"] = measure(lambda: ManifestIndex(library).apps(), args.repeat)
+    for key in ("manifest.is_server_installed.cold", "manifest.is_server_installed.warm"):
+        results[key]["lookups"] = len(appids)
+
+
+def bench_install(results, tmp, args):
+    recording = args.replay
+    if recording is None:
+        recording = os.path.join(tmp, "install.log")
+        write_recording(recording, 512 * 1024 * 1024)
+    fake = [sys.executable, os.path.join(HERE, "FakeSteamCmd.py"), "--replay", recording,
+            "--speed", str(args.speed), "--buildid", "1000"]
+    os.environ["STEAMCMD"] = subprocess.list2cmdline(fake) if os.name == 'nt' else shlex.join(fake)
+    installs = iter(range(args.repeat))
+
+    def fresh_install():
+        ServerManager.install_or_update_server("896660", os.path.join(tmp, "servers", str(next(installs))))
+
+    results["install_or_update_server.install"] = measure(fresh_install, args.repeat)
+
+    def up_to_date():
+        # Already on the latest build: one app_info_print session, then skipped
+        remote_builds.invalidate("896660")
+        ServerManager.install_or_update_server("896660", os.path.join(tmp, "servers", "0"))
+
+    results["install_or_update_server.skip"] = measure(up_to_date, args.repeat)
+
+
+def _revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)["results"]
+    print(f"{'benchmark':45} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in results.items():
+        if name in baseline:
+            before, after = baseline[name]["seconds"], result["seconds"]
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"{name:45} {before * 1000:9.1f}ms {after * 1000:9.1f}ms {change:+7.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the server manager's hot paths.")
+    parser.add_argument("--apps", type=int, default=200000, help="Entries in the generated app list")
+    parser.add_argument("--manifests", type=int, default=500, help="appmanifest files in the fake library")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per benchmark; the median is reported")
+    parser.add_argument("--speed", type=float, default=10.0, help="Replay speed of the fake SteamCMD")
+    parser.add_argument("--replay", help="Recorded SteamCMD output to replay instead of a synthetic install")
+    parser.add_argument("--only", choices=("catalog", "manifests", "install"), action="append",
+                        help="Run only these groups (search runs with catalog)")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Print the change against an earlier results file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    groups = args.only or ["catalog", "manifests", "install"]
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="servermanager-bench-") as tmp:
+        if "catalog" in groups:
+            bench_search(results, bench_catalog(results, tmp, args), args)
+        if "manifests" in groups:
+            bench_manifests(results, tmp, args)
+        if "install" in groups:
+            bench_install(results, tmp, args)
+
+    for name, result in results.items():
+        print(f"{name:45} {result['seconds'] * 1000:10.1f} ms")
+    report = {
+        "revision": _revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"apps": args.apps, "manifests": args.manifests, "repeat": args.repeat, "speed": args.speed},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
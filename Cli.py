@@ -0,0 +1,339 @@
+"""
+Command line and daemon front end: the same engine as the GUI, usable without a display.
+
+    python Cli.py install 896660 /srv/valheim
+    python Cli.py update --file servers.txt --batch 20
+    python Cli.py update 896660 /srv/valheim --staged
+    python Cli.py rollback /srv/valheim
+    python Cli.py replicate 896660 /srv/valheim-seed /srv/valheim1 /srv/valheim2
+    python Cli.py dedupe /srv/valheim1 /srv/valheim2
+    python Cli.py status /srv/valheim --check
+    python Cli.py verify --file servers.txt --repair
+    python Cli.py search valheim
+    python Cli.py --steamcmd /opt/steamcmd install-steamcmd
+    python Cli.py daemon --file servers.txt --interval 3600
+
+Batch files hold one "<appid> <install path>" per line. The exit code is 0 when every job succeeded.
+"""
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+
+import Dedupe
+import Replicator
+import Staging
+import Verifier
+from ApiManager import ApiManager
+from AppClassifier import CATEGORIES
+from AppManifest import STATE_FULLY_INSTALLED, ManifestIndex
+from JobScheduler import FAILED, PENDING, RUNNING, SUCCEEDED, JobScheduler, read_targets
+from LogPipeline import setup_logging
+from Metrics import metrics
+from RemoteBuilds import remote_builds
+from SearchIndex import ServerSearchIndex
+from ServerManager import ServerManager
+from SteamCmdManager import SteamCmdManager
+
+PROGRESS_INTERVAL = 10  # Seconds between progress summaries while jobs run
+
+
+def _targets(args):
+    targets = []
+    if args.appid:
+        if not args.path:
+            raise SystemExit("An install path is required with an App ID")
+        targets.append((args.appid, os.path.normpath(args.path)))
+    if args.file:
+        targets.extend(read_targets(args.file))
+    if not targets:
+        raise SystemExit("Nothing to do: give an App ID and path, or --file")
+    return targets
+
+
+def _scheduler(args):
+    if getattr(args, "staged", False):
+        # Every staged update has its own install directory, so each needs its own SteamCMD session
+        return JobScheduler(max_jobs=args.jobs, batch_size=1, runner=ServerManager.run_staged_job)
+    return JobScheduler(max_jobs=args.jobs, batch_size=args.batch)
+
+
+def _wait(scheduler, stop=None):
+    """Wait for the submitted jobs, logging a summary now and then."""
+    while not scheduler.wait(timeout=PROGRESS_INTERVAL):
+        jobs = scheduler.jobs()
+        running = [job for job in jobs if job.status == RUNNING]
+        logging.info(f"{len(running)} running, {sum(job.status == PENDING for job in jobs)} pending, "
+                     f"{sum(job.status in (SUCCEEDED, FAILED) for job in jobs)} finished" +
+                     "".join(f"; {job.appid} {job.phase or 'starting'} {job.percent:.0f}%" for job in running))
+        if stop is not None and stop.is_set():
+            return
+
+
+def _report(jobs):
+    for job in jobs:
+        print(f"{job.appid}\t{job.install_path}\t{job.status}\t{job.duration:.0f}s\t{job.error or ''}")
+    return 0 if all(job.status == SUCCEEDED for job in jobs) else 1
+
+
+def cmd_install(args):
+    scheduler = _scheduler(args)
+    jobs = scheduler.submit_many(_targets(args), validate=args.validate)
+    _wait(scheduler)
+    scheduler.shutdown()
+    return _report(jobs)
+
+
+def cmd_update(args):
+    targets = _targets(args)
+    missing = [(appid, path) for appid, path in targets if not ServerManager.is_server_installed(path, appid)]
+    for appid, path in missing:
+        logging.error(f"App {appid} is not installed in {path}; use install instead")
+    targets = [target for target in targets if target not in missing]
+    code = 1 if missing else 0
+    if targets:
+        scheduler = _scheduler(args)
+        jobs = scheduler.submit_many(targets, validate=args.validate)
+        _wait(scheduler)
+        scheduler.shutdown()
+        code = max(code, _report(jobs))
+    return code
+
+
+def cmd_status(args):
+    apps = ManifestIndex.for_library(args.path).apps()
+    if args.appids:
+        apps = {appid: app for appid, app in apps.items() if appid in args.appids}
+    remote = remote_builds.get(apps) if args.check and apps else {}
+    for appid in sorted(apps, key=int):
+        app = apps[appid]
+        state = "installed" if app.state_flags & STATE_FULLY_INSTALLED else f"incomplete ({app.state_flags})"
+        line = f"{appid}\t{app.buildid}\t{state}\t{app.size_on_disk / 1073741824:.2f} GiB\t{app.installdir}"
+        if args.check:
+            if appid not in remote:
+                line += "\tunknown"
+            else:
+                line += "\tup to date" if remote[appid] == app.buildid else f"\tupdate available ({remote[appid]})"
+        print(line)
+    for appid in set(args.appids or ()) - set(apps):
+        print(f"{appid}\t\tnot installed")
+    return 0
+
+
+def cmd_search(args):
+    api_manager = ApiManager()
+    catalogs, errors = [], []
+    try:
+        api_manager.get_dedicated_servers_thread(catalogs.append, errors.append,
+                                                 force_refresh=args.refresh).result()
+    finally:
+        api_manager.close()
+    if not catalogs:
+        logging.error(errors[0] if errors else "No server list is available")
+        return 1
+    catalog = catalogs[-1]
+    # Ranked like the GUI: prefix matches first, each group by name
+    categories = None if args.all else [CATEGORIES[name] for name in args.category or ("server",)]
+    matches = ServerSearchIndex(catalog, categories).search(args.query)
+    for i in matches[:args.limit] if args.limit else matches:
+        print(f"{catalog.appid(i)}\t{catalog.name(i)}")
+    return 0 if matches else 1
+
+
+def cmd_replicate(args):
+    paths = [os.path.normpath(path) for path in args.paths]
+    results = ServerManager.replicate_server(args.appid, os.path.normpath(args.seed), paths, validate=args.validate,
+                                             workers=args.workers)
+    for path, succeeded, message in results:
+        print(f"{args.appid}\t{path}\t{SUCCEEDED if succeeded else FAILED}\t{message}")
+    return 0 if all(succeeded for _, succeeded, _ in results) else 1
+
+
+def cmd_dedupe(args):
+    report = Dedupe.dedupe([os.path.normpath(root) for root in args.roots], mode=args.mode,
+                           min_size=args.min_size, workers=args.workers, dry_run=args.dry_run)
+    linked = ", ".join(f"{count} {method}s" for method, count in sorted(report["linked"].items())) or "none"
+    print(f"{report['files']} files scanned, {report['hashed']} hashed, {report['duplicates']} duplicates; "
+          f"linked: {linked}; {report['errors']} errors")
+    print(f"{report['reclaimed'] / 1073741824:.2f} GiB {'reclaimable' if args.dry_run else 'reclaimed'}")
+    return 1 if report["errors"] else 0
+
+
+def cmd_verify(args):
+    drifted = []
+    for appid, path in _targets(args):
+        report = Verifier.verify(path, appid, workers=args.workers, deep=args.deep)
+        if report["clean"]:
+            print(f"{appid}\t{path}\tclean\t{report['checked']} files, {report['hashed']} hashed")
+            continue
+        print(f"{appid}\t{path}\tdrift\t{report['reason']}")
+        for relative in report["modified"] + report["missing"]:
+            logging.info(f"{appid}: {relative} {'modified' if relative in report['modified'] else 'missing'}")
+        drifted.append((appid, path))
+    if drifted and args.repair:
+        scheduler = _scheduler(args)
+        jobs = scheduler.submit_many(drifted, validate=True)
+        _wait(scheduler)
+        scheduler.shutdown()
+        return _report(jobs)
+    return 1 if drifted else 0
+
+
+def cmd_rollback(args):
+    try:
+        previous = Staging.rollback(os.path.normpath(args.path))
+    except OSError as e:
+        logging.error(str(e))
+        return 1
+    print(f"{args.path} -> {previous}")
+    return 0
+
+
+def cmd_install_steamcmd(args):
+    succeeded, message = SteamCmdManager.install_steamcmd()
+    print(message)
+    return 0 if succeeded else 1
+
+
+def cmd_daemon(args):
+    """Re-read the batch file and bring every server up to date every `interval` seconds until stopped."""
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    scheduler = _scheduler(args)
+    while not stop.is_set():
+        try:
+            targets = read_targets(args.file)
+        except OSError as e:
+            logging.error(f"Cannot read {args.file}: {e}")
+            targets = []
+        if targets:
+            logging.info(f"Checking {len(targets)} servers for updates")
+            jobs = scheduler.submit_many(targets, validate=args.validate)
+            _wait(scheduler, stop)
+            if stop.is_set():
+                break
+            failed = [job for job in jobs if job.status == FAILED]
+            logging.info(f"Update pass finished: {len(jobs) - len(failed)} succeeded, {len(failed)} failed")
+            scheduler.clear_finished()
+            metrics.flush()
+        stop.wait(args.interval)
+
+    logging.info("Stopping; waiting for running jobs to finish")
+    scheduler.shutdown()
+    while any(job.status == RUNNING for job in scheduler.jobs()):
+        scheduler.wait(timeout=1)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Install and update Steam dedicated servers with SteamCMD.")
+    parser.add_argument("--steamcmd", help="Directory SteamCMD is (or will be) installed in")
+    parser.add_argument("--log-file", help="Rotating log file (default: in the user cache directory)")
+    parser.add_argument("--no-log-file", action="store_true", help="Only log to stderr")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log SteamCMD progress lines too")
+    parser.add_argument("--metrics-json", help="Write timers and counters to this JSON file on exit")
+    parser.add_argument("--metrics-prom", help="Write timers and counters to this Prometheus text file on exit "
+                                               "(and after every daemon pass)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_job_options(command):
+        command.add_argument("appid", nargs="?", help="App ID of the server")
+        command.add_argument("path", nargs="?", help="Install directory of the server")
+        command.add_argument("--file", help="Batch file of '<appid> <install path>' lines")
+        command.add_argument("--validate", action="store_true",
+                             help="Check installed files against their recorded hashes; validate those that drifted")
+        command.add_argument("--jobs", type=int, default=4, help="Jobs (or batched sessions) run at once")
+        command.add_argument("--batch", type=int, default=1, help="Servers handled per SteamCMD session")
+        command.add_argument("--staged", action="store_true",
+                             help="Update into a copy of each install and swap it in once SteamCMD succeeds")
+
+    install = commands.add_parser("install", help="Install servers, updating any that are already installed")
+    add_job_options(install)
+    install.set_defaults(handler=cmd_install)
+
+    update = commands.add_parser("update", help="Update installed servers")
+    add_job_options(update)
+    update.set_defaults(handler=cmd_update)
+
+    replicate = commands.add_parser("replicate", help="Install or update one seed copy, then copy it to other paths")
+    replicate.add_argument("appid", help="App ID of the server")
+    replicate.add_argument("seed", help="Install directory SteamCMD installs or updates")
+    replicate.add_argument("paths", nargs="+", help="Install directories to copy the seed into")
+    replicate.add_argument("--validate", action="store_true",
+                           help="Validate the seed and re-sync replicas already on its build")
+    replicate.add_argument("--workers", type=int, default=Replicator.DEFAULT_WORKERS, help="Files copied at once")
+    replicate.set_defaults(handler=cmd_replicate)
+
+    dedupe = commands.add_parser("dedupe", help="Link identical files across install directories")
+    dedupe.add_argument("roots", nargs="+", help="Install directories to deduplicate across")
+    dedupe.add_argument("--mode", choices=Dedupe.MODES, default="auto",
+                        help="reflink (copy-on-write), hardlink, or auto: reflink where the filesystem can")
+    dedupe.add_argument("--min-size", type=int, default=Dedupe.DEFAULT_MIN_SIZE, help="Smallest file considered")
+    dedupe.add_argument("--workers", type=int, help="Hashing processes (default: one per CPU)")
+    dedupe.add_argument("--dry-run", action="store_true", help="Only report the space that could be reclaimed")
+    dedupe.set_defaults(handler=cmd_dedupe)
+
+    status = commands.add_parser("status", help="List the servers installed in a directory")
+    status.add_argument("path", help="Install directory (Steam library) to inspect")
+    status.add_argument("appids", nargs="*", help="Only show these App IDs")
+    status.add_argument("--check", action="store_true", help="Compare against the latest build on Steam")
+    status.set_defaults(handler=cmd_status)
+
+    search = commands.add_parser("search", help="Search the Steam app list")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=50, help="Most results to print (0 for all)")
+    search.add_argument("--refresh", action="store_true", help="Revalidate the cached app list first")
+    search.add_argument("--category", choices=sorted(CATEGORIES), action="append",
+                        help="Only list apps of this kind (default: server); may be repeated")
+    search.add_argument("--all", action="store_true", help="List apps of every kind")
+    search.set_defaults(handler=cmd_search)
+
+    verify = commands.add_parser("verify", help="Check installs against the file hashes recorded at their last update")
+    verify.add_argument("appid", nargs="?", help="App ID of the server")
+    verify.add_argument("path", nargs="?", help="Install directory of the server")
+    verify.add_argument("--file", help="Batch file of '<appid> <install path>' lines")
+    verify.add_argument("--deep", action="store_true",
+                        help="Re-hash every file, not only those whose mtime changed")
+    verify.add_argument("--workers", type=int, help="Hashing processes (default: one per CPU)")
+    verify.add_argument("--repair", action="store_true", help="Have SteamCMD validate the installs that drifted")
+    verify.add_argument("--jobs", type=int, default=4, help="Jobs (or batched sessions) run at once with --repair")
+    verify.add_argument("--batch", type=int, default=1, help="Servers handled per SteamCMD session with --repair")
+    verify.set_defaults(handler=cmd_verify)
+
+    rollback = commands.add_parser("rollback", help="Switch a staged install back to the build before its last update")
+    rollback.add_argument("path", help="Install directory of the server")
+    rollback.set_defaults(handler=cmd_rollback)
+
+    install_steamcmd = commands.add_parser("install-steamcmd", help="Download and install SteamCMD")
+    install_steamcmd.set_defaults(handler=cmd_install_steamcmd)
+
+    daemon = commands.add_parser("daemon", help="Keep the servers in a batch file up to date")
+    daemon.add_argument("--file", required=True, help="Batch file of '<appid> <install path>' lines")
+    daemon.add_argument("--interval", type=float, default=3600, help="Seconds between update passes")
+    daemon.add_argument("--validate", action="store_true",
+                        help="Check installed files on every pass; validate those that drifted")
+    daemon.add_argument("--jobs", type=int, default=4, help="Jobs (or batched sessions) run at once")
+    daemon.add_argument("--batch", type=int, default=1, help="Servers handled per SteamCMD session")
+    daemon.add_argument("--staged", action="store_true",
+                        help="Update into a copy of each install and swap it in once SteamCMD succeeds")
+    daemon.set_defaults(handler=cmd_daemon)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    setup_logging(logging.DEBUG if args.verbose else logging.INFO, stream=sys.stderr,
+                  log_file=False if args.no_log_file else args.log_file)
+    if args.steamcmd:
+        SteamCmdManager.INSTALL_DIR = args.steamcmd
+    if args.metrics_json or args.metrics_prom:
+        metrics.enable(args.metrics_json, args.metrics_prom)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,46 @@
+import collections
+import threading
 import tkinter as tk
 
 
 class ConsoleText(tk.Text):
-    """A Tkinter Text widget that acts as a console."""
+    """
+    A Tkinter Text widget that acts as a console.
 
-    def __init__(self, *args, **kwargs):
+    `write` may be called from any thread: text is buffered and the Tk thread flushes the buffer
+    in one insert per tick. Lines beyond `max_lines` are trimmed from the top, and the view only
+    follows new output while it is scrolled to the bottom.
+    """
+
+    def __init__(self, *args, max_lines=5000, flush_interval_ms=100, **kwargs):
         super().__init__(*args, **kwargs)
         self.configure(state='disabled')
+        self.max_lines = max_lines
+        self.flush_interval_ms = flush_interval_ms
+        # Bounded so a stalled UI cannot make the pending output grow without limit
+        self._pending = collections.deque(maxlen=max_lines * 2)
+        self._lock = threading.Lock()
+        self.after(self.flush_interval_ms, self._flush_tick)
 
     def write(self, message):
-        self.configure(state='normal')
-        self.insert(tk.END, message)
-        self.configure(state='disabled')
-        self.see(tk.END)
+        with self._lock:
+            self._pending.append(message)
 
     def flush(self):
-        pass  # Required for file-like object compatibility
+        pass  # Required for file-like object compatibility; output is flushed on the UI tick
+
+    def _flush_tick(self):
+        with self._lock:
+            text = ''.join(self._pending)
+            self._pending.clear()
+        if text:
+            at_bottom = self.yview()[1] >= 0.999
+            self.configure(state='normal')
+            self.insert(tk.END, text)
+            excess = int(self.index('end-1c').split('.')[0]) - self.max_lines
+            if excess > 0:
+                self.delete('1.0', f'{excess + 1}.0')
+            self.configure(state='disabled')
+            if at_bottom:
+                self.see(tk.END)
+        self.after(self.flush_interval_ms, self._flush_tick)
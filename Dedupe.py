@@ -0,0 +1,240 @@
+import collections
+import json
+import logging
+import os
+import shutil
+from stat import S_ISREG
+
+from FileHashes import HashCache, hash_files
+from Metrics import metrics
+from Replicator import clone_file, copy_file
+
+MODES = ("auto", "reflink", "hardlink")
+DEFAULT_MIN_SIZE = 64 * 1024  # Smaller files reclaim little and cost a hash each
+LINK_SUFFIX = ".dedupe"
+# Where break_links parks the shared inodes of an install while SteamCMD runs; inside `steamapps`, so scans skip it
+HELD_DIR = os.path.join('steamapps', 'servermanager_held_links')
+HELD_LIST = "links.json"
+
+
+def scan(roots):
+    """
+    List the regular files under the install roots, skipping `steamapps` (SteamCMD's own bookkeeping).
+    Returns:
+        list: (path, os.stat_result) pairs; symlinks are not followed.
+    """
+    files = []
+    for root in roots:
+        for directory, dirnames, filenames in os.walk(root):
+            if directory == root:
+                dirnames[:] = [name for name in dirnames if name != 'steamapps']
+            for name in filenames:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.lstat(path)
+                except OSError:
+                    continue
+                if S_ISREG(stat.st_mode):
+                    files.append((path, stat))
+    return files
+
+
+def find_duplicates(files, cache=None, workers=None, min_size=DEFAULT_MIN_SIZE):
+    """
+    Group files with identical content.
+    Files are taken per inode, so names that are already hard links of each other count once, and
+    only inodes that share their size with another on the same device are hashed.
+    Returns:
+        tuple: (groups, hashed), each group being a list of (paths, stat) inodes with the same content,
+        and hashed the number of inodes whose digest was needed.
+    """
+    inodes = {}  # (device, inode) -> (paths, stat)
+    for path, stat in files:
+        if stat.st_size >= min_size:
+            inodes.setdefault((stat.st_dev, stat.st_ino), ([], stat))[0].append(path)
+    by_size = collections.defaultdict(list)
+    for paths, stat in inodes.values():
+        by_size[(stat.st_dev, stat.st_size)].append((paths, stat))
+    candidates = [entry for entries in by_size.values() if len(entries) > 1 for entry in entries]
+    digests = hash_files([(paths[0], stat) for paths, stat in candidates], cache, workers)
+
+    by_content = collections.defaultdict(list)
+    for paths, stat in candidates:
+        if paths[0] in digests:
+            by_content[(stat.st_dev, digests[paths[0]])].append((paths, stat))
+    return [group for group in by_content.values() if len(group) > 1], len(candidates)
+
+
+def _unchanged(path, stat):
+    try:
+        current = os.lstat(path)
+    except OSError:
+        return False
+    return (current.st_ino, current.st_size, current.st_mtime_ns) == (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def link_file(canonical, duplicate, mode="auto"):
+    """
+    Replace `duplicate` with a reflink or a hard link to `canonical`, atomically.
+    Returns:
+        str: "reflink" or "hardlink".
+    Raises:
+        OSError: The link could not be made; `duplicate` is left as it was.
+    """
+    tmp_path = os.path.join(os.path.dirname(duplicate), f".{os.path.basename(duplicate)}{LINK_SUFFIX}")
+    try:
+        if mode in ("auto", "reflink"):
+            try:
+                clone_file(canonical, tmp_path)
+                shutil.copystat(duplicate, tmp_path)
+                os.replace(tmp_path, duplicate)
+                return "reflink"
+            except OSError:
+                if mode == "reflink":
+                    raise
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+        os.link(canonical, tmp_path)
+        os.replace(tmp_path, duplicate)
+        return "hardlink"
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def dedupe(roots, mode="auto", min_size=DEFAULT_MIN_SIZE, workers=None, dry_run=False, cache=None):
+    """
+    Collapse identical files across install roots into reflinks (copy-on-write, so updating one
+    copy never touches the others) or, where the filesystem cannot clone, hard links.
+    Args:
+        roots (list): Install directories to deduplicate across.
+        mode (str): "auto" (reflink, else hard link), "reflink" or "hardlink".
+        min_size (int): Smallest file considered, in bytes.
+        workers (int): Hashing processes.
+        dry_run (bool): Only report what would be reclaimed.
+        cache (HashCache): Digests reused across runs; the default cache when omitted.
+    Returns:
+        dict: files, hashed, duplicates, linked (by method), reclaimed bytes and errors.
+    """
+    cache = cache if cache is not None else HashCache()
+    with metrics.span("dedupe.scan"):
+        files = scan(roots)
+    groups, hashed = find_duplicates(files, cache, workers, min_size)
+    cache.save()
+
+    report = {"files": len(files), "hashed": hashed, "duplicates": 0, "linked": {}, "reclaimed": 0, "errors": 0}
+    for group in groups:
+        # Keep the inode with the most names, so existing links are extended rather than split
+        group.sort(key=lambda entry: (-len(entry[0]), entry[0][0]))
+        canonical_paths, canonical_stat = group[0]
+        canonical = canonical_paths[0]
+        for paths, stat in group[1:]:
+            report["duplicates"] += len(paths)
+            # The blocks are only freed once every name of the inode is relinked, including any outside the roots
+            reclaimable = stat.st_size if stat.st_nlink == len(paths) else 0
+            if dry_run:
+                report["reclaimed"] += reclaimable
+                continue
+            relinked = 0
+            for path in paths:
+                if not (_unchanged(canonical, canonical_stat) and _unchanged(path, stat)):
+                    continue  # Modified since it was hashed
+                try:
+                    method = link_file(canonical, path, mode)
+                except OSError as e:
+                    logging.warning(f"Could not link {path} to {canonical}: {e}")
+                    report["errors"] += 1
+                    continue
+                report["linked"][method] = report["linked"].get(method, 0) + 1
+                relinked += 1
+            if relinked == len(paths):
+                report["reclaimed"] += reclaimable
+    metrics.inc("dedupe.reclaimed_bytes", report["reclaimed"])
+    logging.info(f"Deduplicated {report['duplicates']} files across {len(roots)} roots: "
+                 f"{report['reclaimed'] / 1048576:.0f} MiB {'reclaimable' if dry_run else 'reclaimed'}")
+    return report
+
+
+def break_links(root):
+    """
+    Give every hard-linked file under `root` its own copy before SteamCMD writes to it, so an
+    update to this install can never change the same file in another one. Reflinked files are
+    copy-on-write already and are left alone.
+
+    The private copy is a reflink where the filesystem can clone, which costs no I/O; elsewhere it
+    is a full copy, the price of hard-link dedupe on every update. The shared inode is held in
+    `steamapps`, and `restore_links` links the files the update left alone back to it, so the
+    space dedupe reclaimed is not lost for good.
+    Returns:
+        int: The number of files unlinked.
+    """
+    restore_links(root)  # Left over from a run that never finished
+    held_dir = os.path.join(root, HELD_DIR)
+    held, copied = {}, 0
+    try:
+        for path, stat in scan([root]):
+            if stat.st_nlink < 2:
+                continue
+            os.makedirs(held_dir, exist_ok=True)
+            held_path = os.path.join(held_dir, str(len(held)))
+            tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}{LINK_SUFFIX}")
+            os.link(path, held_path)
+            try:
+                if copy_file(path, tmp_path) != "reflink":
+                    copied += stat.st_size
+                shutil.copystat(path, tmp_path)
+                os.replace(tmp_path, path)
+            except OSError:
+                os.unlink(held_path)
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            private = os.lstat(path)
+            held[os.path.basename(held_path)] = [os.path.relpath(path, root), private.st_size, private.st_mtime_ns]
+    finally:
+        if held:
+            with open(os.path.join(held_dir, HELD_LIST), 'w', encoding='utf-8') as f:
+                json.dump(held, f)
+    if held:
+        logging.info(f"Unlinked {len(held)} deduplicated files in {root} before updating it "
+                     f"({copied / 1048576:.0f} MiB copied)")
+        metrics.inc("dedupe.unlinked", len(held))
+        metrics.inc("dedupe.unlinked_bytes", copied)
+    return len(held)
+
+
+def restore_links(root):
+    """
+    Undo `break_links` for the files SteamCMD did not rewrite (same size and mtime as their private
+    copy), linking them back to the inode they shared; call after SteamCMD has finished.
+    Returns:
+        int: The number of files relinked.
+    """
+    held_dir = os.path.join(root, HELD_DIR)
+    try:
+        with open(os.path.join(held_dir, HELD_LIST), 'r', encoding='utf-8') as f:
+            held = json.load(f)
+    except (OSError, ValueError):
+        held = {}
+    restored = 0
+    for name, (relative, size, mtime_ns) in held.items():
+        held_path, path = os.path.join(held_dir, name), os.path.join(root, relative)
+        try:
+            current = os.lstat(path)
+        except OSError:
+            current = None
+        try:
+            if current is not None and (current.st_size, current.st_mtime_ns) == (size, mtime_ns):
+                os.replace(held_path, path)
+                restored += 1
+            else:
+                os.unlink(held_path)  # Updated: this install now has its own version of the file
+        except FileNotFoundError:
+            continue
+    if os.path.isdir(held_dir):
+        shutil.rmtree(held_dir, ignore_errors=True)
+    if restored:
+        logging.info(f"Relinked {restored} of {len(held)} deduplicated files in {root} the update left unchanged")
+        metrics.inc("dedupe.relinked", restored)
+    return restored
@@ -0,0 +1,325 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from Metrics import metrics
+
+CHUNK_SIZE = 1024 * 1024
+MIN_SEGMENT_SIZE = 8 * 1024 * 1024
+
+
+class DownloadError(Exception):
+    pass
+
+
+class ChecksumMismatch(DownloadError):
+    pass
+
+
+class Downloader:
+    """
+    Downloads a URL to a file in large chunks, resuming where an interrupted download stopped.
+
+    Data is written to `<dest>.part`; the byte ranges already on disk are recorded next to it in
+    `<dest>.part.json` so a later call (or a retry after a dropped connection) continues with HTTP
+    Range requests instead of starting over. When the server supports ranges and the file is big
+    enough, `segments` ranges are fetched in parallel. The finished file is checked against the
+    expected SHA-256 before it is moved to `dest`.
+    """
+
+    def __init__(self, session=None, chunk_size=CHUNK_SIZE, segments=1, min_segment_size=MIN_SEGMENT_SIZE,
+                 retries=3, timeout=30):
+        """
+        Args:
+            session (requests.Session): Session to reuse connections from; one is created if omitted.
+            chunk_size (int): Bytes read from the socket and written to disk at a time.
+            segments (int): Most ranges downloaded in parallel.
+            min_segment_size (int): Smallest range worth a connection of its own.
+            retries (int): Attempts per range before giving up.
+            timeout (float): Connect/read timeout in seconds.
+        """
+        self.session = session or requests.Session()
+        self.chunk_size = chunk_size
+        self.segments = max(1, segments)
+        self.min_segment_size = min_segment_size
+        self.retries = retries
+        self.timeout = timeout
+
+    def download(self, url, dest, sha256=None, on_progress=None, on_data=None):
+        """
+        Download `url` to `dest`.
+        Args:
+            url (str): The file to fetch.
+            dest (str): Where to store it; replaced atomically once complete and verified.
+            sha256 (str): Expected hex digest, or None to skip verification.
+            on_progress (callable): Called with (bytes_done, bytes_total) as data arrives; the total is
+                0 when the server does not report a length. Called from download threads.
+            on_data (callable): Called with (offset, chunk) for every byte of the file in order, including
+                the part already on disk when resuming, so a consumer can process the file as it arrives.
+                The offset goes back to 0 if the server restarts the file. Forces a single segment.
+        Returns:
+            str: The SHA-256 hex digest of the downloaded file.
+        """
+        part_path = dest + ".part"
+        state_path = part_path + ".json"
+        total, etag, ranges_supported = self._probe(url)
+        state = self._load_state(state_path, url, total, etag) if os.path.exists(part_path) else None
+        if state is not None and on_data is not None and len(state["segments"]) > 1:
+            state = None  # Segments finish out of order; a streaming consumer needs the file front to back
+
+        if state is None:
+            if total and ranges_supported and on_data is None:
+                count = min(self.segments, max(1, total // self.min_segment_size))
+            else:
+                count = 1
+            size = total // count if total else 0
+            state = {"url": url, "total": total, "etag": etag,
+                     "segments": [[i * size, (i + 1) * size if i < count - 1 else total, i * size]
+                                  for i in range(count)]}
+            with open(part_path, 'wb') as f:
+                if total:
+                    f.truncate(total)
+        elif not ranges_supported:
+            # Nothing to resume from without Range support
+            for segment in state["segments"]:
+                segment[2] = segment[0]
+
+        progress = _Progress(total, on_progress)
+        progress.add(sum(segment[2] - segment[0] for segment in state["segments"]), received=False)
+        digest = None
+        try:
+            if len(state["segments"]) == 1:
+                digest = self._fetch_segment(url, part_path, state["segments"][0], etag, progress,
+                                             hash_stream=True, on_data=on_data)
+            else:
+                with ThreadPoolExecutor(max_workers=len(state["segments"])) as pool:
+                    futures = [pool.submit(self._fetch_segment, url, part_path, segment, etag, progress)
+                               for segment in state["segments"]]
+                    for future in futures:
+                        future.result()
+        except BaseException:
+            self._save_state(state_path, state)
+            raise
+
+        if digest is None:
+            digest = file_sha256(part_path, self.chunk_size)
+        if sha256 and digest.lower() != sha256.lower():
+            os.remove(part_path)
+            self._remove_state(state_path)
+            raise ChecksumMismatch(f"{url}: expected SHA-256 {sha256}, got {digest}")
+        os.replace(part_path, dest)
+        self._remove_state(state_path)
+        logging.info(f"Downloaded {url} ({progress.done} bytes in {progress.elapsed:.1f}s)")
+        return digest
+
+    def _probe(self, url):
+        """Returns (content length or 0, ETag, whether byte ranges are accepted)."""
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logging.debug(f"HEAD {url} failed, downloading without resume support: {e}")
+            return 0, None, False
+        total = int(response.headers.get('Content-Length') or 0)
+        ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+        return total, response.headers.get('ETag'), ranges and total > 0
+
+    def _fetch_segment(self, url, part_path, segment, etag, progress, hash_stream=False, on_data=None):
+        """
+        Download the rest of one [start, end) range, updating segment[2] (the next offset) as it goes.
+        With `hash_stream` the segment must be the whole file; its digest is computed on the fly and
+        returned, and `on_data` sees every chunk.
+        """
+        start, end, _ = segment
+        hasher = hashlib.sha256() if hash_stream else None
+        if hasher is not None and segment[2] > start:
+            # Resuming: hash what is already on disk before appending to it
+            with open(part_path, 'rb') as f:
+                _hash_range(f, hasher, start, segment[2], self.chunk_size, on_data)
+
+        attempt = 0
+        while not end or segment[2] < end:
+            headers = {}
+            if segment[2] > 0 or end:
+                headers['Range'] = f"bytes={segment[2]}-{end - 1 if end else ''}"
+                if etag:
+                    headers['If-Range'] = etag
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206 and segment[2] > 0:
+                        # The server sent the whole file (it changed, or ignores ranges); only a
+                        # single whole-file stream can start over
+                        if start > 0 or hasher is None:
+                            raise DownloadError(f"{url} did not honour the requested byte range")
+                        progress.rewind(segment[2])
+                        segment[2] = 0
+                        hasher = hashlib.sha256()
+                    with open(part_path, 'r+b') as f:
+                        f.seek(segment[2])
+                        for chunk in response.iter_content(self.chunk_size):
+                            if end:
+                                chunk = chunk[:end - segment[2]]
+                            f.write(chunk)
+                            if hasher is not None:
+                                hasher.update(chunk)
+                                if on_data is not None:
+                                    on_data(segment[2], chunk)
+                            segment[2] += len(chunk)
+                            progress.add(len(chunk))
+                            if end and segment[2] >= end:
+                                break
+                        if not end:
+                            f.truncate(segment[2])
+                if not end:
+                    break  # Length unknown: the stream ending is the end of the file
+                if segment[2] < end:
+                    # The body ended early without an error, e.g. a chunked response cut short
+                    raise requests.RequestException(f"the response ended at byte {segment[2]}")
+            except requests.RequestException as e:
+                attempt += 1
+                if attempt > self.retries:
+                    raise DownloadError(f"Downloading {url} failed: {e}") from e
+                logging.warning(f"Download of {url} interrupted at byte {segment[2]}, retrying ({attempt}): {e}")
+                time.sleep(min(2 ** attempt, 10))
+        return hasher.hexdigest() if hasher is not None else None
+
+    @staticmethod
+    def _load_state(state_path, url, total, etag):
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("url") != url or state.get("total") != total or state.get("etag") != etag or not total:
+            return None
+        return state
+
+    @staticmethod
+    def _save_state(state_path, state):
+        try:
+            with open(state_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+        except OSError as e:
+            logging.warning(f"Could not save download state {state_path}: {e}")
+
+    @staticmethod
+    def _remove_state(state_path):
+        try:
+            os.remove(state_path)
+        except FileNotFoundError:
+            pass
+
+
+class _Progress:
+    """Bytes downloaded across all segments, reported to one callback."""
+
+    def __init__(self, total, callback):
+        self.total = total
+        self.callback = callback
+        self.done = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def add(self, count, received=True):
+        """Count `count` more bytes as done; `received` is False for bytes resumed from an earlier run."""
+        if received:
+            metrics.inc("download.bytes", count)
+        self._update(count)
+
+    def rewind(self, count):
+        """Take back bytes that have to be downloaded again; only the display goes back, never the counter."""
+        self._update(-count)
+
+    def _update(self, count):
+        with self._lock:
+            self.done += count
+            done = self.done
+        if self.callback is not None:
+            self.callback(done, self.total)
+
+
+def _hash_range(f, hasher, start, end, chunk_size, on_data=None):
+    f.seek(start)
+    offset = start
+    while offset < end:
+        data = f.read(min(chunk_size, end - offset))
+        if not data:
+            break
+        hasher.update(data)
+        if on_data is not None:
+            on_data(offset, data)
+        offset += len(data)
+
+
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+if __name__ == "__main__":
+    # Download a random file from a local server that supports ranges, with and without segments,
+    # and resume after an interrupted first attempt
+    import http.server
+    import re
+    import tempfile
+
+    payload = os.urandom(40 * 1024 * 1024)
+    expected = hashlib.sha256(payload).hexdigest()
+    fail_after = [12 * 1024 * 1024]
+
+    class RangeHandler(http.server.BaseHTTPRequestHandler):
+        def do_HEAD(self):
+            self._respond(body=False)
+
+        def do_GET(self):
+            self._respond(body=True)
+
+        def _respond(self, body):
+            start, end = 0, len(payload)
+            match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get('Range', ''))
+            if match:
+                start = int(match.group(1))
+                end = int(match.group(2)) + 1 if match.group(2) else len(payload)
+                self.send_response(206)
+                self.send_header('Content-Range', f"bytes {start}-{end - 1}/{len(payload)}")
+            else:
+                self.send_response(200)
+            self.send_header('Content-Length', str(end - start))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('ETag', '"demo"')
+            self.end_headers()
+            if body:
+                limit = end
+                if fail_after[0]:
+                    limit, fail_after[0] = min(end, start + fail_after[0]), 0
+                self.wfile.write(payload[start:limit])
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/steamcmd.zip"
+    logging.basicConfig(level=logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        for segments in (1, 4):
+            dest = os.path.join(tmp, f"download_{segments}.bin")
+            fail_after[0] = 12 * 1024 * 1024
+            started = time.perf_counter()
+            Downloader(segments=segments, retries=1).download(url, dest, sha256=expected)
+            print(f"{segments} segment(s): {time.perf_counter() - started:.2f}s, verified")
+    server.shutdown()
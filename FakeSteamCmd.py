@@ -0,0 +1,124 @@
+"""
+Stand-in for steamcmd that replays recorded (or synthetic) output.
+
+Point SteamCmdManager at it through the STEAMCMD environment variable, e.g.
+
+    STEAMCMD="python FakeSteamCmd.py --speed 10 --replay install.log"
+
+Options go before the first steamcmd `+command`; `+runscript` files are understood too.
+Recordings are plain steamcmd output; a line may start with `@<seconds> ` to replay it that long
+after the previous line. Without a recording a synthetic download/verify/commit sequence is
+generated. Like the real thing, a successful `app_update` writes
+`steamapps/appmanifest_<appid>.acf` into the `force_install_dir`, and `app_info_print` reports the
+build IDs given with --buildid.
+"""
+import argparse
+import os
+import shlex
+import sys
+import time
+
+
+def _parse_commands(tokens):
+    commands = []
+    for token in tokens:
+        if token.startswith('+'):
+            commands.append([token[1:]])
+        elif commands:
+            commands[-1].append(token)
+    return commands
+
+
+def _script_commands(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [shlex.split(line) for line in f if line.strip() and not line.lstrip().startswith(('@', '//'))]
+
+
+def _synthetic_output(appid, size, steps, validate):
+    yield " Update state (0x3) reconfiguring, progress: 0.00 (0 / 0)"
+    for step in range(steps + 1):
+        done = size * step // steps
+        yield f" Update state (0x61) downloading, progress: {done * 100 / size:.2f} ({done} / {size})"
+    if validate:
+        for step in range(0, steps + 1, max(1, steps // 4)):
+            done = size * step // steps
+            yield f" Update state (0x81) verifying update, progress: {done * 100 / size:.2f} ({done} / {size})"
+    yield f" Update state (0x101) committing, progress: 100.00 ({size} / {size})"
+    yield f"Success! App '{appid}' fully installed."
+
+
+def _recorded_output(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield line.rstrip('\n')
+
+
+def _write_manifest(install_dir, appid, size, buildid):
+    steamapps = os.path.join(install_dir, 'steamapps')
+    os.makedirs(steamapps, exist_ok=True)
+    with open(os.path.join(steamapps, f'appmanifest_{appid}.acf'), 'w', encoding='utf-8') as f:
+        f.write('"AppState"\n{\n')
+        for key, value in (("appid", appid), ("name", f"Fake App {appid}"), ("StateFlags", 4),
+                           ("installdir", os.path.basename(os.path.normpath(install_dir))),
+                           ("LastUpdated", int(time.time())), ("SizeOnDisk", size), ("buildid", buildid)):
+            f.write(f'\t"{key}"\t\t"{value}"\n')
+        f.write('}\n')
+
+
+def _print_app_info(appid, buildid):
+    print(f"AppID : {appid}, change number : 1/0, last change : Thu Jan  1 00:00:00 2026")
+    print(f'"{appid}"\n{{\n\t"common"\n\t{{\n\t\t"name"\t\t"Fake App {appid}"\n\t}}')
+    print('\t"depots"\n\t{\n\t\t"branches"\n\t\t{\n\t\t\t"public"\n\t\t\t{')
+    print(f'\t\t\t\t"buildid"\t\t"{buildid}"\n\t\t\t}}\n\t\t}}\n\t}}\n}}', flush=True)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--replay', help="Recorded steamcmd output to play back")
+    parser.add_argument('--speed', type=float, default=1.0, help="Playback speed multiplier")
+    parser.add_argument('--interval', type=float, default=0.05, help="Seconds between unstamped lines")
+    parser.add_argument('--size', type=int, default=512 * 1024 * 1024, help="Synthetic download size in bytes")
+    parser.add_argument('--steps', type=int, default=40, help="Synthetic progress lines per phase")
+    parser.add_argument('--buildid', action='append', default=[],
+                        help="Build ID reported and installed, either BUILD for every app or APPID=BUILD")
+    parser.add_argument('--exit-code', type=int, default=0)
+    split = next((i for i, arg in enumerate(argv) if arg.startswith('+')), len(argv))
+    options = parser.parse_args(argv[:split])
+    builds = dict(entry.split('=', 1) if '=' in entry else ('*', entry) for entry in options.buildid)
+
+    print("Redirecting stderr to 'logs/stderr.txt'")
+    print("Loading Steam API...OK")
+    install_dir = os.getcwd()
+    commands = _parse_commands(argv[split:])
+    while commands:
+        command = commands.pop(0)
+        name, args = command[0], command[1:]
+        if name == 'runscript' and args:
+            commands[:0] = _script_commands(args[0])
+            continue
+        if name == 'login':
+            print(f"Logging in user '{args[0] if args else 'anonymous'}' to Steam Public...OK")
+        elif name == 'force_install_dir' and args:
+            install_dir = args[0]
+        elif name == 'app_update' and args:
+            appid, validate = args[0], 'validate' in args[1:]
+            lines = (_recorded_output(options.replay) if options.replay
+                     else _synthetic_output(appid, options.size, options.steps, validate))
+            for line in lines:
+                delay = options.interval
+                if line.startswith('@'):
+                    stamp, _, line = line.partition(' ')
+                    delay = float(stamp[1:])
+                time.sleep(delay / options.speed)
+                print(line, flush=True)
+            if options.exit_code == 0:
+                _write_manifest(install_dir, appid, options.size, builds.get(appid, builds.get('*', "1000")))
+        elif name == 'app_info_print' and args:
+            _print_app_info(args[0], builds.get(args[0], builds.get('*', "1000")))
+        elif name == 'quit':
+            break
+    return options.exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from AppListCache import default_cache_dir
+from Metrics import metrics
+
+HASH_CHUNK = 1024 * 1024
+MMAP_WINDOW = 64 * 1024 * 1024  # Bytes of a mapped file hashed per update() call
+
+
+def hash_file(path):
+    """SHA-256 of a file, as a hex string; the file is memory-mapped and hashed straight from the page cache."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                for offset in range(0, len(view), MMAP_WINDOW):
+                    digest.update(view[offset:offset + MMAP_WINDOW])
+        except (ValueError, OSError):
+            # Empty files cannot be mapped; nor can some special and network files
+            f.seek(0)
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _hash_or_none(path):
+    try:
+        return hash_file(path)
+    except OSError:
+        return None
+
+
+class HashCache:
+    """
+    File digests remembered across runs, keyed by absolute path and trusted while the file's size
+    and mtime are unchanged, so repeated passes over the same install only hash what changed.
+    """
+
+    FILE = "filehashes.json"
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(default_cache_dir(), self.FILE)
+        self._entries = None  # abs path -> [size, mtime_ns, digest]
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def get(self, path, stat):
+        """The cached digest of `path`, or None if it is unknown or the file changed since."""
+        with self._lock:
+            entry = self._load().get(os.path.abspath(path))
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        return None
+
+    def put(self, path, stat, digest):
+        with self._lock:
+            self._load()[os.path.abspath(path)] = [stat.st_size, stat.st_mtime_ns, digest]
+            self._dirty = True
+
+    def save(self):
+        """Write the cache back if anything was added; forgets files that no longer exist."""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = {path: entry for path, entry in self._entries.items() if os.path.exists(path)}
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._entries = entries
+            self._dirty = False
+
+
+def hash_files(files, cache=None, workers=None):
+    """
+    Hash many files, reusing cached digests and spreading the rest over a process pool.
+    Args:
+        files (list): (path, os.stat_result) pairs.
+        cache (HashCache): Digests to reuse and to remember new ones in.
+        workers (int): Hashing processes; defaults to the CPU count.
+    Returns:
+        dict: path -> hex SHA-256; files that could not be read are left out.
+    """
+    digests, missing = {}, []
+    for path, stat in files:
+        digest = cache.get(path, stat) if cache is not None else None
+        if digest is None:
+            missing.append((path, stat))
+        else:
+            digests[path] = digest
+    metrics.inc("hash.cache_hits", len(digests))
+    if not missing:
+        return digests
+
+    workers = workers or os.cpu_count() or 1
+    with metrics.span("hash.files"), ProcessPoolExecutor(max_workers=workers) as pool:
+        # Hashing is CPU-bound, so separate processes; chunks keep the per-file IPC small
+        chunksize = max(1, len(missing) // (workers * 8))
+        results = pool.map(_hash_or_none, [path for path, _ in missing], chunksize=chunksize)
+        for (path, stat), digest in zip(missing, results):
+            if digest is None:
+                logging.warning(f"Could not read {path}")
+                continue
+            digests[path] = digest
+            if cache is not None:
+                cache.put(path, stat, digest)
+    metrics.inc("hash.files", len(missing))
+    metrics.inc("hash.bytes", sum(stat.st_size for _, stat in missing))
+    return digests
@@ -0,0 +1,266 @@
+import itertools
+import logging
+import os
+import threading
+import time
+
+from LogPipeline import job_context
+from Metrics import metrics
+from ServerManager import ServerManager
+
+PENDING = "Pending"
+RUNNING = "Running"
+SUCCEEDED = "Succeeded"
+FAILED = "Failed"
+
+# Which resource a job is loading while SteamCMD reports a phase
+PHASE_RESOURCES = {
+    None: "network",  # Not reported yet; about to download
+    "queued": None,  # Waiting for its turn inside a batched SteamCMD session
+    "reconfiguring": "disk",
+    "preallocating": "disk",
+    "downloading": "network",
+    "verifying": "disk",
+    "committing": "disk",
+}
+
+
+def read_targets(path):
+    """
+    Read a batch file with one "<appid> <install path>" per line; blank lines and # comments are skipped.
+    Returns:
+        list: (appid, install_path) pairs.
+    """
+    targets = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                appid, _, install_path = line.partition(' ')
+                targets.append((appid, os.path.normpath(install_path.strip())))
+    return targets
+
+
+class InstallJob:
+    """One install/update of an app into a directory, with its live progress and outcome."""
+
+    def __init__(self, job_id, appid, install_path, validate=False):
+        self.job_id = job_id
+        self.appid = str(appid)
+        self.install_path = install_path
+        self.validate = validate
+        self.status = PENDING
+        self.action = None
+        self.phase = None
+        self.percent = 0.0
+        self.rate = 0.0
+        self.eta = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def resource(self):
+        return PHASE_RESOURCES.get(self.phase, "disk")
+
+    @property
+    def duration(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def update_progress(self, model):
+        self.phase = model.phase
+        self.percent = model.overall_percent
+        self.rate = model.rate
+        self.eta = model.eta
+
+
+class JobScheduler:
+    """
+    Runs many install/update jobs concurrently.
+
+    A job is admitted while fewer than `max_jobs` are running and both the network and the disk
+    have spare capacity: jobs count against `max_network` while SteamCMD downloads and against
+    `max_disk` while it preallocates, verifies or commits. A running SteamCMD process cannot be
+    paused, so the limits gate when new jobs start rather than interrupting running ones.
+
+    With `batch_size` above one, up to that many pending jobs share a single SteamCMD session
+    (one login, one startup); they run one after another inside it.
+    """
+
+    def __init__(self, max_jobs=4, max_network=2, max_disk=2, batch_size=1, runner=ServerManager.run_job,
+                 batch_runner=ServerManager.run_batch, on_finished=None, on_update=None):
+        """
+        Args:
+            max_jobs (int): Jobs (or batched sessions) running at once.
+            max_network (int): Running jobs allowed to be downloading.
+            max_disk (int): Running jobs allowed to be in a disk-bound phase.
+            batch_size (int): Most jobs to run in one SteamCMD session.
+            runner (callable): runner(appid, install_path, on_progress, validate) -> (action, returncode, model).
+            batch_runner (callable): batch_runner(targets, on_progress, validate) ->
+                [(action, returncode, model), ...], where on_progress takes (target index, model).
+            on_finished (callable): Called with each job once it has finished, from the job's thread.
+            on_update (callable): Called with a job whenever its status or progress changes, from the
+                thread that changed it; hand it to the UI through something like ProgressHub.post.
+        """
+        self.max_jobs = max_jobs
+        self.max_network = max_network
+        self.max_disk = max_disk
+        self.batch_size = batch_size
+        self.runner = runner
+        self.batch_runner = batch_runner
+        self.on_finished = on_finished
+        self.on_update = on_update
+        self._jobs = []
+        self._ids = itertools.count(1)
+        self._condition = threading.Condition()
+        self._closed = False
+        threading.Thread(target=self._schedule, name="job-scheduler", daemon=True).start()
+
+    def submit(self, appid, install_path, validate=False):
+        """Queue one job and return it."""
+        return self.submit_many([(appid, install_path)], validate)[0]
+
+    def submit_many(self, targets, validate=False):
+        """
+        Queue jobs for many servers at once.
+        Args:
+            targets (iterable): (appid, install_path) pairs.
+            validate (bool): Fully validate installed servers instead of skipping those already on the latest build.
+        Returns:
+            list: The queued InstallJob objects.
+        """
+        with self._condition:
+            jobs = [InstallJob(next(self._ids), appid, install_path, validate) for appid, install_path in targets]
+            self._jobs.extend(jobs)
+            self._condition.notify_all()
+        return jobs
+
+    def jobs(self):
+        """A snapshot of every job submitted so far, in submission order."""
+        with self._condition:
+            return list(self._jobs)
+
+    def wait(self, timeout=None):
+        """
+        Block until every submitted job has finished.
+        Returns:
+            bool: False if `timeout` seconds passed first.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: all(job.status in (SUCCEEDED, FAILED) for job in self._jobs),
+                                            timeout)
+
+    def clear_finished(self):
+        """Forget finished jobs, so a long-running process does not keep every job it ever ran."""
+        with self._condition:
+            self._jobs = [job for job in self._jobs if job.status not in (SUCCEEDED, FAILED)]
+
+    def shutdown(self):
+        """Stop starting new jobs; running ones finish on their own."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _can_start(self):
+        running = [job for job in self._jobs if job.status == RUNNING and job.resource is not None]
+        if len(running) >= self.max_jobs:
+            return False
+        network = sum(1 for job in running if job.resource == "network")
+        disk = len(running) - network
+        return network < self.max_network and disk < self.max_disk
+
+    def _schedule(self):
+        while True:
+            with self._condition:
+                while not self._closed:
+                    pending = [job for job in self._jobs if job.status == PENDING]
+                    # A session either validates every app or none of them
+                    pending = [job for job in pending if job.validate == pending[0].validate]
+                    pending = pending[:max(1, self.batch_size)]
+                    if pending and self._can_start():
+                        break
+                    # Woken on submit and job completion; the timeout catches phase changes
+                    self._condition.wait(timeout=0.5)
+                if self._closed:
+                    return
+                for job in pending:
+                    job.status = RUNNING
+                for job in pending[1:]:
+                    job.phase = "queued"
+                pending[0].started_at = time.monotonic()
+            for job in pending:
+                self._notify(job)
+            if len(pending) == 1:
+                target, args = self._run, (pending[0],)
+            else:
+                target, args = self._run_batch, (pending,)
+            threading.Thread(target=target, args=args, name=f"job-{pending[0].job_id}", daemon=True).start()
+
+    def _run(self, job):
+        with job_context(job.appid, job.install_path):
+            try:
+                job.action, returncode, model = self.runner(job.appid, job.install_path,
+                                                            lambda model: self._progress(job, model), job.validate)
+                self._finish(job, ServerManager.succeeded(returncode, model),
+                             model.error or f"SteamCMD exited with code {returncode}")
+            except Exception as e:
+                self._finish(job, False, str(e))
+
+    def _run_batch(self, jobs):
+        def on_progress(index, model):
+            job = jobs[index]
+            if job.started_at is None:
+                job.started_at = time.monotonic()
+            self._progress(job, model)
+            if model.finished and job.status == RUNNING:
+                # Report each app as soon as SteamCMD prints its result, not when the session ends;
+                # an error naming no app may still be followed by the app's success
+                self._finish(job, model.succeeded and model.error is None, model.error)
+
+        try:
+            results = self.batch_runner([(job.appid, job.install_path) for job in jobs], on_progress,
+                                        jobs[0].validate)
+        except Exception as e:
+            for job in jobs:
+                if job.status == RUNNING:
+                    self._finish(job, False, str(e))
+            return
+        for job, (action, returncode, model) in zip(jobs, results):
+            job.action = action
+            if job.status == RUNNING:
+                self._finish(job, ServerManager.succeeded(returncode, model),
+                             model.error or f"SteamCMD exited with code {returncode}")
+
+    def _progress(self, job, model):
+        job.update_progress(model)
+        self._notify(job)
+
+    def _notify(self, job):
+        if self.on_update is not None:
+            self.on_update(job)
+
+    def _finish(self, job, succeeded, error):
+        if job.action == "skip":
+            job.phase = "up to date"
+        if succeeded:
+            job.status, job.percent = SUCCEEDED, 100.0
+        else:
+            job.status, job.error = FAILED, error
+        if job.started_at is None:
+            job.started_at = time.monotonic()
+        job.finished_at = time.monotonic()
+        metrics.inc(f"jobs.{job.status.lower()}")
+        if job.action == "skip":
+            metrics.inc("jobs.skipped")
+        metrics.observe("job.duration", job.duration)
+        if job.status == FAILED:
+            logging.error(f"Job {job.job_id} (app {job.appid} in {job.install_path}) failed: {job.error}")
+        else:
+            logging.info(f"Job {job.job_id} (app {job.appid} in {job.install_path}) finished in {job.duration:.0f}s")
+        with self._condition:
+            self._condition.notify_all()
+        self._notify(job)
+        if self.on_finished is not None:
+            self.on_finished(job)
@@ -0,0 +1,155 @@
+"""
+One logging pipeline for the whole application.
+
+Every logger hands its records to a QueueHandler, which only tags the record with the current job
+and puts it on a queue; a single QueueListener thread formats the records and writes them to the
+sinks (stderr, the console widget, a rotating log file). Emitting a message therefore never blocks
+on I/O or the Tk thread and never starts a thread of its own.
+"""
+import atexit
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+from AppListCache import default_cache_dir
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(job)s%(message)s'
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+# (appid, install_path) of the job the current thread is working on
+_job = contextvars.ContextVar('job', default=None)
+_listener = None
+
+
+def default_log_file():
+    return os.path.join(default_cache_dir(), "logs", "servermanager.log")
+
+
+def set_job_context(appid, install_path):
+    """Tag the records logged from this thread with a job; returns a token for `reset_job_context`."""
+    return _job.set((str(appid), install_path))
+
+
+def reset_job_context(token):
+    _job.reset(token)
+
+
+@contextlib.contextmanager
+def job_context(appid, install_path):
+    """Tag every record logged inside the block with the app ID and install path of a job."""
+    token = set_job_context(appid, install_path)
+    try:
+        yield
+    finally:
+        reset_job_context(token)
+
+
+class JobContextFilter(logging.Filter):
+    """Adds `appid`, `install_path` and a printable `job` prefix to every record."""
+
+    def filter(self, record):
+        context = _job.get()
+        if context is None:
+            record.appid = record.install_path = None
+            record.job = ""
+        else:
+            record.appid, record.install_path = context
+            record.job = f"[app {context[0]} @ {context[1]}] "
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record, so log files can be filtered by job without parsing the text."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "appid": getattr(record, "appid", None),
+            "install_path": getattr(record, "install_path", None),
+            "message": record.getMessage(),
+        }
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def stream_sink(stream, level=logging.NOTSET):
+    """A human-readable sink writing to any file-like object, e.g. stderr or the ConsoleText widget."""
+    handler = logging.StreamHandler(stream)
+    handler.setLevel(level)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+
+def file_sink(path=None, max_bytes=LOG_FILE_MAX_BYTES, backup_count=LOG_FILE_BACKUPS, level=logging.NOTSET):
+    """A rotating JSON-lines log file."""
+    path = path or default_log_file()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                   encoding='utf-8', delay=True)
+    handler.setLevel(level)
+    handler.setFormatter(JsonLinesFormatter())
+    return handler
+
+
+def setup_logging(level=logging.INFO, stream=sys.stderr, log_file=None):
+    """
+    Route the root logger through the queue and start the listener thread.
+    Calling it again replaces the previous pipeline.
+    Args:
+        level (int): Lowest level that is logged.
+        stream: File-like object for human-readable output, or None for none.
+        log_file (str): Rotating log file; defaults to `default_log_file()`, False disables it.
+    Returns:
+        logging.handlers.QueueListener: The running listener.
+    """
+    global _listener
+    stop_logging()
+    sinks = []
+    if stream is not None:
+        sinks.append(stream_sink(stream))
+    if log_file is not False:
+        try:
+            sinks.append(file_sink(log_file))
+        except OSError as e:
+            sys.__stderr__.write(f"Logging to a file is disabled: {e}\n")
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(JobContextFilter())
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *sinks, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def add_sink(handler):
+    """Attach another sink to the running pipeline, starting the pipeline if needed."""
+    if _listener is None:
+        setup_logging()
+    _listener.handlers = _listener.handlers + (handler,)
+
+
+def stop_logging():
+    """Write out every queued record and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,163 @@
+"""
+Process-wide timers and counters.
+
+Code marks work with `metrics.span("api.fetch")` (a context manager) and counts things with
+`metrics.inc("download.bytes", n)`. While metrics are disabled both return immediately, so the
+instrumentation can stay in hot paths. Enabled metrics can be dumped as JSON or written in the
+Prometheus text format (e.g. for node_exporter's textfile collector).
+
+Setting the SERVERMANAGER_METRICS_DIR environment variable enables metrics at startup and writes
+`metrics.json` and `servermanager.prom` into that directory when the process exits.
+"""
+import atexit
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+PROMETHEUS_PREFIX = "servermanager_"
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.json_path = None
+        self.prometheus_path = None
+        self._counters = {}
+        self._timers = {}  # name -> [count, total seconds, max seconds]
+        self._lock = threading.Lock()
+
+    def enable(self, json_path=None, prometheus_path=None):
+        """
+        Start collecting.
+        Args:
+            json_path (str): File `flush()` writes the JSON dump to.
+            prometheus_path (str): File `flush()` writes the Prometheus text format to.
+        """
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self.enabled = True
+
+    def span(self, name):
+        """Time a block: `with metrics.span("api.sort"): ...`."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def observe(self, name, seconds):
+        """Record one duration of `name`."""
+        if not self.enabled:
+            return
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                self._timers[name] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+
+    def inc(self, name, value=1):
+        """Add to the counter `name`."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: {"counters": {name: value}, "timers": {name: {"count", "total", "max", "mean"}}}
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            timers = {name: {"count": count, "total": total, "max": maximum, "mean": total / count}
+                      for name, (count, total, maximum) in self._timers.items()}
+        return {"counters": counters, "timers": timers}
+
+    def to_json(self):
+        return json.dumps(dict(self.snapshot(), timestamp=time.time()), indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        """The metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            metric = _prometheus_name(name) + "_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, timer in sorted(snapshot["timers"].items()):
+            metric = _prometheus_name(name) + "_seconds"
+            lines += [f"# TYPE {metric} summary", f"{metric}_sum {timer['total']:.6f}",
+                      f"{metric}_count {timer['count']}",
+                      f"# TYPE {metric}_max gauge", f"{metric}_max {timer['max']:.6f}"]
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        """Write the configured JSON and Prometheus files; each is replaced atomically."""
+        if not self.enabled:
+            return
+        if self.json_path:
+            _write_atomic(self.json_path, self.to_json())
+        if self.prometheus_path:
+            _write_atomic(self.prometheus_path, self.to_prometheus())
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+
+def _prometheus_name(name):
+    return PROMETHEUS_PREFIX + re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    # Scrapers must never see a half-written file
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+metrics = Metrics()
+
+_metrics_dir = os.environ.get("SERVERMANAGER_METRICS_DIR")
+if _metrics_dir:
+    metrics.enable(os.path.join(_metrics_dir, "metrics.json"), os.path.join(_metrics_dir, "servermanager.prom"))
+atexit.register(metrics.flush)
@@ -1,18 +1,6 @@
-import logging
 import tkinter as tk
 
 
-def _log_message(msg, level=logging.INFO):
-    log_levels = {
-        logging.INFO: logging.info,
-        logging.ERROR: logging.error,
-        logging.WARNING: logging.warning,
-        logging.DEBUG: logging.debug
-    }
-    log_func = log_levels.get(level, logging.debug)
-    log_func(msg)
-
-
 class PlaceholderEntry(tk.Entry):
     def __init__(self, master=None, placeholder="PLACEHOLDER", color='grey', active_color='white', **kwargs):
         super().__init__(master, **kwargs)
@@ -32,11 +20,8 @@ class PlaceholderEntry(tk.Entry):
         if self.get() == self.placeholder:
             self.delete(0, 'end')
             self['fg'] = self.default_fg_color
-            _log_message("Placeholder Text FocusIn", logging.INFO)
 
     def foc_out(self, *args):
-        print("FocusOut event triggered")
-        _log_message("FocusOut event triggered", logging.INFO)
         if not self.get():
             self.put_placeholder()
 
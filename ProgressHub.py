@@ -0,0 +1,57 @@
+import logging
+import threading
+
+from Metrics import metrics
+
+
+class ProgressHub:
+    """
+    Collects progress events from worker threads and repaints them from one Tk `after()` tick.
+
+    Workers `post()` as often as SteamCMD prints a line; only the latest value per key is kept.
+    At most `fps` times a second the Tk thread hands each topic's changed keys to its renderer in
+    one call, so a burst of events costs one repaint, and no worker ever touches a widget.
+    """
+
+    def __init__(self, window, fps=20):
+        """
+        Args:
+            window (tk.Tk): The window whose event loop drives the tick.
+            fps (int): Most repaints per second.
+        """
+        self.window = window
+        self.interval_ms = max(1, int(1000 / fps))
+        self._renderers = {}
+        self._pending = {}  # topic -> {key: latest value}
+        self._lock = threading.Lock()
+        self.window.after(self.interval_ms, self._tick)
+
+    def subscribe(self, topic, render):
+        """
+        Repaint `topic` with `render(updates)` on the Tk thread.
+        Args:
+            topic (str): The kind of event, e.g. "job".
+            render (callable): Called with {key: latest value} for the keys posted since the last frame.
+        """
+        self._renderers[topic] = render
+
+    def post(self, topic, key, value):
+        """Record the latest progress of `key`; safe to call from any thread."""
+        with self._lock:
+            self._pending.setdefault(topic, {})[key] = value
+        metrics.inc("ui.progress_events")
+
+    def _tick(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            with metrics.span("ui.progress_frame"):
+                for topic, updates in pending.items():
+                    render = self._renderers.get(topic)
+                    if render is None:
+                        continue
+                    try:
+                        render(updates)
+                    except Exception as e:
+                        logging.error(f"Rendering {topic} progress failed: {e}")
+        self.window.after(self.interval_ms, self._tick)
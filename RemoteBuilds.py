@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+
+import Vdf
+from AppListCache import AppListCache
+from SteamCmdManager import SteamCmdManager
+
+
+def parse_app_info(lines, appid):
+    """
+    Extract one app's KeyValues block from `app_info_print` output.
+    Returns:
+        dict: The app's info section, or None if it was not printed.
+    """
+    header = f'"{appid}"'
+    for start, line in enumerate(lines):
+        if line.strip() != header:
+            continue
+        depth = 0
+        for end in range(start + 1, len(lines)):
+            depth += lines[end].count('{') - lines[end].count('}')
+            if depth == 0:
+                try:
+                    return Vdf.get(Vdf.loads('\n'.join(lines[start:end + 1])), str(appid))
+                except Vdf.VdfError:
+                    return None
+    return None
+
+
+class RemoteBuildCache:
+    """
+    Remote build IDs of apps, looked up with SteamCMD's `app_info_print`.
+
+    Lookups for many apps share one SteamCMD session, and answers are kept for `ttl` seconds so
+    a queue of updates does not log in once per app just to compare build IDs.
+    """
+
+    DEFAULT_TTL = 10 * 60
+
+    def __init__(self, ttl=DEFAULT_TTL, branch="public"):
+        self.ttl = ttl
+        self.branch = branch
+        self._builds = {}  # appid -> (fetched_at, buildid)
+        self._pending = {}  # appid -> Event set once the lookup in flight for it has finished
+        self._lock = threading.Lock()
+
+    def get(self, appids):
+        """
+        Return the current remote build ID of each app.
+        The SteamCMD session runs outside the lock, so jobs asking about different apps look them
+        up concurrently; a caller asking about an app another lookup is already fetching waits
+        for that lookup instead of starting its own.
+        Args:
+            appids (iterable): The apps to look up.
+        Returns:
+            dict: appid (str) -> build ID (str); apps SteamCMD did not report are left out.
+        """
+        appids = [str(appid) for appid in appids]
+        now = time.monotonic()
+        with self._lock:
+            waits = {self._pending[appid] for appid in appids if appid in self._pending}
+            missing = [appid for appid in dict.fromkeys(appids) if appid not in self._pending and
+                       (appid not in self._builds or now - self._builds[appid][0] >= self.ttl)]
+            done = threading.Event()
+            for appid in missing:
+                self._pending[appid] = done
+        if missing:
+            builds = {}
+            try:
+                builds = self._fetch(missing)
+            finally:
+                with self._lock:
+                    for appid, buildid in builds.items():
+                        self._builds[appid] = (now, buildid)
+                    for appid in missing:
+                        del self._pending[appid]
+                done.set()
+        for event in waits:
+            event.wait()
+        with self._lock:
+            return {appid: self._builds[appid][1] for appid in appids if appid in self._builds}
+
+    def invalidate(self, appid):
+        with self._lock:
+            self._builds.pop(str(appid), None)
+
+    def _fetch(self, appids):
+        lines = []
+        args = ['+login', 'anonymous', '+app_info_update', '1']
+        for appid in appids:
+            args += ['+app_info_print', appid]
+        args.append('+quit')
+        returncode = SteamCmdManager.stream(args, lines.append)
+        builds, app_types = {}, {}
+        for appid in appids:
+            info = parse_app_info(lines, appid)
+            app_type = Vdf.get(Vdf.get(info or {}, 'common', {}), 'type')
+            if app_type:
+                app_types[appid] = app_type
+            branches = Vdf.get(Vdf.get(info or {}, 'depots', {}), 'branches', {})
+            buildid = Vdf.get(Vdf.get(branches, self.branch, {}), 'buildid')
+            if buildid:
+                builds[appid] = buildid
+            else:
+                logging.warning(f"SteamCMD did not report a {self.branch} build for app {appid} "
+                                f"(exit code {returncode})")
+        if app_types:
+            try:
+                AppListCache().record_app_types(app_types)
+            except OSError as e:
+                logging.warning(f"Could not cache app types: {e}")
+        return builds
+
+
+remote_builds = RemoteBuildCache()
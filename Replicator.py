@@ -0,0 +1,269 @@
+import errno
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import Vdf
+from AppManifest import STATE_FULLY_INSTALLED
+from Metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+FICLONE = 0x40049409  # Linux ioctl: make dest a copy-on-write clone of src (Btrfs, XFS, bcachefs)
+COPY_CHUNK = 1024 * 1024 * 1024  # Bytes per copy_file_range call
+DEFAULT_WORKERS = 8
+# SteamCMD's scratch space in a library; never part of an install
+SKIP_DIRS = {os.path.join('steamapps', name) for name in ('downloading', 'temp', 'shadercache')}
+# The seed files a replica was last given, so the next pass can delete those the seed has dropped
+FILE_LIST = os.path.join('steamapps', 'servermanager_replica_files.json')
+
+
+def clone_file(source, dest):
+    """
+    Make `dest` a copy-on-write clone (reflink) of `source`: no data is copied, and writing to
+    either file later leaves the other untouched.
+    Raises:
+        OSError: The platform or filesystem cannot clone files.
+    """
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported on this platform")
+    with open(source, 'rb') as src, open(dest, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def copy_file(source, dest):
+    """
+    Copy one file's contents as cheaply as the filesystem allows: a reflink where it supports
+    copy-on-write clones, otherwise copy_file_range (in-kernel, and server-side on NFS/SMB), and
+    plain buffered copying as the last resort.
+    Returns:
+        str: The method used: "reflink", "copy_file_range" or "copy".
+    """
+    try:
+        clone_file(source, dest)
+        return "reflink"
+    except OSError:
+        pass
+    with open(source, 'rb') as src, open(dest, 'wb') as dst:
+        if hasattr(os, 'copy_file_range'):
+            try:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), min(remaining, COPY_CHUNK))
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                if remaining <= 0:
+                    return "copy_file_range"
+            except OSError:
+                pass  # Cross-device on old kernels, or unsupported by the filesystem
+            src.seek(0)
+            dst.seek(0)
+            dst.truncate()
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+        return "copy"
+
+
+def _same_file(source_stat, dest_path):
+    try:
+        dest_stat = os.stat(dest_path)
+    except OSError:
+        return False
+    return dest_stat.st_size == source_stat.st_size and dest_stat.st_mtime_ns == source_stat.st_mtime_ns
+
+
+def _plan(source, exclude):
+    """Walk `source`; returns (directories, [(relative path, stat)]) to mirror."""
+    directories, files = [], []
+    for root, dirnames, filenames in os.walk(source):
+        relative_root = os.path.relpath(root, source)
+        relative_root = '' if relative_root == '.' else relative_root
+        dirnames[:] = [name for name in dirnames if os.path.join(relative_root, name) not in SKIP_DIRS]
+        directories.extend(os.path.join(relative_root, name) for name in dirnames)
+        for name in filenames:
+            relative = os.path.join(relative_root, name)
+            if relative in exclude:
+                continue
+            try:
+                files.append((relative, os.stat(os.path.join(root, name))))
+            except OSError as e:
+                logging.warning(f"Skipping {relative}: {e}")
+    return directories, files
+
+
+def _load_file_list(dest):
+    try:
+        with open(os.path.join(dest, FILE_LIST), 'r', encoding='utf-8') as f:
+            return {os.path.join(*relative.split('/')) for relative in json.load(f)}
+    except (OSError, ValueError, TypeError):
+        return set()
+
+
+def _save_file_list(dest, files):
+    path = os.path.join(dest, FILE_LIST)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(sorted(relative.replace(os.sep, '/') for relative, _ in files), f)
+    os.replace(tmp_path, path)
+
+
+def prune_files(dest, stale):
+    """
+    Delete files from a copy of a tree, and the directories that leaves empty.
+    Args:
+        dest (str): The directory to delete from.
+        stale (iterable): Paths relative to `dest`; ones that are already gone are skipped.
+    Returns:
+        int: The number of files deleted.
+    """
+    removed = 0
+    for relative in sorted(stale):
+        try:
+            os.unlink(os.path.join(dest, relative))
+        except FileNotFoundError:
+            continue
+        removed += 1
+        directory = os.path.dirname(relative)
+        while directory:
+            try:
+                os.rmdir(os.path.join(dest, directory))
+            except OSError:
+                break  # Not empty: it holds files of the instance's own
+            directory = os.path.dirname(directory)
+    return removed
+
+
+def replicate_tree(source, destinations, workers=DEFAULT_WORKERS, exclude=(), on_progress=None, prune=False):
+    """
+    Mirror the files of `source` into every destination, copying files in parallel.
+
+    Files whose size and mtime already match are left alone, so refreshing a replica after an
+    update only copies what the update changed. Each file is written under a temporary name and
+    renamed into place, so a running server never sees it half-written. Files that only exist in
+    a destination (configs, saves, logs) are kept.
+
+    With `prune`, each destination remembers which files it was given, and files it was given
+    before that `source` no longer has (removed or renamed by an update) are deleted.
+    Args:
+        source (str): The seed install directory.
+        destinations (list): Install directories to bring in line with the seed.
+        workers (int): Files copied at once.
+        exclude (iterable): Paths relative to `source` not to copy.
+        on_progress (callable): Called with (bytes copied, bytes to copy) from the copying threads.
+        prune (bool): Delete files that came from an earlier `source` build and are gone from it.
+    Returns:
+        dict: destination -> {"copied", "skipped", "removed", "bytes", "error"}.
+    """
+    directories, files = _plan(source, set(exclude) | {FILE_LIST})
+    stats = {dest: {"copied": 0, "skipped": 0, "removed": 0, "bytes": 0, "error": None} for dest in destinations}
+    tasks = []
+    for dest in destinations:
+        try:
+            os.makedirs(dest, exist_ok=True)
+            for directory in directories:
+                os.makedirs(os.path.join(dest, directory), exist_ok=True)
+        except OSError as e:
+            stats[dest]["error"] = str(e)
+            continue
+        for relative, stat in files:
+            if _same_file(stat, os.path.join(dest, relative)):
+                stats[dest]["skipped"] += 1
+            else:
+                tasks.append((dest, relative, stat))
+
+    total = sum(stat.st_size for _, _, stat in tasks)
+    done = 0
+    lock = threading.Lock()
+
+    def copy(task):
+        nonlocal done
+        dest, relative, stat = task
+        target = os.path.join(dest, relative)
+        tmp_path = os.path.join(os.path.dirname(target), f".{os.path.basename(target)}.replica")
+        try:
+            method = copy_file(os.path.join(source, relative), tmp_path)
+            shutil.copystat(os.path.join(source, relative), tmp_path)
+            os.replace(tmp_path, target)
+        except OSError as e:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            with lock:
+                stats[dest]["error"] = stats[dest]["error"] or f"{relative}: {e}"
+            return
+        metrics.inc(f"replicate.files.{method}")
+        metrics.inc("replicate.bytes", stat.st_size)
+        with lock:
+            stats[dest]["copied"] += 1
+            stats[dest]["bytes"] += stat.st_size
+            done += stat.st_size
+            progress = done
+        if on_progress is not None:
+            on_progress(progress, total)
+
+    with metrics.span("replicate.copy"), ThreadPoolExecutor(max_workers=max(1, workers),
+                                                            thread_name_prefix="replicate") as pool:
+        # The syscalls doing the copying release the GIL, so threads keep several disks busy
+        list(pool.map(copy, tasks))
+
+    if prune:
+        current = {relative for relative, _ in files}
+        for dest in destinations:
+            if stats[dest]["error"] is not None:
+                continue  # Keep the old list, so the next pass still knows what to prune
+            try:
+                stats[dest]["removed"] = prune_files(dest, _load_file_list(dest) - current)
+                _save_file_list(dest, files)
+            except OSError as e:
+                stats[dest]["error"] = str(e)
+    return stats
+
+
+def _is_within(path, directory):
+    path, directory = os.path.normcase(os.path.abspath(path)), os.path.normcase(os.path.abspath(directory))
+    try:
+        return os.path.commonpath([path, directory]) == directory
+    except ValueError:  # Different drives
+        return False
+
+
+def _set(state, key, value):
+    """Set `key`, keeping the spelling the manifest already uses for it."""
+    state[next((existing for existing in state if existing.lower() == key.lower()), key)] = value
+
+
+def write_replica_manifest(seed_path, install_path, appid):
+    """
+    Give a replica its own appmanifest, so SteamCMD treats it as an install of the seed's build.
+    The app is marked fully installed with no update in flight, and any path that pointed into the
+    seed is pointed at the replica instead.
+    """
+    name = f'appmanifest_{appid}.acf'
+    manifest = Vdf.load(os.path.join(seed_path, 'steamapps', name))
+    state = Vdf.get(manifest, 'AppState')
+    if not isinstance(state, dict):
+        raise Vdf.VdfError(f"The seed's {name} has no AppState section")
+    for key, value in list(state.items()):
+        if isinstance(value, str) and os.path.isabs(value) and _is_within(value, seed_path):
+            state[key] = os.path.join(os.path.abspath(install_path), os.path.relpath(value, seed_path))
+    _set(state, 'StateFlags', str(STATE_FULLY_INSTALLED))
+    _set(state, 'LastUpdated', str(int(time.time())))
+    for key in ('UpdateResult', 'BytesToDownload', 'BytesDownloaded', 'BytesToStage', 'BytesStaged'):
+        if Vdf.get(state, key) is not None:
+            _set(state, key, '0')
+
+    steamapps = os.path.join(install_path, 'steamapps')
+    os.makedirs(steamapps, exist_ok=True)
+    tmp_path = os.path.join(steamapps, name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(Vdf.dumps(manifest))
+    os.replace(tmp_path, os.path.join(steamapps, name))
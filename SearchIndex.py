@@ -0,0 +1,147 @@
+import random
+import string
+import time
+from array import array
+from bisect import bisect_left
+from itertools import compress
+
+from AppCatalog import AppCatalog
+from AppClassifier import CATEGORY_NAMES, DEFAULT_CATEGORIES
+
+MARK = b'\xff'  # Never part of UTF-8 text, so it can stand in for a match
+_DELETE = bytes(byte for byte in range(256) if byte not in (ord('\n'), MARK[0]))
+_TO_MASK = bytes.maketrans(b'\n' + MARK, b'\x00\x01')
+
+
+def _row_mask(buffer, query):
+    """
+    One byte per newline-terminated row of `buffer`: 1 where the row contains `query`, else 0.
+    Every step is a pass of a bytes method in C; nothing is done in Python per row or per hit.
+    """
+    marked = buffer.replace(query, MARK).translate(None, _DELETE)  # A MARK per hit and a newline per row
+    while MARK + MARK in marked:
+        marked = marked.replace(MARK + MARK, MARK)
+    return marked.replace(MARK + b'\n', MARK).translate(_TO_MASK)
+
+
+def _select(buffer, mask):
+    """The rows of a newline-terminated `buffer` whose `mask` byte is 1, newline-terminated."""
+    if not mask.count(1):
+        return b''
+    return b'\n'.join(compress(buffer.split(b'\n'), mask)) + b'\n'
+
+
+class ServerSearchIndex:
+    """
+    Substring search over a catalog's pre-lowered name buffer.
+
+    The lowered names sit newline-separated in one bytes object. A query marks its hits with a
+    byte that never occurs in UTF-8, and a few C-level passes reduce that to one byte per name, so
+    the cost is a scan of the text and not of each hit. When the user extends the previous query,
+    only the names that matched it are scanned again: their text is kept as a buffer of its own.
+    Results are catalog positions, prefix matches first, each group in name order.
+
+    Only apps in the selected AppClassifier categories are shown. Their names are copied into the
+    starting buffer when the selection changes; dedicated servers are a few percent of Steam, so
+    typing never touches the rest of the catalog.
+    """
+
+    def __init__(self, catalog=None, categories=DEFAULT_CATEGORIES):
+        """
+        Args:
+            catalog (AppCatalog): The apps to search.
+            categories (iterable): AppClassifier categories to show; None shows every app.
+        """
+        self.catalog = catalog if catalog is not None else AppCatalog.empty()
+        self.set_categories(categories)
+
+    def __len__(self):
+        return len(self._visible)
+
+    def set_categories(self, categories):
+        """Show only apps in these AppClassifier categories; None shows every app."""
+        self.categories = categories
+        if categories is None or set(categories) >= set(CATEGORY_NAMES):
+            self._visible = range(len(self.catalog))
+            self._visible_buffer = self.catalog.lowered_buffer
+        else:
+            allowed = set(categories)
+            table = bytes(1 if category in allowed else 0 for category in range(256))
+            mask = self.catalog.categories.tobytes().translate(table)
+            self._visible = array('I', compress(range(len(self.catalog)), mask))
+            self._visible_buffer = _select(self.catalog.lowered_buffer, mask)
+        self._last = None  # (query, buffer, rows, mask) of the previous search
+
+    def _candidates(self, query):
+        """The buffer and positions to scan: the previous matches if `query` extends the previous query."""
+        if self._last is not None and self._last[0] in query:
+            # Anything matching the longer query also matched the previous one
+            last_query, buffer, rows, mask = self._last
+            return _select(buffer, mask), array('I', compress(rows, mask))
+        return self._visible_buffer, self._visible
+
+    def search(self, query, cancelled=None):
+        """
+        Find the servers whose name contains the query, case-insensitively.
+        Args:
+            query (str): The search text.
+            cancelled (callable): Polled between passes; the search stops once it returns True.
+        Returns:
+            sequence: Catalog positions of the matches, prefix matches first, or None if the search was cancelled.
+        """
+        query = query.lower().replace('\n', ' ')
+        key = query.encode('utf-8')
+        if not key:
+            self._last = None
+            return self._visible
+
+        buffer, rows = self._candidates(key)
+        if cancelled is not None and cancelled():
+            return None
+        mask = _row_mask(buffer, key)
+        if cancelled is not None and cancelled():
+            return None
+        # The narrowed buffer is only built if the next query extends this one
+        self._last = (key, buffer, rows, mask)
+        matches = array('I', compress(rows, mask))
+
+        # Names are sorted, so the prefix matches are one contiguous run of positions
+        prefix = self.catalog.prefix_range(query)
+        low, high = bisect_left(matches, prefix.start), bisect_left(matches, prefix.stop)
+        return matches[low:high] + matches[:low] + matches[high:]
+
+
+def _legacy_filter(app_ids, query):
+    """The linear scan ServerInstaller.filter_servers used before the index existed."""
+    query = query.lower()
+    return sorted([server for server in app_ids.keys() if query in server.lower()], key=lambda s: s.lower())
+
+
+if __name__ == "__main__":
+    # Benchmark the index against the legacy linear scan on a synthetic catalog
+    rng = random.Random(0)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(5000)]
+    words += ["server", "dedicated", "counter", "strike", "valheim", "rust", "ark", "soundtrack", "demo"]
+    app_ids = {
+        " ".join(rng.choice(words).title() for _ in range(rng.randint(1, 5))) + f" {i}": i
+        for i in range(200000)
+    }
+
+    start = time.perf_counter()
+    index = ServerSearchIndex(AppCatalog.from_pairs(app_ids.items()), categories=None)
+    print(f"Catalog build: {(time.perf_counter() - start) * 1000:.0f} ms for {len(index)} names")
+
+    for typed in ("dedicated server", "counter", "xq"):
+        legacy_total = index_total = 0.0
+        for end in range(1, len(typed) + 1):
+            query = typed[:end]
+            start = time.perf_counter()
+            expected = _legacy_filter(app_ids, query)
+            legacy_total += time.perf_counter() - start
+            start = time.perf_counter()
+            result = index.search(query)
+            index_total += time.perf_counter() - start
+            assert sorted((index.catalog.name(i) for i in result), key=str.lower) == expected
+        keystrokes = len(typed)
+        print(f"{typed!r}: legacy {legacy_total / keystrokes * 1000:.2f} ms/keystroke, "
+              f"index {index_total / keystrokes * 1000:.2f} ms/keystroke")
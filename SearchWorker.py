@@ -0,0 +1,108 @@
+import logging
+import queue
+import threading
+
+from Metrics import metrics
+from SearchIndex import ServerSearchIndex
+
+
+class SearchWorker:
+    """
+    Runs server searches on a background thread on behalf of the Tk UI.
+
+    Keystrokes are coalesced with a `window.after` debounce, a newer query cancels the one in
+    flight, and results are handed back through a queue drained on the Tk thread, where only the
+    result of the latest query is published. A newly loaded catalog is also swapped in on the
+    worker, so it never changes under a running search.
+    """
+
+    def __init__(self, window, on_results, debounce_ms=120, poll_ms=25):
+        """
+        Args:
+            window (tk.Tk): The window whose event loop drives debouncing and result delivery.
+            on_results (callable): Called on the Tk thread with the catalog positions of the matches.
+            debounce_ms (int): Quiet period after a keystroke before the query is run.
+            poll_ms (int): How often pending results are checked while a search is running.
+        """
+        self.window = window
+        self.on_results = on_results
+        self.debounce_ms = debounce_ms
+        self.poll_ms = poll_ms
+        self._generation = 0
+        self._debounce_id = None
+        self._poll_id = None
+        self._condition = threading.Condition()
+        self._pending_query = None
+        self._pending_catalog = None
+        self._pending_categories = None
+        self._results = queue.Queue()
+        self._index = ServerSearchIndex()
+        threading.Thread(target=self._run, name="server-search", daemon=True).start()
+
+    def load(self, catalog, query=""):
+        """Switch the index to a new AppCatalog on the worker, then publish the results for `query`."""
+        with self._condition:
+            self._pending_catalog = catalog
+        self.submit(query, delay_ms=0)
+
+    def set_categories(self, categories, query=""):
+        """Show only these AppClassifier categories from now on, then publish the results for `query`."""
+        with self._condition:
+            self._pending_categories = frozenset(categories)
+        self.submit(query, delay_ms=0)
+
+    def submit(self, query, delay_ms=None):
+        """
+        Schedule a search; called on the Tk thread.
+        Args:
+            query (str): The search text.
+            delay_ms (int): Debounce delay; defaults to `debounce_ms`.
+        """
+        self._generation += 1
+        if self._debounce_id is not None:
+            self.window.after_cancel(self._debounce_id)
+        delay = self.debounce_ms if delay_ms is None else delay_ms
+        self._debounce_id = self.window.after(delay, self._dispatch, query, self._generation)
+
+    def _dispatch(self, query, generation):
+        self._debounce_id = None
+        with self._condition:
+            self._pending_query = (generation, query)
+            self._condition.notify()
+        if self._poll_id is None:
+            self._poll_id = self.window.after(self.poll_ms, self._poll)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending_query is None:
+                    self._condition.wait()
+                catalog, self._pending_catalog = self._pending_catalog, None
+                categories, self._pending_categories = self._pending_categories, None
+                (generation, query), self._pending_query = self._pending_query, None
+            try:
+                if catalog is not None:
+                    self._index = ServerSearchIndex(catalog, self._index.categories)
+                if categories is not None:
+                    self._index.set_categories(categories)
+                with metrics.span("search.query"):
+                    results = self._index.search(query, cancelled=lambda: generation != self._generation)
+            except Exception as e:
+                logging.error(f"Server search failed: {e}")
+                results = None
+            self._results.put((generation, results))
+
+    def _poll(self):
+        self._poll_id = None
+        latest = None
+        while True:
+            try:
+                latest = self._results.get_nowait()
+            except queue.Empty:
+                break
+        if latest is not None and latest[0] == self._generation:
+            if latest[1] is not None:
+                self.on_results(latest[1])
+            return
+        # The newest query has not finished yet
+        self._poll_id = self.window.after(self.poll_ms, self._poll)
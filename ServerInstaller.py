@@ -1,38 +1,31 @@
-import collections
 import logging
 import os
 import sys
-import threading
 import tkinter as tk
-from concurrent.futures import ThreadPoolExecutor
 from tkinter import Menu, filedialog, messagebox
 
 from ttkbootstrap import Style, Toplevel
-from ttkbootstrap.widgets import Frame, Button, Label, Progressbar
+from ttkbootstrap.widgets import Frame, Button, Label, Progressbar, Scrollbar, Treeview
 
 from ApiManager import ApiManager
+from AppCatalog import AppCatalog
+from AppClassifier import DEFAULT_CATEGORIES, DEMO, DLC, GAME, SERVER, SOUNDTRACK, TOOL, VIDEO
 from CenterWindow import center_window
 from Console import ConsoleText
+from JobScheduler import FAILED, SUCCEEDED, JobScheduler, read_targets
+from LogPipeline import add_sink, setup_logging, stream_sink
+from Metrics import metrics
 from PlaceholderText import PlaceholderEntry
-from ServerManager import ServerManager
+from ProgressHub import ProgressHub
+from SearchWorker import SearchWorker
 from SteamCmdManager import SteamCmdManager
 from Tooltip import Tooltip
+from UiDispatcher import UiDispatcher
+from VirtualListbox import VirtualListbox
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 VERSION = "1.0.0"
 
 
-def _log_message(msg, level=logging.INFO):
-    log_levels = {
-        logging.INFO: logging.info,
-        logging.ERROR: logging.error,
-        logging.WARNING: logging.warning,
-        logging.DEBUG: logging.debug
-    }
-    log_func = log_levels.get(level, logging.debug)
-    log_func(msg)
-
-
 def show_dialog(title, message):
     dialog = Toplevel()
     dialog.title(title)
@@ -60,7 +53,7 @@ def show_usage():
         "How to Use:\n\n"
         "1. Set the SteamCMD directory using the File menu.\n"
         "2. Install SteamCMD if it is not already installed.\n"
-        "3. Use the search bar to find a server.\n"
+        "3. Use the search bar to find a server (the View menu shows tools, games and other apps too).\n"
         "4. Select a server from the list.\n"
         "5. Choose an installation directory for the server.\n"
         "6. Click the 'Install Server' button to start the installation."
@@ -71,16 +64,19 @@ def show_usage():
 class ServerInstaller:
 
     def __init__(self):
-        self.on_closing = None
         self.default_font = None
-        self.appIds = collections.OrderedDict()
+        self.catalog = AppCatalog.empty()
+        self.search_results = self.catalog.view()
         self.steamcmd_dir = ""
         self.window = tk.Tk()
+        self.ui_dispatcher = UiDispatcher(self.window)
+        self.progress_hub = ProgressHub(self.window)
         self.style = Style(theme="darkly")
-        self.executor = ThreadPoolExecutor(max_workers=5)
+        self.job_scheduler = JobScheduler(on_update=lambda job: self.progress_hub.post("job", job.job_id, job))
         self._configure_window()
         self._create_widgets()
-        self.api_manager = ApiManager()
+        self.search_worker = SearchWorker(self.window, self._show_search_results)
+        self.api_manager = ApiManager(dispatch=self.ui_dispatcher.post)
         self.steamcmd_manager = SteamCmdManager()
         self._check_default_steamcmd_directory()
         self._load_servers()
@@ -88,14 +84,13 @@ class ServerInstaller:
         center_window(self.window)
 
         # Redirect stdout and stderr to the console widget
-        self.console_text = ConsoleText(self.window, height=20, state='disabled')
+        self.console_text = ConsoleText(self.window, height=20, state='disabled', max_lines=5000)
         self.console_text.grid(row=7, column=0, columnspan=3, sticky='nsew')
 
         sys.stdout = self.console_text
         sys.stderr = self.console_text
-
-    def thread_safe_logging(self, msg, level=logging.INFO):
-        self.executor.submit(_log_message, msg, level)
+        # Log records reach the widget from the logging listener thread, batched by its flush tick
+        add_sink(stream_sink(self.console_text))
 
     def _configure_window(self):
         self.window.title("Dedicated Server Manager")
@@ -132,6 +127,12 @@ class ServerInstaller:
         file_menu.add_checkbutton(label="Set SteamCMD Directory", command=self.set_steamcmd_directory,
                                   variable=self.set_steamcmd_dir_menu)
         file_menu.add_command(label="Install SteamCMD", command=self.install_steamcmd)
+        file_menu.add_command(label="Queue Servers from File...", command=self.queue_from_file)
+        self.validate_files_var = tk.BooleanVar(value=False)
+        file_menu.add_checkbutton(label="Validate Installed Files", variable=self.validate_files_var)
+        self.batch_sessions_var = tk.BooleanVar(value=False)
+        file_menu.add_checkbutton(label="Batch SteamCMD Sessions", variable=self.batch_sessions_var,
+                                  command=self.toggle_batch_sessions)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.window.quit)
 
@@ -139,6 +140,15 @@ class ServerInstaller:
         menubar.add_cascade(label="Edit", menu=edit_menu)
         edit_menu.add_command(label="Choose Font Size", command=self.choose_font_size)
 
+        view_menu = Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="View", menu=view_menu)
+        self.category_vars = {}
+        for category, label in ((SERVER, "Dedicated Servers"), (TOOL, "Tools"), (GAME, "Games"), (DLC, "DLC"),
+                                (SOUNDTRACK, "Soundtracks"), (DEMO, "Demos"), (VIDEO, "Videos")):
+            self.category_vars[category] = tk.BooleanVar(value=category in DEFAULT_CATEGORIES)
+            view_menu.add_checkbutton(label=label, variable=self.category_vars[category],
+                                      command=self.update_categories)
+
         help_menu = Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Help", menu=help_menu)
         help_menu.add_command(label="How to Use", command=show_usage)
@@ -170,19 +180,40 @@ class ServerInstaller:
         server_list_frame.rowconfigure(0, weight=1)
         server_list_frame.rowconfigure(1, weight=0)  # Ensure the button does not stretch too much
 
-        self.server_listbox = tk.Listbox(server_list_frame, width=80, height=15, font=self.default_font)
-        self.server_listbox.grid(row=0, column=0, padx=10, pady=5, sticky='nsew')  # Center the listbox
+        # Only the visible rows are handed to Tk, however many servers the catalog holds
+        self.server_listbox = VirtualListbox(server_list_frame, width=80, height=15, font=self.default_font)
+        self.server_listbox.grid(row=0, column=0, padx=(10, 0), pady=5, sticky='nsew')  # Center the listbox
         self.server_listbox.bind('<<ListboxSelect>>', self.update_selected_appid)
 
-        refresh_button = Button(server_list_frame, text="Refresh Server List", command=self._load_servers,
-                                style='TButton')
-        refresh_button.grid(row=1, column=0, pady=5)  # Center the button without using sticky='ew'
+        server_scrollbar = Scrollbar(server_list_frame, orient='vertical')
+        server_scrollbar.grid(row=0, column=1, padx=(0, 10), pady=5, sticky='ns')
+        self.server_listbox.attach_scrollbar(server_scrollbar)
+
+        refresh_button = Button(server_list_frame, text="Refresh Server List",
+                                command=lambda: self._load_servers(force_refresh=True), style='TButton')
+        refresh_button.grid(row=1, column=0, columnspan=2, pady=5)  # Center the button without using sticky='ew'
         Tooltip(refresh_button, "Click to refresh the server list.")
 
     def _create_install_frame(self):
+        job_columns = ("appid", "path", "status", "phase", "progress", "rate", "eta", "duration")
+        self.job_table = Treeview(self.window, columns=job_columns, show='headings', height=5)
+        for column, heading, width in zip(job_columns,
+                                          ("App ID", "Install Path", "Status", "Phase", "Progress", "Rate",
+                                           "ETA", "Duration"),
+                                          (70, 220, 80, 90, 70, 80, 60, 70)):
+            self.job_table.heading(column, text=heading)
+            self.job_table.column(column, width=width, stretch=column == "path")
+        self.job_table.grid(row=5, column=0, columnspan=3, padx=20, pady=5, sticky='nsew')
+        Tooltip(self.job_table, "Shows the progress of every queued install and update.")
+
         self.progress = Progressbar(self.window, length=200, mode='determinate')
-        self.progress.grid(row=5, column=1, pady=5, sticky='ew')
-        Tooltip(self.progress, "Shows the progress of the current operation.")
+        self.progress.grid(row=6, column=1, pady=5, sticky='ew')
+        Tooltip(self.progress, "Shows the overall progress of the queued jobs.")
+        self.steamcmd_progress = Progressbar(self.window, length=100, mode='determinate')
+        self.steamcmd_progress.grid(row=6, column=2, padx=20, pady=5, sticky='ew')
+        Tooltip(self.steamcmd_progress, "Shows the progress of the SteamCMD installation.")
+        self.progress_hub.subscribe("job", self._render_jobs)
+        self.progress_hub.subscribe("steamcmd", self._render_steamcmd)
 
         self.install_button = Button(self.window, text="Install Server", command=self.install, state="disabled",
                                      style='TButton')
@@ -270,14 +301,20 @@ class ServerInstaller:
         self.search_bar.put_placeholder()  # Reset the placeholder
         self.update_server_listbox()  # Repopulate the listbox with all servers
 
-    def _load_servers(self):
+    def _load_servers(self, force_refresh=False):
         try:
-            self.api_manager.get_dedicated_servers_thread(self.appIds, self.update_server_listbox)
+            # Runs on the API loop thread; the window is shown without waiting for Steam
+            self.api_manager.get_dedicated_servers_thread(self._on_servers_loaded, self._show_load_error,
+                                                          force_refresh=force_refresh,
+                                                          have_servers=len(self.catalog) > 0)
         except Exception as e:
             error_msg = f"Failed to load servers. Please try again. {str(e)}"
             logging.error(error_msg)
             messagebox.showerror("Error", error_msg)
-            self.thread_safe_logging(error_msg)
+
+    @staticmethod
+    def _show_load_error(error_msg):
+        messagebox.showerror("API Error", error_msg)
 
     def _check_default_steamcmd_directory(self):
         # Check for default SteamCMD directory
@@ -287,36 +324,44 @@ class ServerInstaller:
             self.steamcmd_dir = default_steamcmd_dir
             self.set_steamcmd_dir_menu.set(True)
 
+    def _on_servers_loaded(self, catalog):
+        self.catalog = catalog
+        self.search_worker.load(catalog, self._search_query())
+
+    def _search_query(self):
+        query = self.search_var.get()
+        return "" if query == self.search_bar.placeholder else query
+
     def filter_servers(self, event=None):
-        query = self.search_var.get().lower()  # Get the text from the search field and convert it to lowercase
-        matching_servers = sorted(
-            [server for server in self.appIds.keys() if query in server.lower()],
-            key=lambda s: s.lower()
-        )
-        self.server_listbox.delete(0, tk.END)
-        for server in matching_servers:
-            self.server_listbox.insert(tk.END, server)
-        self.update_server_count(len(matching_servers))
+        # Debounced and run off the UI thread; results arrive in _show_search_results
+        self.search_worker.submit(self._search_query())
+
+    def update_categories(self):
+        # The search worker lists the chosen categories once; keystrokes then only search those apps
+        categories = [category for category, var in self.category_vars.items() if var.get()]
+        self.search_worker.set_categories(categories, self._search_query())
 
     def update_server_listbox(self):
-        # Update server listbox with sorted servers
-        self.server_listbox.delete(0, tk.END)
-        sorted_servers = sorted(self.appIds.keys(), key=lambda s: s.lower())
-        for server in sorted_servers:
-            self.server_listbox.insert(tk.END, server)  # Insert server names without numbering
-        self.update_server_count(len(sorted_servers))
+        # Update server listbox with the presorted servers
+        self.search_worker.submit("", delay_ms=0)
+
+    def _show_search_results(self, matches):
+        with metrics.span("ui.listbox_fill"):
+            # Names are decoded from the catalog only for the rows the listbox draws
+            self.search_results = self.catalog.view(matches)
+            self.server_listbox.set_items(self.search_results)
+            self.update_server_count(len(matches))
 
     def update_server_count(self, count=None):
         if count is None:
-            count = len(self.appIds)
+            count = len(self.catalog)
         new_title = f"Dedicated Server Manager - Server Count: {count}"
         self.window.title(new_title)
 
     def update_selected_appid(self, event=None):
         selection = self.server_listbox.curselection()
         if selection:
-            selected_server = self.server_listbox.get(selection[0])
-            app_id = self.appIds.get(selected_server, "")
+            app_id = self.search_results.appid(selection[0])
             self.selected_appId_var.set(app_id)
 
             # Manually clear placeholder if text is set
@@ -328,10 +373,10 @@ class ServerInstaller:
         selected_appid = self.selected_appId_var.get()
         install_path = os.path.normpath(self.install_path_var.get())
         if install_path and install_path != "Choose server installation directory":
-            self.executor.submit(self.perform_installation, selected_appid, install_path)
+            self.queue_installations([(selected_appid, install_path)])
         else:
             messagebox.showwarning("Path not chosen", "Please choose an installation path.")
-            self.thread_safe_logging("Please choose an installation path.")
+            logging.warning("Please choose an installation path.")
 
     def browse_install_path(self):
         path = filedialog.askdirectory()
@@ -348,25 +393,73 @@ class ServerInstaller:
             else:
                 error_msg = "steamcmd.exe not found in the selected directory."
                 messagebox.showerror("Error", error_msg)
-                self.thread_safe_logging(error_msg)
+                logging.error(error_msg)
 
     def install_steamcmd(self):
         path = filedialog.askdirectory()
         if path:
-            threading.Thread(target=self.steamcmd_manager.install, args=(self.progress,)).start()
+            self.steamcmd_progress['value'] = 0
+            # Progress and the outcome arrive on the install thread and are handed to the Tk thread
+            self.steamcmd_manager.install(
+                on_progress=lambda stage, percent: self.progress_hub.post("steamcmd", "install", percent),
+                on_finished=lambda succeeded, message: self.ui_dispatcher.post(self._show_steamcmd_result,
+                                                                               succeeded, message))
+
+    def _render_steamcmd(self, updates):
+        self.steamcmd_progress['value'] = updates["install"]
+
+    @staticmethod
+    def _show_steamcmd_result(succeeded, message):
+        if succeeded:
+            messagebox.showinfo("SteamCMD Installation", message)
+        else:
+            messagebox.showerror("SteamCMD Installation", message)
 
-    def perform_installation(self, selected_appid, install_path):
+    def queue_installations(self, targets):
         if self.steamcmd_dir:
-            self.steamcmd_manager.INSTALL_DIR = self.steamcmd_dir
-        ServerManager.install_or_update_server(selected_appid, install_path, self.progress)
-
-
-def on_closing(self):
-    self.executor.shutdown(wait=True)
-    self.window.quit()
+            SteamCmdManager.INSTALL_DIR = self.steamcmd_dir
+        # Without validation, installed servers already on the latest build are skipped
+        for job in self.job_scheduler.submit_many(targets, validate=self.validate_files_var.get()):
+            self.job_table.insert('', tk.END, iid=str(job.job_id),
+                                  values=(job.appid, job.install_path, job.status, "", "", "", "", ""))
+
+    def toggle_batch_sessions(self):
+        # Queued jobs share one SteamCMD login instead of starting a session each
+        self.job_scheduler.batch_size = 20 if self.batch_sessions_var.get() else 1
+
+    def queue_from_file(self):
+        """Queue one job per line of a text file, each line holding an App ID and an install path."""
+        path = filedialog.askopenfilename(filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if not path:
+            return
+        targets = read_targets(path)
+        if targets:
+            self.queue_installations(targets)
+
+    def _render_jobs(self, updates):
+        # One ProgressHub frame: only the jobs that changed since the last one are repainted
+        with metrics.span("ui.job_table_refresh"):
+            for job_id, job in updates.items():
+                self.job_table.item(str(job_id), values=(
+                    job.appid, job.install_path, job.status, job.phase or "",
+                    f"{job.percent:.0f}%", f"{job.rate / 1048576:.1f} MiB/s" if job.rate else "",
+                    f"{int(job.eta)}s" if job.eta is not None else "", f"{job.duration:.0f}s"))
+            # The scheduler only holds the current batch: finished jobs are dropped once it is done
+            jobs = self.job_scheduler.jobs()
+            if jobs and all(job.status in (SUCCEEDED, FAILED) for job in jobs):
+                self.job_scheduler.clear_finished()
+                self.progress['value'] = 100
+            elif jobs:
+                self.progress['value'] = sum(job.percent for job in jobs) / len(jobs)
+
+    def on_closing(self):
+        self.job_scheduler.shutdown()
+        self.api_manager.close()
+        self.window.quit()
 
 
 if __name__ == "__main__":
+    setup_logging()
     installer = ServerInstaller()
     installer.window.protocol("WM_DELETE_WINDOW", installer.on_closing)
     installer.window.mainloop()
@@ -1,148 +1,394 @@
-import glob
 import logging
 import os
 import subprocess
-import threading
-import time
-from tkinter import messagebox
 
-# Set up basic logging configuration
-logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
-
-
-def thread_safe_logging(msg):
-    threading.Thread(target=logging.info, args=(msg,)).start()
+import Dedupe
+import Replicator
+import Staging
+import Vdf
+import Verifier
+from AppManifest import ManifestIndex, STATE_FULLY_INSTALLED
+from LogPipeline import reset_job_context, set_job_context
+from Metrics import metrics
+from RemoteBuilds import remote_builds
+from SteamCmdManager import SteamCmdManager
+from SteamCmdProgress import SteamCmdProgress, parse_app_result
 
 
 class ServerManager:
     @staticmethod
     def is_server_installed(install_path, target_appid):
         """
-        Check if the server with the specified appid is already installed in the given path by reading the appmanifest file.
+        Check if the server with the specified appid is fully installed in the given path by reading its appmanifest.
         Args:
             install_path (str): The installation path for the server.
             target_appid (str): The appid of the server we are verifying.
         Returns:
             bool: True if the server is installed, False otherwise.
         """
-        # Locate all appmanifest files in the directory
-        appmanifest_files = glob.glob(os.path.join(install_path, 'steamapps', 'appmanifest_*.acf'))
-
-        # If no appmanifest files are found, return False
-        if not appmanifest_files:
-            return False
-
-        # Check each appmanifest file
-        for appmanifest_file in appmanifest_files:
-            with open(appmanifest_file, 'r') as f:
-                content = f.read()
-
-                # Check if the appid matches the target appid
-                if f'"appid"\t\t"{target_appid}"' in content:
-                    # Check if "StateFlags" indicates the application is installed
-                    if '"StateFlags"' in content and '"4"' in content:
-                        return True
-
-        # If no matching appmanifest file with the correct appid is found, return False
-        return False
+        return ManifestIndex.for_library(install_path).is_installed(target_appid)
 
     @staticmethod
-    def install_or_update_server(selected_appid, install_path, progress):
+    def install_or_update_server(selected_appid, install_path, on_progress=None, validate=False):
         """
         Install or update the server based on whether it is already installed.
         Args:
             selected_appid (str): The App ID of the selected server.
             install_path (str): The installation path for the server.
-            progress (ttk.Progressbar): The progress bar to update.
+            on_progress (callable): Called with the SteamCmdProgress model as SteamCMD reports progress.
+            validate (bool): Check the install against its hash manifest, and have SteamCMD re-hash it on drift.
+        Returns:
+            tuple: (succeeded, message) describing the outcome.
         """
-        if ServerManager.is_server_installed(install_path, selected_appid):
-            thread_safe_logging("Server found. Proceeding with update.")
-            ServerManager.update_server(selected_appid, install_path, progress)
-        else:
-            thread_safe_logging("Server not found. Proceeding with installation.")
-            ServerManager.install(selected_appid, install_path, progress)
+        return ServerManager.describe_result(*ServerManager.run_job(selected_appid, install_path, on_progress,
+                                                                    validate))
 
     @staticmethod
-    def install(selected_appid, install_path, progress):
+    def install(selected_appid, install_path, on_progress=None):
         """
-        Install the server with the given App ID and installation path.
+        Install the server with the given App ID and installation path, whether or not it is already there.
         Args:
             selected_appid (str): The App ID of the selected server.
             install_path (str): The installation path for the server.
-            progress (ttk.Progressbar): The progress bar to update.
+            on_progress (callable): Called with the SteamCmdProgress model as SteamCMD reports progress.
+        Returns:
+            tuple: (succeeded, message) describing the outcome.
         """
-        os.makedirs(install_path, exist_ok=True)
-        threading.Thread(target=ServerManager.progress_animation, args=(progress, 25)).start()
-        progress['value'] = 0
-
-        install_command = ServerManager.construct_command(selected_appid, install_path, "install")
-        ServerManager.run_command(install_command, progress, "Server Installation", "Server installed successfully.")
-        thread_safe_logging("Server installed successfully.")
+        return ServerManager.describe_result(
+            "install", *ServerManager._run_action(selected_appid, install_path, "install", on_progress))
 
     @staticmethod
-    def update_server(selected_appid, install_path, progress):
+    def update_server(selected_appid, install_path, on_progress=None, validate=False):
         """
-        Update the server with the given App ID and installation path.
+        Update the server with the given App ID and installation path, without checking its build first.
         Args:
             selected_appid (str): The App ID of the selected server.
             install_path (str): The installation path for the server.
-            progress (ttk.Progressbar): The progress bar to update.
+            on_progress (callable): Called with the SteamCmdProgress model as SteamCMD reports progress.
+            validate (bool): Have SteamCMD re-hash every installed file.
+        Returns:
+            tuple: (succeeded, message) describing the outcome.
         """
-        update_command = ServerManager.construct_command(selected_appid, install_path, "update")
-        ServerManager.run_command(update_command, progress, "Server Update", "Server updated successfully.")
-        thread_safe_logging("Server updated successfully.")
+        action = "validate" if validate else "update"
+        return ServerManager.describe_result(
+            action, *ServerManager._run_action(selected_appid, install_path, action, on_progress))
 
     @staticmethod
-    def construct_command(selected_appid, install_path, action):
+    def plan_actions(targets, validate=False):
         """
-        Construct the SteamCMD command for installation or update.
+        Decide what each target needs: "install", "update", "validate" or "skip".
+        Installed servers are compared by build ID: the local buildid from the appmanifest against the
+        remote one from `app_info_print` (looked up for all targets in one SteamCMD session). Matching
+        builds are skipped; differing or unknown ones are updated without re-hashing the install.
         Args:
-            selected_appid (str): The App ID of the selected server.
+            targets (list): (appid, install_path) pairs.
+            validate (bool): Check installed servers against their hash manifest first; SteamCMD's full
+                `validate` only runs on those that drifted (or have no manifest yet).
+        Returns:
+            list: One action per target.
+        """
+        with metrics.span("job.plan.local"):
+            local_builds = [ManifestIndex.for_library(install_path).get(selected_appid)
+                            for selected_appid, install_path in targets]
+        installed = [app is not None and bool(app.state_flags & STATE_FULLY_INSTALLED) for app in local_builds]
+        drifted = [False] * len(targets)
+        if validate:
+            with metrics.span("job.plan.verify"):
+                drifted = [is_installed and not Verifier.verify(install_path, selected_appid)["clean"]
+                           for is_installed, (selected_appid, install_path) in zip(installed, targets)]
+
+        to_check = {str(selected_appid) for (selected_appid, _), is_installed, drift in zip(targets, installed, drifted)
+                    if is_installed and not drift}
+        with metrics.span("job.plan.remote"):
+            remote = remote_builds.get(to_check) if to_check else {}
+        actions = []
+        for app, is_installed, drift, (selected_appid, _) in zip(local_builds, installed, drifted, targets):
+            if not is_installed:
+                actions.append("install")
+            elif drift:
+                actions.append("validate")
+            elif app.buildid and remote.get(str(selected_appid)) == app.buildid:
+                actions.append("skip")
+            else:
+                actions.append("update")
+        return actions
+
+    @staticmethod
+    def _up_to_date():
+        model = SteamCmdProgress()
+        model.succeeded = True
+        return model
+
+    @staticmethod
+    def run_job(selected_appid, install_path, on_progress=None, validate=False):
+        """
+        Install or update the server without touching the UI; used by the job scheduler.
+        Args:
+            selected_appid (str): The App ID of the server.
             install_path (str): The installation path for the server.
-            action (str): The action to perform (install/update).
+            on_progress (callable): Called with the SteamCmdProgress model as SteamCMD reports progress.
+            validate (bool): Check the install against its hash manifest, and have SteamCMD re-hash it on drift.
+        Returns:
+            tuple: (action, returncode, SteamCmdProgress)
+        """
+        action = ServerManager.plan_actions([(selected_appid, install_path)], validate)[0]
+        if action == "skip":
+            logging.info(f"App {selected_appid} in {install_path} is already on the latest build.")
+            return action, 0, ServerManager._up_to_date()
+        return (action,) + ServerManager._run_action(selected_appid, install_path, action, on_progress)
 
+    @staticmethod
+    def _run_action(selected_appid, install_path, action, on_progress=None):
+        """Run one planned SteamCMD action on `install_path`; returns (returncode, SteamCmdProgress)."""
+        os.makedirs(install_path, exist_ok=True)
+        Dedupe.break_links(install_path)
+        command = ServerManager.construct_command(selected_appid, install_path, action, validate=action == "validate")
+        try:
+            returncode, model = SteamCmdManager.run(command, on_progress)
+        finally:
+            Dedupe.restore_links(install_path)
+        if ServerManager.succeeded(returncode, model):
+            ServerManager.record_hashes(install_path, selected_appid)
+        return returncode, model
+
+    @staticmethod
+    def run_staged_job(selected_appid, install_path, on_progress=None, validate=False,
+                       workers=Replicator.DEFAULT_WORKERS):
+        """
+        Update an installed server without touching the build it is running from: the new build is
+        prepared in a sibling directory seeded from the current one, and `install_path` (a symlink
+        from the first staged update on) is flipped to it once SteamCMD succeeds. The previous build
+        is kept for `Staging.rollback`; a restart of the server picks up the new one.
+        This is the staged counterpart of `update_server`: the same `_run_action`, pointed at the
+        standby slot. Fresh installs, and platforms without directory symlinks, are handled in place.
+        Args:
+            selected_appid (str): The App ID of the server.
+            install_path (str): The installation path for the server.
+            on_progress (callable): Called with the SteamCmdProgress model as SteamCMD reports progress.
+            validate (bool): Check the install against its hash manifest, and have SteamCMD re-hash it on drift.
+            workers (int): Files copied at once while seeding.
         Returns:
-            str: The constructed command.
+            tuple: (action, returncode, SteamCmdProgress)
         """
-        command = (
-            f'C:/SteamCMD/steamcmd.exe +login anonymous +force_install_dir "{install_path}" '
-            f'+app_update {selected_appid} validate +quit'
-        )
-        thread_safe_logging(f"Constructed {action} command: {command}")
-        return command
+        action = ServerManager.plan_actions([(selected_appid, install_path)], validate)[0]
+        if action == "skip":
+            logging.info(f"App {selected_appid} in {install_path} is already on the latest build.")
+            return action, 0, ServerManager._up_to_date()
+        if action == "install":
+            return (action,) + ServerManager._run_action(selected_appid, install_path, action, on_progress)
+        try:
+            Staging.adopt(install_path)
+            standby, seeded = Staging.prepare(install_path, selected_appid, workers)
+        except (OSError, Vdf.VdfError) as e:
+            logging.warning(f"Cannot stage the update of app {selected_appid} in {install_path} ({e}); "
+                            f"updating in place")
+            return (action,) + ServerManager._run_action(selected_appid, install_path, action, on_progress)
+        returncode, model = ServerManager._run_action(selected_appid, standby, action, on_progress)
+        if ServerManager.succeeded(returncode, model):
+            try:
+                Staging.swap(install_path, standby, seeded, workers)
+            except OSError as e:
+                model.error = f"The update is staged in {standby} but could not be made live: {e}"
+        return action, returncode, model
 
     @staticmethod
-    def run_command(command, progress, title, success_message):
+    def record_hashes(install_path, selected_appid):
+        """Save the hash manifest later validations check first; a failure only costs that shortcut."""
+        try:
+            Verifier.record(install_path, selected_appid)
+        except OSError as e:
+            logging.warning(f"Could not record the file hashes of app {selected_appid} in {install_path}: {e}")
+
+    @staticmethod
+    def replicate_server(selected_appid, seed_path, install_paths, on_progress=None, validate=False,
+                         workers=Replicator.DEFAULT_WORKERS):
         """
-        Run the given command using subprocess and update the progress bar.
+        Install or update one seed copy of a server with SteamCMD, then copy it to the other install paths.
+        The depot is downloaded once per build however many instances there are; each replica gets its
+        own appmanifest so SteamCMD and `is_server_installed` recognise it.
         Args:
-            command (str): The command to run.
-            progress (ttk.Progressbar): The progress bar to update.
-            title (str): The title for the message box.
-            success_message (str): The success message to display.
+            selected_appid (str): The App ID of the server.
+            seed_path (str): The install directory SteamCMD installs or updates.
+            install_paths (list): The other install directories to replicate the seed into.
+            on_progress (callable): Called with the seed's SteamCMD progress model.
+            validate (bool): Validate the seed, and re-sync replicas already on the seed's build.
+            workers (int): Files copied at once.
+        Returns:
+            list: (install_path, succeeded, message) for the seed and then each replica.
         """
-        threading.Thread(target=ServerManager.progress_animation, args=(progress, 50)).start()
+        action, returncode, model = ServerManager.run_job(selected_appid, seed_path, on_progress, validate)
+        succeeded, message = ServerManager.describe_result(action, returncode, model)
+        results = [(seed_path, succeeded, message)]
+        if not succeeded:
+            return results + [(path, False, "The seed install failed.") for path in install_paths]
 
-        process = subprocess.Popen(command, shell=True)
-        threading.Thread(target=ServerManager.progress_animation, args=(progress, 75)).start()
-        process.wait()
+        seed = ManifestIndex.for_library(seed_path).get(selected_appid)
 
-        if process.returncode in (0, 1):
-            progress['value'] = 100
-            messagebox.showinfo(title, success_message)
-        else:
-            error_message = f"{title} failed with error code {process.returncode}."
-            logging.error(error_message)
-            messagebox.showerror(title, error_message)
+        def on_seed_build(path):
+            app = ManifestIndex.for_library(path).get(selected_appid)
+            return app is not None and bool(app.state_flags & STATE_FULLY_INSTALLED) and app.buildid == seed.buildid
+
+        current = [] if validate or seed is None else [path for path in install_paths if on_seed_build(path)]
+        stale = [path for path in install_paths if path not in current]
+        manifest = os.path.join('steamapps', f'appmanifest_{selected_appid}.acf')
+        logging.info(f"Replicating app {selected_appid} from {seed_path} to {len(stale)} install paths "
+                     f"({len(current)} already on build {seed.buildid if seed else 'unknown'})")
+        stats = Replicator.replicate_tree(seed_path, stale, workers, exclude=[manifest], prune=True)
+        for path in install_paths:
+            if path in current:
+                results.append((path, True, "Server is already up to date."))
+                continue
+            error = stats[path]["error"]
+            if error is None:
+                try:
+                    Replicator.write_replica_manifest(seed_path, path, selected_appid)
+                except (OSError, Vdf.VdfError) as e:
+                    error = str(e)
+            if error is None:
+                results.append((path, True, f"Server replicated: {stats[path]['copied']} files "
+                                            f"({stats[path]['bytes'] / 1048576:.0f} MiB) copied, "
+                                            f"{stats[path]['skipped']} unchanged, "
+                                            f"{stats[path]['removed']} removed."))
+            else:
+                logging.error(f"Replicating app {selected_appid} to {path} failed: {error}")
+                results.append((path, False, f"Replication failed: {error}"))
+        return results
 
     @staticmethod
-    def progress_animation(progress, target):
+    def construct_runscript(targets, validate=True, actions=None):
         """
-        Animate the progress bar until it reaches the target value.
+        Construct a SteamCMD runscript that installs or updates many servers in one session.
         Args:
-            progress (ttk.Progressbar): The progress bar to animate.
-            target (int): The target value for the progress bar.
+            targets (list): (appid, install_path) pairs, processed in order.
+            validate (bool): Whether each app_update re-hashes the installed files.
+            actions (list): The planned action per target; when given, only "validate" targets re-hash.
+        Returns:
+            list: The runscript lines.
         """
-        while progress['value'] < target:
-            time.sleep(0.1)  # Delay between each increment
-            progress['value'] += 0.02  # Increment the progress bar
+        script = ['@ShutdownOnFailedCommand 0', '@NoPromptForPassword 1', 'login anonymous']
+        for index, (selected_appid, install_path) in enumerate(targets):
+            rehash = validate and (actions is None or actions[index] == "validate")
+            script.append(f'force_install_dir "{install_path}"')
+            script.append(f'app_update {selected_appid}' + (' validate' if rehash else ''))
+        script.append('quit')
+        logging.info(f"Constructed runscript for {len(targets)} servers")
+        return script
+
+    @staticmethod
+    def run_batch(targets, on_progress=None, validate=False):
+        """
+        Install or update many servers with a single SteamCMD login.
+        Output is demultiplexed back to the targets: progress lines belong to the app being processed
+        and each app's Success/Error line moves on to the next one.
+        Args:
+            targets (list): (appid, install_path) pairs.
+            on_progress (callable): Called with (target index, SteamCmdProgress) as progress is reported.
+            validate (bool): Check installs against their hash manifests; SteamCMD re-hashes those that drifted.
+        Returns:
+            list: One (action, returncode, SteamCmdProgress) tuple per target; the returncode is 0 for apps
+            SteamCMD reported a success for, else the session's exit code.
+        """
+        all_targets = targets
+        all_actions = ServerManager.plan_actions(all_targets, validate)
+        run_indices = [i for i, action in enumerate(all_actions) if action != "skip"]
+        targets = [all_targets[i] for i in run_indices]
+        actions = [all_actions[i] for i in run_indices]
+        for _, install_path in targets:
+            os.makedirs(install_path, exist_ok=True)
+            # SteamCMD may rewrite files in place; a deduplicated file must not change in other installs too
+            Dedupe.break_links(install_path)
+
+        models = [SteamCmdProgress() for _ in targets]
+        finished = [False] * len(targets)
+        current = 0
+        context_index = 0  # The session starts on the first target, see run_script below
+
+        def on_line(line):
+            nonlocal current, context_index
+            index = current
+            result = parse_app_result(line)
+            if result is not None:
+                # Normally the app in progress; fall back to the next unfinished target with that appid
+                index = next((i for i in range(current, len(targets))
+                              if not finished[i] and str(targets[i][0]) == result[0]), current)
+            if index != context_index and index < len(targets):
+                # Log each line under the app SteamCMD is working on
+                set_job_context(*targets[index])
+                context_index = index
+            if index >= len(targets):
+                if line:
+                    logging.info(line)
+                return
+            if models[index].feed(line):
+                if on_progress is not None:
+                    on_progress(run_indices[index], models[index])
+            elif line:
+                logging.info(line)
+            if result is not None:
+                finished[index] = True
+                current = index + 1
+
+        results = [("skip", 0, ServerManager._up_to_date()) for _ in all_targets]
+        if not targets:
+            return results
+        token = set_job_context(*targets[0])
+        try:
+            script = ServerManager.construct_runscript(targets, validate, actions)
+            returncode = SteamCmdManager.run_script(script, on_line)
+        finally:
+            reset_job_context(token)
+            for _, install_path in targets:
+                Dedupe.restore_links(install_path)
+        for index, model in enumerate(models):
+            SteamCmdManager.record_metrics(model)
+            if not finished[index] and model.error is None:
+                model.error = "SteamCMD exited before processing this app"
+            # The session's exit code reflects every app in it; judge each app by its own result line
+            app_returncode = 0 if finished[index] and model.succeeded and model.error is None else returncode
+            results[run_indices[index]] = (actions[index], app_returncode, model)
+            if ServerManager.succeeded(app_returncode, model):
+                selected_appid, install_path = targets[index]
+                ServerManager.record_hashes(install_path=install_path, selected_appid=selected_appid)
+        return results
+
+    @staticmethod
+    def succeeded(returncode, model):
+        """Whether a SteamCMD run finished successfully; exit code 1 is returned on some successful runs."""
+        return returncode in (0, 1) and model.error is None
+
+    @staticmethod
+    def describe_result(action, returncode, model):
+        """
+        Summarize a finished run for the user.
+        Returns:
+            tuple: (succeeded, message)
+        """
+        if action == "skip":
+            return True, "Server is already up to date."
+        if ServerManager.succeeded(returncode, model):
+            return True, "Server installed successfully." if action == "install" else "Server updated successfully."
+        title = "Server Installation" if action == "install" else "Server Update"
+        error_message = f"{title} failed with error code {returncode}."
+        if model.error:
+            error_message += f" SteamCMD reported: {model.error}"
+        return False, error_message
+
+    @staticmethod
+    def construct_command(selected_appid, install_path, action, validate=True):
+        """
+        Construct the SteamCMD command for installation or update.
+        Args:
+            selected_appid (str): The App ID of the selected server.
+            install_path (str): The installation path for the server.
+            action (str): The action to perform (install/update).
+            validate (bool): Append `validate`, re-hashing every installed file.
+
+        Returns:
+            list: The SteamCMD arguments.
+        """
+        command = ['+login', 'anonymous', '+force_install_dir', install_path, '+app_update', str(selected_appid)]
+        if validate:
+            command.append('validate')
+        command.append('+quit')
+        logging.info(f"Constructed {action} command: {subprocess.list2cmdline(command)}")
+        return command
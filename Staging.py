@@ -0,0 +1,154 @@
+import logging
+import os
+
+from Metrics import metrics
+from Replicator import DEFAULT_WORKERS, SKIP_DIRS, prune_files, replicate_tree, write_replica_manifest
+
+# The two builds a staged install alternates between; the install path is a symlink to the live one
+SLOTS = ("blue", "green")
+
+
+def slot_path(install_path, slot):
+    """The sibling directory holding one slot's build, e.g. /srv/valheim.green for /srv/valheim."""
+    return f"{os.path.normpath(install_path)}.{slot}"
+
+
+def live_slot(install_path):
+    """The slot `install_path` points at, or None if it is a plain directory (or missing)."""
+    if not os.path.islink(install_path):
+        return None
+    target = os.path.basename(os.path.normpath(os.readlink(install_path)))
+    return next((slot for slot in SLOTS if target == os.path.basename(slot_path(install_path, slot))), None)
+
+
+def _other(slot):
+    return SLOTS[1 - SLOTS.index(slot)]
+
+
+def _point(install_path, target):
+    """Atomically repoint the `install_path` symlink at `target`: a new link is renamed over the old one."""
+    tmp_path = f"{os.path.normpath(install_path)}.swap"
+    if os.path.lexists(tmp_path):
+        os.unlink(tmp_path)
+    # Relative, so the installs can be moved or mounted elsewhere as a whole
+    os.symlink(os.path.basename(target), tmp_path, target_is_directory=True)
+    os.replace(tmp_path, install_path)
+
+
+def adopt(install_path):
+    """
+    Convert a plain install into a staged one: move it into the blue slot and make `install_path` a
+    symlink to it. Only the first staged update does this, and it is the one moment the path is
+    briefly missing.
+    Returns:
+        str: The live slot.
+    Raises:
+        OSError: The install cannot be converted (a stray slot directory, a foreign symlink, or a
+            platform without directory symlinks); it is left as it was.
+    """
+    slot = live_slot(install_path)
+    if slot is not None:
+        return slot
+    if os.path.islink(install_path):
+        raise FileExistsError(f"{install_path} is a symlink that staged updates do not manage")
+    blue = slot_path(install_path, SLOTS[0])
+    if os.path.lexists(blue):
+        raise FileExistsError(f"{blue} already exists")
+    os.rename(install_path, blue)
+    try:
+        _point(install_path, blue)
+    except OSError:
+        os.rename(blue, install_path)
+        raise
+    logging.info(f"Moved {install_path} to {blue} for staged updates")
+    return SLOTS[0]
+
+
+def _snapshot(root):
+    """{relative path: (size, mtime_ns)} of the files under `root`, in the form `replicate_tree` excludes."""
+    files = {}
+    for directory, dirnames, filenames in os.walk(root):
+        relative_root = os.path.relpath(directory, root)
+        relative_root = '' if relative_root == '.' else relative_root
+        dirnames[:] = [name for name in dirnames if os.path.join(relative_root, name) not in SKIP_DIRS]
+        for name in filenames:
+            try:
+                stat = os.stat(os.path.join(directory, name))
+            except OSError:
+                continue
+            files[os.path.join(relative_root, name)] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def prepare(install_path, appid, workers=DEFAULT_WORKERS):
+    """
+    Seed the standby slot from the live build, so SteamCMD only downloads what the update changes.
+    The standby slot usually still holds the previous build, so only the files that differ are
+    copied, and those as reflinks where the filesystem supports them.
+    Args:
+        install_path (str): The staged install (see `adopt`).
+        appid (str): The app being updated.
+        workers (int): Files copied at once.
+    Returns:
+        tuple: (standby directory, snapshot of it after seeding) to hand to `swap`.
+    Raises:
+        OSError: Seeding failed.
+    """
+    live = slot_path(install_path, live_slot(install_path))
+    standby = slot_path(install_path, _other(live_slot(install_path)))
+    with metrics.span("staged.seed"):
+        # Leftovers of the build before last: files the standby slot has and the live one lacks
+        removed = prune_files(standby, set(_snapshot(standby)) - set(_snapshot(live))) if os.path.isdir(standby) else 0
+        stats = replicate_tree(live, [standby], workers)[standby]
+    if stats["error"] is not None:
+        raise OSError(f"Seeding {standby} failed: {stats['error']}")
+    write_replica_manifest(live, standby, appid)
+    logging.info(f"Seeded {standby} from {live}: {stats['copied']} files copied, {stats['skipped']} unchanged, "
+                 f"{removed} removed")
+    return standby, _snapshot(standby)
+
+
+def swap(install_path, standby, seeded, workers=DEFAULT_WORKERS):
+    """
+    Make the updated standby slot live. Files the running server wrote while SteamCMD worked (saves,
+    configs) are copied over first, unless the update itself changed them; then the symlink flips.
+    The old build stays in its slot for `rollback`.
+    Args:
+        install_path (str): The staged install.
+        standby (str): The slot directory returned by `prepare`.
+        seeded (dict): The snapshot returned by `prepare`.
+        workers (int): Files copied at once.
+    Raises:
+        OSError: The catch-up copy or the flip failed; the old build is still live.
+    """
+    live = slot_path(install_path, live_slot(install_path))
+    updated = _snapshot(standby)
+    # Whatever SteamCMD wrote, added or deleted belongs to the new build, as does its bookkeeping
+    exclude = {relative for relative in set(seeded) | set(updated) if seeded.get(relative) != updated.get(relative)}
+    exclude.update(relative for relative in _snapshot(live) if relative.split(os.sep)[0] == 'steamapps')
+    with metrics.span("staged.swap"):
+        stats = replicate_tree(live, [standby], workers, exclude=exclude)[standby]
+        if stats["error"] is not None:
+            raise OSError(f"Copying files written during the update failed: {stats['error']}")
+        _point(install_path, standby)
+    logging.info(f"{install_path} now points at {standby} ({stats['copied']} files written during the update "
+                 f"carried over); the previous build is kept in {live}")
+
+
+def rollback(install_path):
+    """
+    Point a staged install back at the build before its last update.
+    Returns:
+        str: The slot directory now live.
+    Raises:
+        OSError: The install is not staged, or there is no previous build.
+    """
+    slot = live_slot(install_path)
+    if slot is None:
+        raise FileNotFoundError(f"{install_path} is not a staged install")
+    previous = slot_path(install_path, _other(slot))
+    if not os.path.isdir(previous):
+        raise FileNotFoundError(f"There is no previous build of {install_path} to roll back to")
+    _point(install_path, previous)
+    logging.info(f"Rolled {install_path} back to {previous}")
+    return previous
@@ -1,96 +1,273 @@
 import logging
 import os
+import shlex
+import shutil
 import subprocess
 import tempfile
 import threading
 import time
 import zipfile
-from tkinter import messagebox
+import zlib
 
-import requests
-from tqdm import tqdm
-
-# Set up basic logging configuration
-logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
-
-
-def thread_safe_logging(msg):
-    threading.Thread(target=logging.info, args=(msg,)).start()
+from Downloader import Downloader
+from Metrics import metrics
+from SteamCmdProgress import SteamCmdProgress
+from ZipStream import UnsupportedZip, ZipStreamExtractor
 
 
 class SteamCmdManager:
     STEAMCMD_URL = "https://steamcdn-a.akamaihd.net/client/installer/steamcmd.zip"
+    STEAMCMD_SHA256 = None  # Valve publishes no digest; set this to pin a known archive
     INSTALL_DIR = "C:/SteamCMD"
 
-    def install(self, progress):
-        """Public method to install SteamCMD."""
-        stop_event = threading.Event()
-        threading.Thread(target=self._install_steamcmd, args=(progress, stop_event)).start()
+    @classmethod
+    def executable(cls):
+        """
+        The command line prefix that starts SteamCMD.
+        The STEAMCMD environment variable overrides it, e.g. to point at FakeSteamCmd.py.
+        Returns:
+            list: The executable followed by any fixed arguments.
+        """
+        override = os.environ.get("STEAMCMD")
+        if override:
+            return shlex.split(override, posix=os.name != 'nt')
+        return [os.path.join(cls.INSTALL_DIR, "steamcmd.exe" if os.name == 'nt' else "steamcmd.sh")]
+
+    @staticmethod
+    def stream(args, on_line, cwd=None):
+        """
+        Run SteamCMD, handing each line of its combined stdout/stderr to `on_line` as it is printed.
+        Returns:
+            int: The process exit code.
+        """
+        started = time.perf_counter()
+        process = subprocess.Popen(SteamCmdManager.executable() + list(args), stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, text=True, errors='replace', bufsize=1, cwd=cwd)
+        first_line = True
+        with process.stdout:
+            for line in process.stdout:
+                if first_line:
+                    metrics.observe("steamcmd.startup", time.perf_counter() - started)
+                    first_line = False
+                on_line(line.rstrip())
+        returncode = process.wait()
+        metrics.observe("steamcmd.session", time.perf_counter() - started)
+        metrics.inc("steamcmd.sessions")
+        return returncode
 
     @staticmethod
-    def _install_steamcmd(progress, stop_event):
-        """Download and install SteamCMD."""
+    def run(args, on_progress=None, cwd=None):
+        """
+        Run SteamCMD with its output piped through the progress parser.
+        Args:
+            args (list): SteamCMD arguments, e.g. ['+login', 'anonymous', '+quit'].
+            on_progress (callable): Called with the SteamCmdProgress model whenever a line updates it.
+            cwd (str): Working directory for the process.
+        Returns:
+            tuple: (returncode, SteamCmdProgress)
+        """
+        model = SteamCmdProgress()
+
+        def on_line(line):
+            if model.feed(line):
+                logging.debug(line)
+                if on_progress is not None:
+                    on_progress(model)
+            elif line:
+                logging.info(line)
+
+        returncode = SteamCmdManager.stream(args, on_line, cwd)
+        SteamCmdManager.record_metrics(model)
+        return returncode, model
+
+    @staticmethod
+    def record_metrics(model):
+        """Add a finished app's phase durations and downloaded bytes to the metrics."""
+        if not metrics.enabled:
+            return
+        for phase, seconds in model.phase_durations().items():
+            metrics.observe(f"steamcmd.phase.{phase}", seconds)
+        metrics.inc("steamcmd.bytes_downloaded", model.bytes_downloaded)
+
+    @staticmethod
+    def run_script(script_lines, on_line, cwd=None):
+        """
+        Run many SteamCMD commands in a single session through a generated runscript.
+        Args:
+            script_lines (list): Runscript commands, one per line, without the leading '+'.
+            on_line (callable): Called with every output line.
+            cwd (str): Working directory for the process.
+        Returns:
+            int: The process exit code.
+        """
+        fd, script_path = tempfile.mkstemp(prefix="steamcmd_", suffix=".txt")
         try:
-            steamcmd_zip_path = SteamCmdManager._download_steamcmd(progress)
-            SteamCmdManager._extract_steamcmd(steamcmd_zip_path)
-            SteamCmdManager._run_steamcmd(progress, stop_event)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write("\n".join(script_lines) + "\n")
+            return SteamCmdManager.stream(['+runscript', script_path], on_line, cwd)
+        finally:
+            os.unlink(script_path)
+
+    def install(self, on_progress=None, on_finished=None):
+        """
+        Install SteamCMD on a background thread.
+        Args:
+            on_progress (callable): Called with (stage, percent) as the install advances; stage is
+                "downloading" or "updating". Called from the install thread.
+            on_finished (callable): Called with (succeeded, message) from the install thread.
+        """
+        threading.Thread(target=self._install_steamcmd, args=(on_progress, on_finished)).start()
+
+    @staticmethod
+    def _install_steamcmd(on_progress, on_finished):
+        result = SteamCmdManager.install_steamcmd(on_progress)
+        if on_finished is not None:
+            on_finished(*result)
+
+    @staticmethod
+    def install_steamcmd(on_progress=None):
+        """
+        Download and install SteamCMD in the calling thread.
+        Args:
+            on_progress (callable): Called with (stage, percent) as the install advances.
+        Returns:
+            tuple: (succeeded, message)
+        """
+        try:
+            SteamCmdManager._download_and_extract_steamcmd(on_progress)
+            returncode = SteamCmdManager._run_steamcmd(on_progress)
         except Exception as e:
             logging.error(f"An error occurred during SteamCMD installation: {str(e)}")
-            messagebox.showerror("SteamCMD Installation", "There was an error installing SteamCMD.")
+            return False, "There was an error installing SteamCMD."
+
+        if returncode in (7, 0):
+            return True, "SteamCMD installed successfully."
+        error_message = f"There was an error installing SteamCMD. Error code: {returncode}"
+        logging.error(error_message)
+        return False, error_message
 
     @staticmethod
-    def _download_steamcmd(progress):
-        """Download the SteamCMD installation zip file."""
-        steamcmd_zip_path = os.path.join(tempfile.gettempdir(), "steamcmd.zip")
-        response = requests.get(SteamCmdManager.STEAMCMD_URL, stream=True)
-        total_size = int(response.headers.get('content-length', 0))
-        block_size = 1024
-
-        progress_bar = tqdm(total=total_size, unit='iB', unit_scale=True)
-        with open(steamcmd_zip_path, 'wb') as file:
-            for data in response.iter_content(block_size):
-                progress_bar.update(len(data))
-                file.write(data)
-        progress_bar.close()
-
-        thread_safe_logging('Downloaded the steamcmd.zip file.')
-        return steamcmd_zip_path
+    def _download_and_extract_steamcmd(on_progress=None):
+        """
+        Download the SteamCMD zip and extract it while it downloads.
+        Files land in a staging directory beside INSTALL_DIR, which only replaces it (see `_move_into_place`)
+        once the whole archive has arrived and checked out, so a failed install never leaves a partial SteamCMD.
+        """
+        install_dir = os.path.abspath(SteamCmdManager.INSTALL_DIR)
+        parent_dir = os.path.dirname(install_dir)
+        os.makedirs(parent_dir, exist_ok=True)
+        # Same filesystem as INSTALL_DIR, so moving the files in is a rename
+        staging_dir = tempfile.mkdtemp(prefix=".steamcmd-staging-", dir=parent_dir)
+        extractor = ZipStreamExtractor(staging_dir)
+        streaming = True
+
+        def on_data(offset, chunk):
+            nonlocal streaming
+            if not streaming:
+                return
+            if offset == 0 and extractor.bytes_fed:
+                extractor.reset()
+            try:
+                extractor.feed(chunk)
+            except (UnsupportedZip, zlib.error) as e:
+                logging.warning(f"Extracting steamcmd.zip once it has downloaded instead: {e}")
+                extractor.abort()
+                streaming = False
+
+        try:
+            steamcmd_zip_path = SteamCmdManager._download_steamcmd(on_progress, on_data)
+            try:
+                if streaming:
+                    try:
+                        extractor.close()
+                    except UnsupportedZip as e:
+                        logging.warning(f"Extracting steamcmd.zip from disk: {e}")
+                        streaming = False
+                if not streaming:
+                    shutil.rmtree(staging_dir)
+                    with zipfile.ZipFile(steamcmd_zip_path, 'r') as zip_ref:
+                        zip_ref.extractall(staging_dir)
+            finally:
+                os.remove(steamcmd_zip_path)
+            logging.info('Unzipped the steamcmd.zip file.')
+            SteamCmdManager._move_into_place(staging_dir, install_dir)
+        finally:
+            extractor.abort()
+            shutil.rmtree(staging_dir, ignore_errors=True)
 
     @staticmethod
-    def _extract_steamcmd(steamcmd_zip_path):
-        """Extract the contents of the downloaded zip file."""
-        if not os.path.exists(SteamCmdManager.INSTALL_DIR):
-            os.makedirs(SteamCmdManager.INSTALL_DIR)
+    def _download_steamcmd(on_progress=None, on_data=None):
+        """Download the SteamCMD installation zip file, handing its bytes to `on_data` as they arrive."""
+        steamcmd_zip_path = os.path.join(tempfile.gettempdir(), "steamcmd.zip")
 
-        with zipfile.ZipFile(steamcmd_zip_path, 'r') as zip_ref:
-            zip_ref.extractall(SteamCmdManager.INSTALL_DIR)
+        def on_bytes(done, total):
+            if total and on_progress is not None:
+                on_progress("downloading", done * 100 / total)
 
-        thread_safe_logging('Unzipped the steamcmd.zip file.')
+        # Resumes a previously interrupted download of the archive
+        digest = Downloader().download(SteamCmdManager.STEAMCMD_URL, steamcmd_zip_path,
+                                       SteamCmdManager.STEAMCMD_SHA256, on_bytes, on_data)
+        logging.info(f'Downloaded the steamcmd.zip file (SHA-256 {digest}).')
+        return steamcmd_zip_path
 
     @staticmethod
-    def _run_steamcmd(progress, stop_event):
-        """Run the SteamCMD installation."""
-        os.chdir(SteamCmdManager.INSTALL_DIR)
-        progress['value'] = 0
-        threading.Thread(target=SteamCmdManager.progress_animation, args=(progress, 100, stop_event)).start()
-
-        process = subprocess.Popen('steamcmd +quit', shell=True)
-        process.wait()
-
-        stop_event.set()
-        progress['value'] = 100
-        progress.stop()
-
-        if process.returncode in (7, 0):
-            messagebox.showinfo("SteamCMD Installation", "SteamCMD installed successfully.")
-        else:
-            error_message = f"There was an error installing SteamCMD. Error code: {process.returncode}"
-            logging.error(error_message)
-            messagebox.showerror("SteamCMD Installation", error_message)
+    def _move_into_place(staging_dir, install_dir):
+        """
+        Make the staged files the install directory, all at once.
+        A fresh install is a single directory rename. Over an existing install, the files the archive does
+        not contain (SteamCMD's self-updates, logs) are linked into the staging directory first, then the
+        directories are swapped: the old install is renamed to `<install_dir>.old` and the staging directory
+        takes its place. A crash can only leave the install missing between those two renames, and the next
+        install renames the old one back first; SteamCMD is never left half old and half new.
+        """
+        previous_dir = install_dir + ".old"
+        if not os.path.exists(install_dir) and os.path.isdir(previous_dir):
+            logging.warning(f"Restoring {install_dir} from {previous_dir}, left by an interrupted install")
+            os.rename(previous_dir, install_dir)
+        if not os.path.exists(install_dir):
+            os.replace(staging_dir, install_dir)
+            return
+        carried = SteamCmdManager._carry_over(install_dir, staging_dir)
+        shutil.rmtree(previous_dir, ignore_errors=True)
+        os.rename(install_dir, previous_dir)
+        try:
+            os.rename(staging_dir, install_dir)
+        except OSError:
+            os.rename(previous_dir, install_dir)
+            raise
+        shutil.rmtree(previous_dir, ignore_errors=True)
+        logging.info(f"Replaced SteamCMD in {install_dir}, keeping {carried} files the archive does not contain.")
 
     @staticmethod
-    def progress_animation(progress, target, stop_event):
-        """Animate the progress bar until it reaches the target value."""
-        while progress['value'] < target and not stop_event.is_set():
-            time.sleep(0.1)  # Delay between each increment
-            progress['value'] += 0.2  # Increment the progress bar
+    def _carry_over(install_dir, staging_dir):
+        """Hard-link (or copy) the files of `install_dir` that `staging_dir` lacks into it; returns how many."""
+        carried = 0
+        for root, _, files in os.walk(install_dir):
+            target_root = os.path.normpath(os.path.join(staging_dir, os.path.relpath(root, install_dir)))
+            os.makedirs(target_root, exist_ok=True)
+            for name in files:
+                source, target = os.path.join(root, name), os.path.join(target_root, name)
+                if os.path.lexists(target):
+                    continue
+                try:
+                    os.link(source, target, follow_symlinks=False)
+                except OSError:
+                    shutil.copy2(source, target, follow_symlinks=False)
+                carried += 1
+        return carried
+
+    @staticmethod
+    def _run_steamcmd(on_progress=None):
+        """
+        Run SteamCMD once; the first run downloads SteamCMD's own update.
+        Returns:
+            int: The exit code.
+        """
+        def on_model(model):
+            if on_progress is not None:
+                on_progress("updating", model.overall_percent)
+
+        returncode, _ = SteamCmdManager.run(['+quit'], on_progress=on_model, cwd=SteamCmdManager.INSTALL_DIR)
+        if on_progress is not None:
+            on_progress("updating", 100)
+        return returncode
@@ -0,0 +1,166 @@
+import re
+import time
+
+# Update state (0x61) downloading, progress: 45.23 (123456 / 456789)
+_UPDATE_STATE = re.compile(
+    r'Update state \((0x[0-9a-fA-F]+)\) ([\w ]+?), progress: ([\d.]+) \((\d+) / (\d+)\)'
+)
+# [ 45%] Downloading update (12,345 of 67,890 KB)...
+_SELF_UPDATE = re.compile(r'\[\s*(\d+)%\] Downloading update \(([\d,]+) of ([\d,]+) KB\)')
+_SUCCESS = re.compile(r"Success! App '(\d+)' (?:fully installed|already up to date)")
+_ERROR = re.compile(r"(?:ERROR|Error)! (.*)")
+_ERROR_APP = re.compile(r"[Aa]pp '(\d+)'")
+
+# Share of the overall bar each phase covers
+PHASE_RANGES = {
+    "reconfiguring": (0, 2),
+    "preallocating": (2, 5),
+    "self-update": (0, 100),
+    "downloading": (5, 85),
+    "verifying": (85, 98),
+    "committing": (98, 100),
+}
+
+
+def _phase_name(state_text):
+    state_text = state_text.lower()
+    for phase in ("downloading", "verifying", "committing", "preallocating", "reconfiguring"):
+        if phase in state_text:
+            return phase
+    return state_text
+
+
+def parse_app_result(line):
+    """
+    Recognise the line SteamCMD prints when it has finished with an app.
+    Returns:
+        tuple: (appid, succeeded) or None if the line is not an app result.
+    """
+    match = _SUCCESS.search(line)
+    if match:
+        return match.group(1), True
+    match = _ERROR.search(line)
+    if match:
+        app = _ERROR_APP.search(match.group(1))
+        if app:
+            return app.group(1), False
+    return None
+
+
+class SteamCmdProgress:
+    """
+    Progress model fed with SteamCMD's output, one line at a time.
+
+    Tracks the current phase, bytes done/total for that phase, a smoothed transfer rate and an
+    ETA, plus an overall percentage that weights the phases against each other.
+    """
+
+    RATE_SMOOTHING = 0.3  # Weight of the newest sample in the exponential moving average
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.phase = None
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self.rate = 0.0
+        self.succeeded = False
+        self.error = None
+        self.finished = False  # An app-scoped result line was seen, see parse_app_result
+        self.bytes_downloaded = 0
+        self.phase_seconds = {}  # Time spent in each finished phase
+        self._phase_started = None
+        self._last_sample = None
+
+    @property
+    def percent(self):
+        """Progress of the current phase, 0-100."""
+        if not self.bytes_total:
+            return 0.0
+        return min(100.0, self.bytes_done * 100.0 / self.bytes_total)
+
+    @property
+    def overall_percent(self):
+        if self.succeeded:
+            return 100.0
+        if self.phase not in PHASE_RANGES:
+            return 0.0
+        start, end = PHASE_RANGES[self.phase]
+        return start + (end - start) * self.percent / 100.0
+
+    @property
+    def eta(self):
+        """Seconds until the current phase finishes, or None while the rate is unknown."""
+        if self.rate <= 0 or not self.bytes_total:
+            return None
+        return max(0.0, (self.bytes_total - self.bytes_done) / self.rate)
+
+    def feed(self, line):
+        """
+        Parse one line of SteamCMD output.
+        Args:
+            line (str): The output line.
+        Returns:
+            bool: True if the line changed the progress model.
+        """
+        match = _UPDATE_STATE.search(line)
+        if match:
+            self._sample(_phase_name(match.group(2)), int(match.group(4)), int(match.group(5)))
+            return True
+        match = _SELF_UPDATE.search(line)
+        if match:
+            done, total = (int(group.replace(',', '')) * 1024 for group in match.group(2, 3))
+            self._sample("self-update", done, total)
+            return True
+        if _SUCCESS.search(line):
+            # The app made it, so an earlier error that named no app did not stop it
+            self.succeeded = self.finished = True
+            self.error = None
+            return True
+        match = _ERROR.search(line)
+        if match:
+            self.error = match.group(1).strip()
+            self.finished = self.finished or _ERROR_APP.search(self.error) is not None
+            return True
+        return False
+
+    def _sample(self, phase, done, total):
+        now = self.clock()
+        if phase != self.phase:
+            if self.phase is not None:
+                self.phase_seconds[self.phase] = self.phase_seconds.get(self.phase, 0.0) + now - self._phase_started
+            self._phase_started = now
+            self.phase = phase
+            self.rate = 0.0
+            self._last_sample = None
+        if self._last_sample is not None:
+            last_time, last_done = self._last_sample
+            elapsed = now - last_time
+            if elapsed > 0 and done >= last_done:
+                instant = (done - last_done) / elapsed
+                self.rate = instant if not self.rate else (
+                    self.RATE_SMOOTHING * instant + (1 - self.RATE_SMOOTHING) * self.rate)
+        self._last_sample = (now, done)
+        self.bytes_done = done
+        self.bytes_total = total
+        if phase == "downloading":
+            self.bytes_downloaded = max(self.bytes_downloaded, done)
+
+    def phase_durations(self):
+        """Seconds spent in each phase so far, the current one included."""
+        durations = dict(self.phase_seconds)
+        if self.phase is not None:
+            durations[self.phase] = durations.get(self.phase, 0.0) + self.clock() - self._phase_started
+        return durations
+
+    def describe(self):
+        """A one-line human readable summary, e.g. for a status label."""
+        if self.phase is None:
+            return "Starting SteamCMD..."
+        text = f"{self.phase.capitalize()}: {self.percent:.1f}%"
+        if self.bytes_total:
+            text += f" ({self.bytes_done / 1048576:.1f} / {self.bytes_total / 1048576:.1f} MiB)"
+        if self.rate:
+            text += f" at {self.rate / 1048576:.1f} MiB/s"
+        if self.eta is not None:
+            text += f", {int(self.eta) // 60}m {int(self.eta) % 60:02d}s left"
+        return text
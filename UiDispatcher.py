@@ -0,0 +1,33 @@
+import logging
+import queue
+
+
+class UiDispatcher:
+    """
+    Marshals callbacks from worker threads onto the Tk thread.
+
+    Worker threads `post()` callables into a queue; the Tk thread drains it on an `after()` tick,
+    so no Tk call is ever made from outside the main loop.
+    """
+
+    def __init__(self, window, interval_ms=30):
+        self.window = window
+        self.interval_ms = interval_ms
+        self._queue = queue.SimpleQueue()
+        self.window.after(self.interval_ms, self._drain)
+
+    def post(self, callback, *args):
+        """Queue `callback(*args)` to run on the Tk thread; safe to call from any thread."""
+        self._queue.put((callback, args))
+
+    def _drain(self):
+        while True:
+            try:
+                callback, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                logging.error(f"UI callback failed: {e}")
+        self.window.after(self.interval_ms, self._drain)
@@ -0,0 +1,123 @@
+"""Reader and writer for Valve's text KeyValues (VDF) format, as used by appmanifest_*.acf files."""
+
+_ESCAPES = {'n': '\n', 't': '\t', '\\': '\\', '"': '"'}
+_UNESCAPES = {value: f'\\{key}' for key, value in _ESCAPES.items()}
+
+
+class VdfError(ValueError):
+    pass
+
+
+def _tokens(text):
+    """Yield ('str', value), ('{', None) and ('}', None) tokens, skipping comments and conditionals."""
+    i, length = 0, len(text)
+    while i < length:
+        char = text[i]
+        if char.isspace():
+            i += 1
+        elif char == '/' and text.startswith('//', i):
+            newline = text.find('\n', i)
+            i = length if newline == -1 else newline + 1
+        elif char in '{}':
+            yield char, None
+            i += 1
+        elif char == '[':
+            # Platform conditionals such as [$WIN32] are not evaluated
+            close = text.find(']', i)
+            i = length if close == -1 else close + 1
+        elif char == '"':
+            i += 1
+            parts = []
+            start = i
+            while True:
+                if i >= length:
+                    raise VdfError("Unterminated string")
+                char = text[i]
+                if char == '"':
+                    break
+                if char == '\\' and i + 1 < length:
+                    parts.append(text[start:i])
+                    parts.append(_ESCAPES.get(text[i + 1], text[i + 1]))
+                    i += 2
+                    start = i
+                    continue
+                i += 1
+            parts.append(text[start:i])
+            yield 'str', ''.join(parts)
+            i += 1
+        else:
+            start = i
+            while i < length and not text[i].isspace() and text[i] not in '{}"':
+                i += 1
+            yield 'str', text[start:i]
+
+
+def loads(text):
+    """
+    Parse KeyValues text.
+    Args:
+        text (str): The document.
+    Returns:
+        dict: Nested dicts of string keys and string values, in document order.
+    """
+    root = {}
+    stack = [root]
+    key = None
+    for kind, value in _tokens(text):
+        if kind == 'str':
+            if key is None:
+                key = value
+            else:
+                stack[-1][key] = value
+                key = None
+        elif kind == '{':
+            if key is None:
+                raise VdfError("Section without a name")
+            section = {}
+            stack[-1][key] = section
+            stack.append(section)
+            key = None
+        else:
+            if len(stack) == 1 or key is not None:
+                raise VdfError("Unbalanced '}'")
+            stack.pop()
+    if len(stack) != 1 or key is not None:
+        raise VdfError("Unexpected end of document")
+    return root
+
+
+def load(path):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return loads(f.read())
+
+
+def _quote(value):
+    return '"' + ''.join(_UNESCAPES.get(char, char) for char in value) + '"'
+
+
+def dumps(data, indent=0):
+    """Serialize nested dicts back to KeyValues text, tab-indented like Steam writes it."""
+    lines = []
+    pad = '\t' * indent
+    for key, value in data.items():
+        if isinstance(value, dict):
+            lines.append(f"{pad}{_quote(key)}")
+            lines.append(f"{pad}{{")
+            body = dumps(value, indent + 1)
+            if body:
+                lines.append(body.rstrip('\n'))
+            lines.append(f"{pad}}}")
+        else:
+            lines.append(f"{pad}{_quote(key)}\t\t{_quote(str(value))}")
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+def get(section, key, default=None):
+    """Case-insensitive lookup; Steam has written both "appid" and "appID" over the years."""
+    if key in section:
+        return section[key]
+    lowered = key.lower()
+    for candidate, value in section.items():
+        if candidate.lower() == lowered:
+            return value
+    return default
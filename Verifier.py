@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+import time
+
+from AppManifest import ManifestIndex
+from Dedupe import scan
+from FileHashes import hash_files
+from Metrics import metrics
+
+
+def manifest_path(install_path, appid):
+    """Where the hash manifest of an app lives: beside its appmanifest, so it travels with the install."""
+    return os.path.join(install_path, 'steamapps', f'servermanager_hashes_{appid}.json')
+
+
+def load_manifest(install_path, appid):
+    """
+    Read an install's hash manifest.
+    Returns:
+        dict: {"appid", "buildid", "recorded_at", "files": {relative path: [size, mtime_ns, sha256]}},
+        or None if there is none (or it is unreadable).
+    """
+    try:
+        with open(manifest_path(install_path, appid), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if isinstance(manifest.get("files"), dict) else None
+
+
+def _save_manifest(install_path, appid, buildid, files):
+    path = manifest_path(install_path, appid)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"appid": str(appid), "buildid": buildid, "recorded_at": time.time(), "files": files}, f)
+    os.replace(tmp_path, path)
+
+
+def _relative(install_path, path):
+    return os.path.relpath(path, install_path).replace(os.sep, '/')
+
+
+def record(install_path, appid, workers=None):
+    """
+    Hash every file of an install and save its hash manifest; call after SteamCMD succeeded.
+    Files whose size and mtime match the previous manifest keep their digest, so after an update
+    only the files SteamCMD rewrote are hashed.
+    Returns:
+        int: The number of files hashed.
+    """
+    previous = (load_manifest(install_path, appid) or {}).get("files", {})
+    files, to_hash = {}, []
+    for path, stat in scan([install_path]):
+        relative = _relative(install_path, path)
+        entry = previous.get(relative)
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            files[relative] = entry
+        else:
+            to_hash.append((path, stat))
+    with metrics.span("verify.record"):
+        digests = hash_files(to_hash, workers=workers)
+    for path, stat in to_hash:
+        if path in digests:
+            files[_relative(install_path, path)] = [stat.st_size, stat.st_mtime_ns, digests[path]]
+    app = ManifestIndex.for_library(install_path).get(appid)
+    _save_manifest(install_path, appid, app.buildid if app is not None else "", files)
+    logging.info(f"Recorded the hashes of {len(files)} files of app {appid} in {install_path} "
+                 f"({len(to_hash)} hashed)")
+    return len(to_hash)
+
+
+def verify(install_path, appid, workers=None, deep=False):
+    """
+    Check an install against its hash manifest.
+
+    A file whose size changed has drifted without being read. A file whose mtime changed is only
+    suspect: it is re-hashed, together with the other suspects, in a process pool. With `deep`,
+    every file is re-hashed. Files added since the manifest was recorded (configs, saves, logs)
+    are not drift.
+    Args:
+        install_path (str): The install directory.
+        appid (str): The app to check.
+        workers (int): Hashing processes.
+        deep (bool): Re-hash files whose size and mtime still match.
+    Returns:
+        dict: clean (bool), reason (why the check could not vouch for the install, or None), checked,
+        hashed, missing and modified (relative paths).
+    """
+    report = {"clean": False, "reason": None, "checked": 0, "hashed": 0, "missing": [], "modified": []}
+    manifest = load_manifest(install_path, appid)
+    app = ManifestIndex.for_library(install_path).get(appid)
+    if manifest is None:
+        report["reason"] = "no hash manifest has been recorded"
+        return report
+    if app is None or manifest.get("buildid") != app.buildid:
+        report["reason"] = f"the hash manifest is for build {manifest.get('buildid') or 'unknown'}"
+        return report
+
+    suspects = []
+    with metrics.span("verify.check"):
+        for relative, (size, mtime_ns, digest) in manifest["files"].items():
+            path = os.path.join(install_path, *relative.split('/'))
+            try:
+                stat = os.stat(path)
+            except OSError:
+                report["missing"].append(relative)
+                continue
+            if stat.st_size != size:
+                report["modified"].append(relative)
+            elif deep or stat.st_mtime_ns != mtime_ns:
+                suspects.append((path, stat, relative, digest))
+        report["checked"] = len(manifest["files"])
+
+        digests = hash_files([(path, stat) for path, stat, _, _ in suspects], workers=workers)
+        refreshed = False
+        for path, stat, relative, digest in suspects:
+            if digests.get(path) != digest:
+                report["modified"].append(relative)
+            elif stat.st_mtime_ns != manifest["files"][relative][1]:
+                # Same content, new mtime (e.g. relinked by dedupe): trust the new mtime next time
+                manifest["files"][relative] = [stat.st_size, stat.st_mtime_ns, digest]
+                refreshed = True
+        report["hashed"] = len(suspects)
+    if refreshed:
+        _save_manifest(install_path, appid, manifest["buildid"], manifest["files"])
+
+    report["clean"] = not report["missing"] and not report["modified"]
+    metrics.inc("verify.files_checked", report["checked"])
+    metrics.inc("verify.files_hashed", report["hashed"])
+    if not report["clean"]:
+        metrics.inc("verify.drift")
+        report["reason"] = f"{len(report['modified'])} modified and {len(report['missing'])} missing files"
+        logging.warning(f"App {appid} in {install_path} has drifted: {report['reason']}")
+    return report
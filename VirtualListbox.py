@@ -0,0 +1,146 @@
+import tkinter as tk
+import tkinter.font as tkfont
+
+
+class VirtualListbox(tk.Listbox):
+    """
+    A Listbox that displays a window onto an in-memory sequence of items.
+
+    Only the rows that fit on screen are ever inserted into Tk, so replacing the items costs the
+    same for ten entries as for the full Steam catalog. `curselection()`, `get()` and `size()`
+    work with indices into the item sequence, so code written against a plain Listbox keeps
+    working. Attach a scrollbar with `attach_scrollbar()`.
+    """
+
+    def __init__(self, master=None, **kwargs):
+        kwargs.setdefault('exportselection', False)  # Keep the selection while other widgets select text
+        super().__init__(master, **kwargs)
+        self._items = ()
+        self._top = 0
+        self._rows = int(self.cget('height'))
+        self._selected = None
+        self._scrollbar = None
+        self.bind('<Configure>', self._on_configure)
+        self.bind('<MouseWheel>', self._on_mousewheel)
+        self.bind('<Button-4>', lambda event: self._scroll_units(-3))
+        self.bind('<Button-5>', lambda event: self._scroll_units(3))
+        self.bind('<Up>', lambda event: self._move_selection(-1))
+        self.bind('<Down>', lambda event: self._move_selection(1))
+        self.bind('<Prior>', lambda event: self._move_selection(-self._rows))
+        self.bind('<Next>', lambda event: self._move_selection(self._rows))
+        self.bind('<Home>', lambda event: self._move_selection(-len(self._items)))
+        self.bind('<End>', lambda event: self._move_selection(len(self._items)))
+
+    def configure(self, cnf=None, **kwargs):
+        result = super().configure(cnf, **kwargs)
+        if 'font' in kwargs or (cnf and 'font' in cnf):
+            self._on_configure()  # The row height changed, so the number of visible rows may too
+        return result
+
+    config = configure
+
+    def attach_scrollbar(self, scrollbar):
+        self._scrollbar = scrollbar
+        scrollbar.configure(command=self.yview)
+        self._update_scrollbar()
+
+    def set_items(self, items):
+        """
+        Replace the displayed items.
+        Args:
+            items (sequence): The items to show; kept by reference, never copied into Tk.
+        """
+        self._items = items
+        self._top = 0
+        self._selected = None
+        self._render()
+
+    def size(self):
+        return len(self._items)
+
+    def get(self, first, last=None):
+        if last is None:
+            return self._items[first]
+        return list(self._items[first:last + 1])
+
+    def curselection(self):
+        visible = super().curselection()
+        if visible:
+            self._selected = self._top + visible[0]
+        return (self._selected,) if self._selected is not None else ()
+
+    def selection_set_item(self, index):
+        """Select the item at `index`, scroll it into view and notify `<<ListboxSelect>>` listeners."""
+        if not self._items:
+            return
+        self._selected = max(0, min(index, len(self._items) - 1))
+        self.see(self._selected)
+        # see() only re-renders when it scrolls; Tk's highlight must move either way, or
+        # curselection() would read the old row back
+        self._show_selection()
+        self.event_generate('<<ListboxSelect>>')
+
+    def see(self, index):
+        if index < self._top:
+            self._set_top(index)
+        elif index >= self._top + self._rows:
+            self._set_top(index - self._rows + 1)
+
+    def yview(self, *args):
+        if not args:
+            return self._fractions()
+        if args[0] == 'moveto':
+            self._set_top(int(float(args[1]) * len(self._items)))
+        elif args[0] == 'scroll':
+            count, what = int(args[1]), args[2]
+            self._scroll_units(count * self._rows if what == 'pages' else count)
+
+    def _fractions(self):
+        total = len(self._items)
+        if not total:
+            return 0.0, 1.0
+        return self._top / total, min(1.0, (self._top + self._rows) / total)
+
+    def _set_top(self, top):
+        top = max(0, min(top, len(self._items) - self._rows))
+        if top != self._top:
+            self._top = top
+            self._render()
+
+    def _scroll_units(self, count):
+        self._set_top(self._top + count)
+        return 'break'
+
+    def _move_selection(self, delta):
+        current = self.curselection()
+        self.selection_set_item(current[0] + delta if current else 0)
+        return 'break'
+
+    def _on_mousewheel(self, event):
+        return self._scroll_units(-3 if event.delta > 0 else 3)
+
+    def _on_configure(self, event=None):
+        linespace = tkfont.Font(font=self.cget('font')).metrics('linespace')
+        row_height = linespace + 2 * int(self.cget('selectborderwidth')) + 1
+        rows = max(1, (self.winfo_height() - 2 * int(self.cget('borderwidth'))) // row_height)
+        if rows != self._rows:
+            self._rows = rows
+            self._top = max(0, min(self._top, len(self._items) - rows))
+            self._render()
+
+    def _render(self):
+        super().delete(0, tk.END)
+        visible = self._items[self._top:self._top + self._rows]
+        if visible:
+            super().insert(tk.END, *visible)
+        self._show_selection()
+        self._update_scrollbar()
+
+    def _show_selection(self):
+        super().selection_clear(0, tk.END)
+        if self._selected is not None and self._top <= self._selected < self._top + self._rows:
+            super().selection_set(self._selected - self._top)
+
+    def _update_scrollbar(self):
+        if self._scrollbar is not None:
+            self._scrollbar.set(*self._fractions())
@@ -0,0 +1,185 @@
+import os
+import struct
+import zlib
+
+LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+LOCAL_SIGNATURE = 0x04034b50
+CENTRAL_SIGNATURES = (0x02014b50, 0x06054b50, 0x06064b50)  # Central directory, end records
+DESCRIPTOR_SIGNATURE = 0x08074b50
+STORED, DEFLATED = 0, 8
+FLAG_ENCRYPTED, FLAG_DESCRIPTOR, FLAG_UTF8 = 0x1, 0x8, 0x800
+
+
+class UnsupportedZip(Exception):
+    """The archive uses a feature that cannot be extracted while streaming; extract it from disk instead."""
+
+
+class ZipStreamExtractor:
+    """
+    Extracts a zip archive while it is still being downloaded.
+
+    Bytes are fed in archive order. Each entry is found through its local file header, inflated as
+    its data arrives and checked against its CRC-32, so the archive only has to be read once. Parsing
+    stops at the central directory. Entries that cannot be streamed (encryption, unknown compression,
+    stored entries of unknown size) raise UnsupportedZip.
+    """
+
+    def __init__(self, target_dir):
+        self.target_dir = target_dir
+        self.files = []  # Relative paths of the extracted files, in archive order
+        self.done = False
+        self.bytes_fed = 0
+        self._buffer = bytearray()
+        self._entry = None
+
+    def feed(self, chunk):
+        if self.done:
+            return
+        self.bytes_fed += len(chunk)
+        self._buffer += chunk
+        while not self.done and self._step():
+            pass
+
+    def reset(self):
+        """Start over from the first byte of the archive, e.g. when a download restarts."""
+        self.abort()
+        self._buffer.clear()
+        self.files = []
+        self.done = False
+        self.bytes_fed = 0
+
+    def abort(self):
+        """Close the entry being written after a failure, so the target directory can be removed."""
+        if self._entry is not None and self._entry["file"] is not None:
+            self._entry["file"].close()
+        self._entry = None
+
+    def close(self):
+        """Check that the archive ended where it should; call once every byte has been fed."""
+        if self._entry is not None or not self.done:
+            raise UnsupportedZip("The archive ended in the middle of an entry")
+
+    def _step(self):
+        """Consume as much of the buffer as possible for the current state; False when more data is needed."""
+        if self._entry is None:
+            return self._read_header()
+        return self._read_data()
+
+    def _read_header(self):
+        if len(self._buffer) < 4:
+            return False
+        signature = struct.unpack_from('<I', self._buffer)[0]
+        if signature in CENTRAL_SIGNATURES:
+            self.done = True
+            self._buffer.clear()
+            return False
+        if signature != LOCAL_SIGNATURE:
+            raise UnsupportedZip(f"Unexpected signature {signature:#010x} at a file header")
+        if len(self._buffer) < LOCAL_HEADER.size:
+            return False
+        (_, _, flags, method, _, _, crc, compressed_size, size,
+         name_length, extra_length) = LOCAL_HEADER.unpack_from(self._buffer)
+        header_length = LOCAL_HEADER.size + name_length + extra_length
+        if len(self._buffer) < header_length:
+            return False
+        raw_name = bytes(self._buffer[LOCAL_HEADER.size:LOCAL_HEADER.size + name_length])
+        extra = bytes(self._buffer[LOCAL_HEADER.size + name_length:header_length])
+        del self._buffer[:header_length]
+
+        name = raw_name.decode('utf-8' if flags & FLAG_UTF8 else 'cp437')
+        if flags & FLAG_ENCRYPTED:
+            raise UnsupportedZip(f"{name} is encrypted")
+        if method not in (STORED, DEFLATED):
+            raise UnsupportedZip(f"{name} uses compression method {method}")
+        if compressed_size == 0xFFFFFFFF or size == 0xFFFFFFFF:
+            size, compressed_size = _zip64_sizes(extra, size, compressed_size)
+        has_descriptor = bool(flags & FLAG_DESCRIPTOR)
+        if has_descriptor and method == STORED and not name.endswith('/'):
+            raise UnsupportedZip(f"{name} is stored with a data descriptor; its size is unknown")
+
+        path = self._target_path(name)
+        entry = {"name": name, "method": method, "crc": crc, "remaining": compressed_size,
+                 "descriptor": has_descriptor, "actual_crc": 0, "file": None, "path": path,
+                 "inflater": zlib.decompressobj(-15) if method == DEFLATED else None}
+        if name.endswith('/'):
+            os.makedirs(path, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            entry["file"] = open(path, 'wb')
+        self._entry = entry
+        return True
+
+    def _read_data(self):
+        entry = self._entry
+        if entry["descriptor"]:
+            # Only the deflate stream knows where it ends; a stored directory entry has no data
+            if entry["inflater"] is not None and not entry["inflater"].eof:
+                if not self._buffer:
+                    return False
+                data = bytes(self._buffer)
+                self._buffer.clear()
+                self._write(entry, entry["inflater"].decompress(data))
+                if entry["inflater"].eof:
+                    self._buffer[:0] = entry["inflater"].unused_data
+                return entry["inflater"].eof
+            if len(self._buffer) < 4:
+                return False
+            has_signature = struct.unpack_from('<I', self._buffer)[0] == DESCRIPTOR_SIGNATURE
+            descriptor_length = 16 if has_signature else 12
+            if len(self._buffer) < descriptor_length:
+                return False
+            entry["crc"] = struct.unpack_from('<I', self._buffer, 4 if has_signature else 0)[0]
+            del self._buffer[:descriptor_length]
+            self._finish_entry()
+            return True
+
+        if entry["remaining"] and not self._buffer:
+            return False
+        data = bytes(self._buffer[:entry["remaining"]])
+        del self._buffer[:len(data)]
+        entry["remaining"] -= len(data)
+        if entry["inflater"] is not None:
+            data = entry["inflater"].decompress(data)
+            if not entry["remaining"]:
+                data += entry["inflater"].flush()
+        self._write(entry, data)
+        if entry["remaining"]:
+            return False
+        self._finish_entry()
+        return True
+
+    @staticmethod
+    def _write(entry, data):
+        if data and entry["file"] is not None:
+            entry["file"].write(data)
+        entry["actual_crc"] = zlib.crc32(data, entry["actual_crc"])
+
+    def _finish_entry(self):
+        entry, self._entry = self._entry, None
+        if entry["file"] is not None:
+            entry["file"].close()
+            self.files.append(entry["name"])
+        if entry["actual_crc"] != entry["crc"]:
+            raise UnsupportedZip(f"CRC mismatch in {entry['name']}")
+
+    def _target_path(self, name):
+        parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.')]
+        if not parts or '..' in parts or os.path.isabs(name) or ':' in parts[0]:
+            raise UnsupportedZip(f"Refusing to extract {name!r} outside the target directory")
+        path = os.path.join(self.target_dir, *parts)
+        return path + os.sep if name.endswith('/') else path
+
+
+def _zip64_sizes(extra, size, compressed_size):
+    offset = 0
+    while offset + 4 <= len(extra):
+        tag, length = struct.unpack_from('<HH', extra, offset)
+        if tag == 0x0001:
+            values = iter(struct.unpack_from(f'<{length // 8}Q', extra, offset + 4))
+            if size == 0xFFFFFFFF:
+                size = next(values)
+            if compressed_size == 0xFFFFFFFF:
+                compressed_size = next(values)
+            return size, compressed_size
+        offset += 4 + length
+    raise UnsupportedZip("Zip64 entry without a Zip64 extra field")
@@ -0,0 +1,29 @@
+import os
+import shlex
+import sys
+
+import pytest
+
+# The modules live flat in the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(monkeypatch, tmp_path_factory):
+    """Keep the app type cache out of the home directory and start every test with no cached build IDs."""
+    import RemoteBuilds
+    import ServerManager
+
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path_factory.mktemp("localappdata")))
+    monkeypatch.setattr(ServerManager, "remote_builds", RemoteBuilds.RemoteBuildCache())
+
+
+@pytest.fixture
+def fake_steamcmd(monkeypatch):
+    """Point SteamCMD at FakeSteamCmd.py, started with the given options."""
+    def use(*options):
+        command = [sys.executable, os.path.join(ROOT, "FakeSteamCmd.py"), "--speed", "1000", "--steps", "2",
+                   "--size", "4096", *options]
+        monkeypatch.setenv("STEAMCMD", shlex.join(command))
+    return use
@@ -0,0 +1,54 @@
+import http.server
+import json
+import threading
+
+import pytest
+
+from ApiManager import ApiManager
+from AppListCache import AppListCache
+
+APPS = [{"appid": 896660, "name": "Valheim Dedicated Server"}, {"appid": 10, "name": "Counter-Strike"},
+        {"appid": 376030, "name": "ARK: Survival Evolved Dedicated Server"}]
+BODY = json.dumps({"applist": {"apps": APPS}}).encode('utf-8')
+
+
+@pytest.fixture
+def api_url():
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(BODY)))
+            self.send_header('ETag', '"v1"')
+            self.end_headers()
+            # Dribble the body out so the parser sees entries split across chunks
+            for start in range(0, len(BODY), 7):
+                self.wfile.write(BODY[start:start + 7])
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/GetAppList/v2/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_streams_into_a_catalog_and_revalidates(api_url, tmp_path):
+    catalogs = []
+    api_manager = ApiManager(api_url=api_url, cache=AppListCache(str(tmp_path)))
+    try:
+        api_manager.submit(api_manager.get_dedicated_servers(catalogs.append)).result(timeout=30)
+        assert len(catalogs) == 1
+        assert list(catalogs[0].items()) == sorted(((app["name"], app["appid"]) for app in APPS),
+                                                   key=lambda app: app[0].lower())
+        assert list(api_manager.cache.load().items()) == list(catalogs[0].items())
+        # The cached validators make the second request a 304, which publishes nothing new
+        api_manager.submit(api_manager.get_dedicated_servers(catalogs.append)).result(timeout=30)
+        assert len(catalogs) == 1
+    finally:
+        api_manager.close()
@@ -0,0 +1,97 @@
+import random
+import string
+import sys
+from array import array
+
+import pytest
+
+from AppCatalog import _HEADER, MAGIC, AppCatalog, CatalogBuilder
+
+APPS = [("Valheim Dedicated Server", 896660), ("ARK: Survival Evolved Dedicated Server", 376030),
+        ("arma 3 server", 233780), ("Ångström Server", 5), ("Valheim Dedicated Server", 1), ("", 7)]
+
+
+def test_builder_sorts_case_insensitively_and_keeps_duplicates():
+    builder = CatalogBuilder()
+    for name, appid in APPS:
+        builder.add(name, appid)
+    assert len(builder) == len(APPS)
+    catalog = builder.finish()
+    assert list(catalog.items()) == sorted(APPS, key=lambda app: app[0].lower().encode('utf-8'))
+    assert [catalog.lowered_name(index) for index in range(len(catalog))] == sorted(
+        name.lower() for name, _ in APPS)
+    assert len(builder) == 0 and len(builder.finish()) == 0
+
+
+def test_builder_sorts_a_name_before_its_extensions():
+    catalog = AppCatalog.from_pairs([("ab c", 1), ("ab\tc", 2), ("AB", 3), ("line\nbreak", 4)])
+    assert [appid for _, appid in catalog.items()] == [3, 2, 1, 4]
+    assert catalog.lowered_name(3) == "line break"
+
+
+def test_from_pairs_matches_the_builder():
+    builder = CatalogBuilder()
+    for name, appid in APPS:
+        builder.add(name, appid)
+    assert AppCatalog.from_pairs(APPS).to_bytes() == builder.finish().to_bytes()
+
+
+def random_catalog(count=2000, seed=0):
+    rng = random.Random(seed)
+    words = ["server", "dedicated", "Ärger", "straße", "ark", "valheim"] + [
+        "".join(rng.choices(string.ascii_letters, k=rng.randint(1, 6))) for _ in range(200)]
+    pairs = [(" ".join(rng.choice(words) for _ in range(rng.randint(1, 4))), rng.randint(1, count // 2))
+             for _ in range(count)]
+    catalog = AppCatalog.from_pairs(pairs)
+    catalog.categories = array('B', (rng.randrange(6) for _ in range(len(catalog))))
+    return catalog
+
+
+def test_to_bytes_round_trip():
+    catalog = random_catalog()
+    data = catalog.to_bytes()
+    assert data.startswith(MAGIC)
+    loaded = AppCatalog.from_bytes(data)
+    assert list(loaded.items()) == list(catalog.items())
+    assert loaded.categories == catalog.categories
+    assert loaded.lowered_buffer == catalog.lowered_buffer
+    assert loaded.to_bytes() == data
+    assert len(AppCatalog.from_bytes(AppCatalog.empty().to_bytes())) == 0
+
+
+def test_from_bytes_reads_the_other_byte_order():
+    catalog = random_catalog(50)
+    data = bytearray(catalog.to_bytes())
+    # As written on a machine of the other byte order: the flag after the magic, and the arrays, differ
+    data[len(MAGIC)] = sys.byteorder != 'little'
+    position = _HEADER.size
+    for column in (catalog.appids, catalog.name_offsets, catalog.lowered_offsets):
+        swapped = array(column.typecode, column)
+        swapped.byteswap()
+        data[position:position + len(swapped) * swapped.itemsize] = swapped.tobytes()
+        position += len(swapped) * swapped.itemsize
+    assert list(AppCatalog.from_bytes(bytes(data)).items()) == list(catalog.items())
+
+
+@pytest.mark.parametrize("data", [b"", b"SMCAT\x01" + bytes(30), None])
+def test_from_bytes_rejects_other_data(data):
+    if data is None:
+        data = random_catalog(50).to_bytes()[:-10]  # Truncated
+    with pytest.raises(ValueError):
+        AppCatalog.from_bytes(data)
+
+
+def test_find_appid_matches_a_linear_scan():
+    catalog = random_catalog()
+    for appid in list(range(0, 1002)) + [2 ** 31]:
+        assert catalog.find_appid(appid) == [i for i in range(len(catalog)) if catalog.appid(i) == appid]
+
+
+@pytest.mark.parametrize("prefix", ["", "s", "SERV", "server d", "ä", "Ärger s", "straße", "zzzzzz", "\U0001f600"])
+def test_prefix_range_matches_a_linear_scan(prefix):
+    catalog = random_catalog()
+    expected = [i for i in range(len(catalog)) if catalog.lowered_name(i).startswith(prefix.lower())]
+    found = catalog.prefix_range(prefix)
+    assert list(found) == expected
+    if not expected:
+        assert found.start == found.stop
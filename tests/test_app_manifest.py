@@ -0,0 +1,90 @@
+import os
+
+import AppManifest
+import Vdf
+from AppManifest import ManifestIndex
+
+
+def write_manifest(library, appid, state_flags=4, buildid="1000", key="appid"):
+    steamapps = os.path.join(library, "steamapps")
+    os.makedirs(steamapps, exist_ok=True)
+    path = os.path.join(steamapps, f"appmanifest_{appid}.acf")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(Vdf.dumps({"AppState": {key: appid, "StateFlags": str(state_flags), "buildid": buildid,
+                                        "SizeOnDisk": "2048", "LastUpdated": "1700000000",
+                                        "installdir": "valheim"}}))
+    return path
+
+
+def counting_parser(monkeypatch):
+    parsed = []
+    parse_manifest = AppManifest.parse_manifest
+
+    def parse(path):
+        parsed.append(os.path.basename(path))
+        return parse_manifest(path)
+
+    monkeypatch.setattr(AppManifest, "parse_manifest", parse)
+    return parsed
+
+
+def test_get_reads_the_manifest_fields(tmp_path):
+    write_manifest(str(tmp_path), "896660", key="appID")
+    app = ManifestIndex(str(tmp_path)).get("896660")
+    assert (app.appid, app.buildid, app.state_flags, app.size_on_disk, app.last_updated, app.installdir) == (
+        "896660", "1000", 4, 2048, 1700000000, "valheim")
+
+
+def test_install_state_comes_from_the_state_flags_bit(tmp_path):
+    write_manifest(str(tmp_path), "740", state_flags=6)
+    write_manifest(str(tmp_path), "896660", state_flags=1026)
+    index = ManifestIndex(str(tmp_path))
+    assert index.is_installed("740")
+    assert not index.is_installed("896660")
+    assert not index.is_installed("10")
+
+
+def test_cache_is_invalidated_by_mtime_and_size(tmp_path, monkeypatch):
+    parsed = counting_parser(monkeypatch)
+    path = write_manifest(str(tmp_path), "740")
+    index = ManifestIndex(str(tmp_path))
+    assert index.get("740").buildid == "1000"
+    assert index.get("740").buildid == "1000"
+    assert parsed == ["appmanifest_740.acf"]
+
+    write_manifest(str(tmp_path), "740", buildid="100001")  # A different size
+    assert index.get("740").buildid == "100001"
+    write_manifest(str(tmp_path), "740", buildid="100002")  # The same size, a newer mtime
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert index.get("740").buildid == "100002"
+    assert len(parsed) == 3
+
+    os.remove(path)
+    assert index.get("740") is None
+
+
+def test_apps_rescans_only_changed_manifests(tmp_path, monkeypatch):
+    parsed = counting_parser(monkeypatch)
+    write_manifest(str(tmp_path), "740")
+    stale = write_manifest(str(tmp_path), "896660")
+    index = ManifestIndex(str(tmp_path))
+    assert set(index.apps()) == {"740", "896660"}
+    assert set(index.apps()) == {"740", "896660"}
+    assert len(parsed) == 2
+    os.remove(stale)
+    write_manifest(str(tmp_path), "10")
+    assert set(index.apps()) == {"740", "10"}
+    assert len(parsed) == 3
+
+
+def test_unreadable_manifests_are_skipped(tmp_path):
+    steamapps = tmp_path / "steamapps"
+    steamapps.mkdir()
+    (steamapps / "appmanifest_740.acf").write_text('"AppState" { "appid" ', encoding='utf-8')
+    index = ManifestIndex(str(tmp_path))
+    assert index.get("740") is None and index.apps() == {}
+
+
+def test_for_library_shares_one_index_per_path(tmp_path):
+    assert ManifestIndex.for_library(str(tmp_path)) is ManifestIndex.for_library(str(tmp_path / "."))
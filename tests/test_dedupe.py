@@ -0,0 +1,136 @@
+import json
+import os
+
+import pytest
+
+import Dedupe
+from Dedupe import HELD_DIR, HELD_LIST, break_links, dedupe, restore_links
+from FileHashes import HashCache, hash_file, hash_files
+
+BIG = b"pak" * 40000  # Above DEFAULT_MIN_SIZE
+
+
+def write(root, relative, data=BIG):
+    path = os.path.join(root, *relative.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def same_inode(a, b):
+    return os.stat(a).st_ino == os.stat(b).st_ino
+
+
+@pytest.fixture
+def installs(tmp_path):
+    """Two installs of the same server that share two large files and differ in a third."""
+    roots = [str(tmp_path / "a"), str(tmp_path / "b")]
+    for root in roots:
+        write(root, "data/level.pak")
+        write(root, "data/sounds.pak", b"ogg" * 40000)
+        write(root, "server.cfg", root.encode() * 30000)
+        write(root, "steamapps/appmanifest_740.acf")  # SteamCMD's bookkeeping is never touched
+    return roots
+
+
+def test_hash_cache_is_reused_while_size_and_mtime_match(tmp_path):
+    path = write(str(tmp_path), "level.pak")
+    cache = HashCache(str(tmp_path / "hashes.json"))
+    assert hash_files([(path, os.stat(path))], cache, workers=1) == {path: hash_file(path)}
+    cache.save()
+
+    reloaded = HashCache(str(tmp_path / "hashes.json"))
+    assert reloaded.get(path, os.stat(path)) == hash_file(path)
+    reloaded.put(path, os.stat(path), "remembered")
+    assert hash_files([(path, os.stat(path))], reloaded, workers=1) == {path: "remembered"}
+
+    write(str(tmp_path), "level.pak", BIG + b"patched")
+    assert reloaded.get(path, os.stat(path)) is None
+    assert hash_files([(path, os.stat(path))], reloaded, workers=1) == {path: hash_file(path)}
+
+
+def test_identical_installs_are_collapsed(installs, tmp_path):
+    cache = HashCache(str(tmp_path / "hashes.json"))
+    preview = dedupe(installs, mode="hardlink", workers=1, dry_run=True, cache=cache)
+    assert preview["reclaimed"] == 2 * len(BIG) and preview["linked"] == {}
+    assert not same_inode(*(os.path.join(root, "data", "level.pak") for root in installs))
+
+    report = dedupe(installs, mode="hardlink", workers=1, cache=cache)
+    assert report["files"] == 6 and report["duplicates"] == 2 and report["errors"] == 0
+    assert report["linked"] == {"hardlink": 2} and report["reclaimed"] == 2 * len(BIG)
+    for name in ("level.pak", "sounds.pak"):
+        assert same_inode(*(os.path.join(root, "data", name) for root in installs))
+    assert not same_inode(*(os.path.join(root, "server.cfg") for root in installs))
+    assert not same_inode(*(os.path.join(root, "steamapps", "appmanifest_740.acf") for root in installs))
+
+    again = dedupe(installs, mode="hardlink", workers=1, cache=cache)
+    assert again["duplicates"] == 0 and again["reclaimed"] == 0
+
+
+def test_auto_mode_reflinks_or_falls_back_to_hard_links(installs):
+    report = dedupe(installs, workers=1)
+    assert sum(report["linked"].values()) == 2 and set(report["linked"]) <= {"reflink", "hardlink"}
+    assert report["reclaimed"] == 2 * len(BIG)
+    for root in installs:
+        assert read(os.path.join(root, "data", "level.pak")) == BIG
+
+
+def test_break_links_keeps_an_update_out_of_the_sibling(installs):
+    dedupe(installs, mode="hardlink", workers=1)
+    a, b = installs
+    assert break_links(a) == 2
+    assert not same_inode(os.path.join(a, "data", "level.pak"), os.path.join(b, "data", "level.pak"))
+
+    write(a, "data/level.pak", b"new level" * 1000)
+    assert read(os.path.join(b, "data", "level.pak")) == BIG
+    assert read(os.path.join(a, "data", "level.pak")) == b"new level" * 1000
+
+
+def test_restore_links_relinks_only_unchanged_files(installs):
+    dedupe(installs, mode="hardlink", workers=1)
+    a, b = installs
+    break_links(a)
+    write(a, "data/level.pak", b"new level" * 1000)
+
+    assert restore_links(a) == 1
+    assert same_inode(os.path.join(a, "data", "sounds.pak"), os.path.join(b, "data", "sounds.pak"))
+    assert not same_inode(os.path.join(a, "data", "level.pak"), os.path.join(b, "data", "level.pak"))
+    assert read(os.path.join(a, "data", "level.pak")) == b"new level" * 1000
+    assert read(os.path.join(b, "data", "level.pak")) == BIG
+    assert not os.path.exists(os.path.join(a, HELD_DIR))
+    assert restore_links(a) == 0
+
+
+def test_interrupted_run_is_recovered_by_the_next_break_links(installs, monkeypatch):
+    dedupe(installs, mode="hardlink", workers=1)
+    a, b = installs
+    copies = []
+
+    def failing_copy(source, dest):
+        if copies:
+            raise OSError("disk full")
+        copies.append(source)
+        return real_copy(source, dest)
+
+    real_copy = Dedupe.copy_file
+    monkeypatch.setattr(Dedupe, "copy_file", failing_copy)
+    with pytest.raises(OSError):
+        break_links(a)
+    with open(os.path.join(a, HELD_DIR, HELD_LIST), 'r', encoding='utf-8') as f:
+        assert len(json.load(f)) == 1
+    assert not any(name.endswith(Dedupe.LINK_SUFFIX) for _, _, names in os.walk(a) for name in names)
+
+    monkeypatch.setattr(Dedupe, "copy_file", real_copy)
+    assert break_links(a) == 2
+    for name in ("level.pak", "sounds.pak"):
+        assert not same_inode(os.path.join(a, "data", name), os.path.join(b, "data", name))
+        assert read(os.path.join(a, "data", name)) == read(os.path.join(b, "data", name))
+    assert restore_links(a) == 2
+    for name in ("level.pak", "sounds.pak"):
+        assert same_inode(os.path.join(a, "data", name), os.path.join(b, "data", name))
@@ -0,0 +1,176 @@
+import hashlib
+import http.server
+import json
+import os
+import re
+import threading
+
+import pytest
+
+import Downloader as downloader_module
+from Downloader import ChecksumMismatch, DownloadError, Downloader
+
+PAYLOAD = os.urandom(256 * 1024)
+SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+class RangeServer:
+    """A local HTTP server for PAYLOAD that honours Range requests and can cut a response short."""
+
+    def __init__(self):
+        self.ranges = []  # The Range header of every GET, None when there was none
+        self.fail_after = 0  # Bytes of the next GET to send before dropping the connection
+        self.cut_short = 0  # GETs still to end early with a well-formed chunked body
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_HEAD(self):
+                self._respond(body=False)
+
+            def do_GET(self):
+                server.ranges.append(self.headers.get('Range'))
+                self._respond(body=True)
+
+            def _respond(self, body):
+                start, end = 0, len(PAYLOAD)
+                match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get('Range', ''))
+                if match:
+                    start = int(match.group(1))
+                    end = int(match.group(2)) + 1 if match.group(2) else len(PAYLOAD)
+                cut_short = body and server.cut_short
+                if cut_short:
+                    server.cut_short -= 1
+                    self.protocol_version = "HTTP/1.1"  # Chunked bodies need it
+                if match:
+                    self.send_response(206)
+                    self.send_header('Content-Range', f"bytes {start}-{end - 1}/{len(PAYLOAD)}")
+                else:
+                    self.send_response(200)
+                self.send_header('Accept-Ranges', 'bytes')
+                self.send_header('ETag', '"v1"')
+                if cut_short:
+                    self._send_chunked(PAYLOAD[start:start + (end - start) // 2])
+                    return
+                self.send_header('Content-Length', str(end - start))
+                self.end_headers()
+                if body:
+                    limit = end
+                    if server.fail_after:
+                        limit, server.fail_after = min(end, start + server.fail_after), 0
+                    self.wfile.write(PAYLOAD[start:limit])
+
+            def _send_chunked(self, data):
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.wfile.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(data), data))
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/steamcmd.zip"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def server():
+    server = RangeServer()
+    yield server
+    server.httpd.shutdown()
+    server.httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(downloader_module.time, "sleep", lambda seconds: None)
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_single_segment_download(server, tmp_path):
+    dest = str(tmp_path / "file.bin")
+    progress = []
+    digest = Downloader(chunk_size=16 * 1024).download(server.url, dest, SHA256,
+                                                       on_progress=lambda done, total: progress.append((done, total)))
+    assert digest == SHA256 and read(dest) == PAYLOAD
+    assert progress[-1] == (len(PAYLOAD), len(PAYLOAD))
+    assert not os.path.exists(dest + ".part") and not os.path.exists(dest + ".part.json")
+
+
+def test_segmented_download_fetches_ranges_in_parallel(server, tmp_path):
+    dest = str(tmp_path / "file.bin")
+    Downloader(chunk_size=16 * 1024, segments=4, min_segment_size=32 * 1024).download(server.url, dest, SHA256)
+    assert read(dest) == PAYLOAD
+    quarter = len(PAYLOAD) // 4
+    assert sorted(server.ranges) == sorted(f"bytes={i * quarter}-{(i + 1) * quarter - 1}" for i in range(4))
+
+
+def test_resume_from_part_file(server, tmp_path):
+    dest = str(tmp_path / "file.bin")
+    done = 100 * 1024
+    with open(dest + ".part", 'wb') as f:
+        f.write(PAYLOAD[:done] + b'\0' * (len(PAYLOAD) - done))
+    with open(dest + ".part.json", 'w', encoding='utf-8') as f:
+        json.dump({"url": server.url, "total": len(PAYLOAD), "etag": '"v1"', "segments": [[0, len(PAYLOAD), done]]}, f)
+    progress, streamed = [], bytearray()
+
+    def on_data(offset, chunk):
+        assert offset == len(streamed)
+        streamed.extend(chunk)
+
+    digest = Downloader(chunk_size=16 * 1024).download(server.url, dest, SHA256, lambda d, t: progress.append(d),
+                                                       on_data)
+    assert digest == SHA256 and read(dest) == PAYLOAD
+    assert server.ranges == [f"bytes={done}-{len(PAYLOAD) - 1}"]
+    assert progress[0] == done
+    assert bytes(streamed) == PAYLOAD
+
+
+def test_dropped_connection_resumes_with_a_range_request(server, tmp_path):
+    dest = str(tmp_path / "file.bin")
+    server.fail_after = 64 * 1024
+    Downloader(chunk_size=16 * 1024, retries=2).download(server.url, dest, SHA256)
+    assert read(dest) == PAYLOAD
+    assert len(server.ranges) == 2
+    resumed_at = int(re.match(r"bytes=(\d+)-", server.ranges[1]).group(1))
+    assert 0 < resumed_at <= 64 * 1024
+
+
+def test_a_body_that_ends_early_is_retried(server, tmp_path):
+    dest = str(tmp_path / "file.bin")
+    server.cut_short = 1
+    Downloader(chunk_size=16 * 1024, retries=1).download(server.url, dest, SHA256)
+    assert read(dest) == PAYLOAD
+    half = len(PAYLOAD) // 2
+    assert server.ranges == [f"bytes=0-{len(PAYLOAD) - 1}", f"bytes={half}-{len(PAYLOAD) - 1}"]
+
+
+def test_bodies_that_keep_ending_early_give_up(server, tmp_path):
+    dest = str(tmp_path / "file.bin")
+    server.cut_short = 10
+    with pytest.raises(DownloadError):
+        Downloader(chunk_size=16 * 1024, retries=2).download(server.url, dest, SHA256)
+    assert len(server.ranges) == 3
+    assert os.path.exists(dest + ".part.json")
+
+
+def test_stale_state_starts_over(server, tmp_path):
+    dest = str(tmp_path / "file.bin")
+    with open(dest + ".part", 'wb') as f:
+        f.write(b'x' * len(PAYLOAD))
+    with open(dest + ".part.json", 'w', encoding='utf-8') as f:
+        json.dump({"url": server.url, "total": len(PAYLOAD), "etag": '"v0"', "segments": [[0, len(PAYLOAD), 1024]]}, f)
+    Downloader(chunk_size=16 * 1024).download(server.url, dest, SHA256)
+    assert read(dest) == PAYLOAD
+    assert server.ranges == [f"bytes=0-{len(PAYLOAD) - 1}"]
+
+
+def test_checksum_mismatch_discards_the_download(server, tmp_path):
+    dest = str(tmp_path / "file.bin")
+    with pytest.raises(ChecksumMismatch):
+        Downloader().download(server.url, dest, "0" * 64)
+    assert not os.path.exists(dest) and not os.path.exists(dest + ".part")
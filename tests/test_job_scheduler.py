@@ -0,0 +1,129 @@
+import threading
+import time
+
+from JobScheduler import FAILED, PENDING, RUNNING, SUCCEEDED, JobScheduler
+from SteamCmdProgress import SteamCmdProgress
+
+DOWNLOADING = " Update state (0x61) downloading, progress: 50.00 (500 / 1000)"
+VERIFYING = " Update state (0x81) verifying update, progress: 50.00 (500 / 1000)"
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class PhasedRunner:
+    """A runner that downloads, then verifies, each phase lasting until the test releases it."""
+
+    def __init__(self):
+        self.started = []
+        self.gates = {}
+        self._lock = threading.Lock()
+
+    def gate(self, appid, phase):
+        with self._lock:
+            return self.gates.setdefault((appid, phase), threading.Event())
+
+    def release(self, appid, phase):
+        self.gate(appid, phase).set()
+
+    def __call__(self, appid, install_path, on_progress, validate):
+        self.started.append(appid)
+        model = SteamCmdProgress()
+        for line, phase in ((DOWNLOADING, "network"), (VERIFYING, "disk")):
+            model.feed(line)
+            on_progress(model)
+            assert self.gate(appid, phase).wait(10)
+        model.feed(f"Success! App '{appid}' fully installed.")
+        return "install", 0, model
+
+
+def test_network_limit_holds_jobs_until_a_download_finishes():
+    runner = PhasedRunner()
+    scheduler = JobScheduler(max_jobs=4, max_network=1, max_disk=2, runner=runner)
+    try:
+        a, b = scheduler.submit("1", "/srv/a"), scheduler.submit("2", "/srv/b")
+        assert wait_for(lambda: a.phase == "downloading")
+        time.sleep(0.7)  # Longer than the scheduler's poll interval
+        assert runner.started == ["1"] and b.status == PENDING
+
+        runner.release("1", "network")
+        assert wait_for(lambda: runner.started == ["1", "2"])
+        assert a.phase == "verifying"
+        for appid in ("2", "1"):
+            for phase in ("network", "disk"):
+                runner.release(appid, phase)
+        assert scheduler.wait(10)
+        assert (a.status, b.status) == (SUCCEEDED, SUCCEEDED)
+    finally:
+        scheduler.shutdown()
+
+
+def test_disk_limit_holds_jobs_while_others_verify():
+    runner = PhasedRunner()
+    scheduler = JobScheduler(max_jobs=4, max_network=2, max_disk=1, runner=runner)
+    try:
+        a = scheduler.submit("1", "/srv/a")
+        runner.release("1", "network")
+        assert wait_for(lambda: a.phase == "verifying")
+        b = scheduler.submit("2", "/srv/b")
+        time.sleep(0.7)
+        assert runner.started == ["1"] and b.status == PENDING
+
+        runner.release("1", "disk")
+        assert wait_for(lambda: runner.started == ["1", "2"])
+        runner.release("2", "network")
+        runner.release("2", "disk")
+        assert scheduler.wait(10)
+        assert (a.status, b.status) == (SUCCEEDED, SUCCEEDED)
+    finally:
+        scheduler.shutdown()
+
+
+def test_max_jobs_caps_running_jobs():
+    runner = PhasedRunner()
+    scheduler = JobScheduler(max_jobs=2, max_network=4, max_disk=4, runner=runner)
+    try:
+        jobs = scheduler.submit_many([(str(appid), f"/srv/{appid}") for appid in range(1, 4)])
+        assert wait_for(lambda: len(runner.started) == 2)
+        time.sleep(0.7)
+        assert [job.status for job in jobs] == [RUNNING, RUNNING, PENDING]
+        for appid in ("1", "2", "3"):
+            runner.release(appid, "network")
+            runner.release(appid, "disk")
+        assert scheduler.wait(10)
+        assert [job.status for job in jobs] == [SUCCEEDED] * 3
+    finally:
+        scheduler.shutdown()
+
+
+def test_batched_jobs_finish_on_their_own_result_lines():
+    finished_while_running = []
+
+    def batch_runner(targets, on_progress, validate):
+        jobs = scheduler.jobs()
+        models = [SteamCmdProgress() for _ in targets]
+        models[0].feed("ERROR! Timed out waiting for AppInfo update.")
+        on_progress(0, models[0])
+        finished_while_running.append(jobs[0].status)
+        models[0].feed("Success! App '1' fully installed.")
+        on_progress(0, models[0])
+        finished_while_running.append(jobs[0].status)
+        models[1].feed("Error! App '2' state is 0x202 after update job.")
+        on_progress(1, models[1])
+        return [("install", 8, model) for model in models]
+
+    scheduler = JobScheduler(batch_size=2, batch_runner=batch_runner)
+    try:
+        jobs = scheduler.submit_many([("1", "/srv/a"), ("2", "/srv/b")])
+        assert scheduler.wait(10)
+        assert finished_while_running == [RUNNING, SUCCEEDED]
+        assert [job.status for job in jobs] == [SUCCEEDED, FAILED]
+        assert jobs[1].error == "App '2' state is 0x202 after update job."
+    finally:
+        scheduler.shutdown()
@@ -0,0 +1,77 @@
+import os
+
+import Vdf
+from ServerManager import ServerManager
+from SteamCmdManager import SteamCmdManager
+
+
+def write_manifest(install_path, appid, buildid):
+    steamapps = os.path.join(install_path, "steamapps")
+    os.makedirs(steamapps, exist_ok=True)
+    with open(os.path.join(steamapps, f"appmanifest_{appid}.acf"), 'w', encoding='utf-8') as f:
+        f.write(Vdf.dumps({"AppState": {"appid": appid, "StateFlags": "4", "buildid": buildid}}))
+
+
+def record_commands(monkeypatch):
+    commands = []
+    run = SteamCmdManager.run
+
+    def recording_run(args, on_progress=None, cwd=None):
+        commands.append(args)
+        return run(args, on_progress, cwd)
+
+    monkeypatch.setattr(SteamCmdManager, "run", staticmethod(recording_run))
+    return commands
+
+
+def test_actions_follow_the_build_ids(fake_steamcmd, tmp_path):
+    fake_steamcmd("--buildid", "740=1000", "--buildid", "896660=2000")
+    current, outdated, missing = (str(tmp_path / name) for name in ("current", "outdated", "missing"))
+    write_manifest(current, "740", "1000")
+    write_manifest(outdated, "896660", "1999")
+    targets = [("740", current), ("896660", outdated), ("740", missing)]
+    assert ServerManager.plan_actions(targets) == ["skip", "update", "install"]
+
+
+def test_a_manifest_without_a_build_id_is_updated(fake_steamcmd, tmp_path):
+    fake_steamcmd("--buildid", "1000")
+    write_manifest(str(tmp_path), "740", "")
+    assert ServerManager.plan_actions([("740", str(tmp_path))]) == ["update"]
+
+
+def test_matching_build_skips_steamcmd(fake_steamcmd, tmp_path, monkeypatch):
+    fake_steamcmd("--buildid", "1000")
+    write_manifest(str(tmp_path), "740", "1000")
+    commands = record_commands(monkeypatch)
+    action, returncode, model = ServerManager.run_job("740", str(tmp_path))
+    assert (action, returncode, model.succeeded, commands) == ("skip", 0, True, [])
+
+
+def test_different_build_updates_without_validate(fake_steamcmd, tmp_path, monkeypatch):
+    fake_steamcmd("--buildid", "1001")
+    write_manifest(str(tmp_path), "740", "1000")
+    commands = record_commands(monkeypatch)
+    action, returncode, _ = ServerManager.run_job("740", str(tmp_path))
+    assert (action, returncode) == ("update", 0)
+    assert commands == [['+login', 'anonymous', '+force_install_dir', str(tmp_path), '+app_update', '740', '+quit']]
+    # SteamCMD wrote the new build, so the next check skips
+    assert ServerManager.plan_actions([("740", str(tmp_path))]) == ["skip"]
+
+
+def test_validate_forces_a_full_validation(fake_steamcmd, tmp_path, monkeypatch):
+    fake_steamcmd("--buildid", "1000")
+    write_manifest(str(tmp_path), "740", "1000")
+    commands = record_commands(monkeypatch)
+    action, returncode, _ = ServerManager.run_job("740", str(tmp_path), validate=True)
+    assert (action, returncode) == ("validate", 0)
+    assert commands[0][-2:] == ['validate', '+quit']
+
+
+def test_missing_manifest_installs(fake_steamcmd, tmp_path, monkeypatch):
+    fake_steamcmd("--buildid", "1000")
+    commands = record_commands(monkeypatch)
+    install_path = str(tmp_path / "new")
+    action, returncode, _ = ServerManager.run_job("740", install_path)
+    assert (action, returncode) == ("install", 0)
+    assert 'validate' not in commands[0]
+    assert ServerManager.is_server_installed(install_path, "740")
@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+from RemoteBuilds import RemoteBuildCache, parse_app_info
+from SteamCmdManager import SteamCmdManager
+
+
+def count_sessions(monkeypatch):
+    sessions = []
+    stream = SteamCmdManager.stream
+
+    def counting_stream(args, on_line, cwd=None):
+        sessions.append([args[i + 1] for i, arg in enumerate(args) if arg == '+app_info_print'])
+        return stream(args, on_line, cwd)
+
+    monkeypatch.setattr(SteamCmdManager, "stream", staticmethod(counting_stream))
+    return sessions
+
+
+def test_parse_app_info_extracts_the_app_block():
+    lines = ['AppID : 740, change number : 1/0', '"740"', '{', '\t"common"', '\t{', '\t\t"type"\t\t"Tool"', '\t}',
+             '}', '"10"', '{', '}']
+    assert parse_app_info(lines, "740") == {"common": {"type": "Tool"}}
+    assert parse_app_info(lines, "896660") is None
+
+
+def test_builds_are_looked_up_in_one_session_and_cached(fake_steamcmd, monkeypatch):
+    fake_steamcmd("--buildid", "740=111", "--buildid", "222")
+    sessions = count_sessions(monkeypatch)
+    cache = RemoteBuildCache()
+    assert cache.get(["740", 896660]) == {"740": "111", "896660": "222"}
+    assert cache.get(["896660"]) == {"896660": "222"}
+    assert sessions == [["740", "896660"]]
+
+
+def test_expired_and_invalidated_builds_are_looked_up_again(fake_steamcmd, monkeypatch):
+    fake_steamcmd("--buildid", "111")
+    sessions = count_sessions(monkeypatch)
+    cache = RemoteBuildCache(ttl=0.5)
+    cache.get(["740", "10"])
+    cache.invalidate("740")
+    assert cache.get(["740", "10"]) == {"740": "111", "10": "111"}
+    assert sessions == [["740", "10"], ["740"]]
+    time.sleep(0.6)
+    cache.get(["10"])
+    assert sessions[-1] == ["10"]
+
+
+class SlowCache(RemoteBuildCache):
+    """Lookups block until the test releases them, and report build 1 for every app."""
+
+    def __init__(self):
+        super().__init__()
+        self.fetching = []
+        self.release = threading.Event()
+
+    def _fetch(self, appids):
+        self.fetching.append(appids)
+        assert self.release.wait(10)
+        return {appid: "1" for appid in appids}
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_lookups_of_different_apps_run_concurrently():
+    cache = SlowCache()
+    results = {}
+    threads = [threading.Thread(target=lambda appid=appid: results.update(cache.get([appid]))) for appid in ("1", "2")]
+    for thread in threads:
+        thread.start()
+    # Both sessions are in flight at once: neither holds the cache lock while SteamCMD runs
+    assert wait_for(lambda: len(cache.fetching) == 2)
+    cache.release.set()
+    for thread in threads:
+        thread.join(10)
+    assert results == {"1": "1", "2": "1"}
+
+
+def test_concurrent_lookups_of_one_app_share_a_session():
+    cache = SlowCache()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(["1", "2"]))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    assert wait_for(lambda: cache.fetching)
+    time.sleep(0.1)
+    cache.release.set()
+    for thread in threads:
+        thread.join(10)
+    assert cache.fetching == [["1", "2"]]
+    assert results == [{"1": "1", "2": "1"}] * 4
+
+
+def test_a_failed_lookup_does_not_block_later_ones():
+    cache = RemoteBuildCache()
+    calls = []
+
+    def fetch(appids):
+        calls.append(appids)
+        if len(calls) == 1:
+            raise OSError("steamcmd is missing")
+        return {appid: "5" for appid in appids}
+
+    cache._fetch = fetch
+    with pytest.raises(OSError):
+        cache.get(["740"])
+    assert cache.get(["740"]) == {"740": "5"}
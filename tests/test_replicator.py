@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+
+import Vdf
+from Replicator import FILE_LIST, replicate_tree, write_replica_manifest
+
+
+def write(root, relative, data=b"data"):
+    path = os.path.join(root, *relative.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def files(root):
+    found = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            with open(path, 'rb') as f:
+                found[os.path.relpath(path, root).replace(os.sep, '/')] = f.read()
+    return found
+
+
+def test_mirrors_the_seed_and_skips_unchanged_files(tmp_path):
+    seed, replicas = str(tmp_path / "seed"), [str(tmp_path / "a"), str(tmp_path / "b")]
+    write(seed, "server.x86_64", b"binary")
+    write(seed, "data/level.pak", b"level" * 1000)
+    write(seed, "steamapps/downloading/896660/partial.bin")
+    stats = replicate_tree(seed, replicas)
+    for replica in replicas:
+        assert files(replica) == {"server.x86_64": b"binary", "data/level.pak": b"level" * 1000}
+        assert stats[replica]["copied"] == 2 and stats[replica]["error"] is None
+
+    write(seed, "server.x86_64", b"binary v2")
+    stats = replicate_tree(seed, replicas)
+    assert [(stats[r]["copied"], stats[r]["skipped"]) for r in replicas] == [(1, 1), (1, 1)]
+    assert files(replicas[0])["server.x86_64"] == b"binary v2"
+
+
+def test_prune_deletes_what_the_seed_dropped_and_keeps_replica_files(tmp_path):
+    seed, replica = str(tmp_path / "seed"), str(tmp_path / "replica")
+    write(seed, "server.x86_64")
+    write(seed, "maps/old/map.bsp")
+    write(seed, "maps/keep.bsp")
+    replicate_tree(seed, [replica], prune=True)
+    with open(os.path.join(replica, FILE_LIST), encoding='utf-8') as f:
+        assert sorted(json.load(f)) == ["maps/keep.bsp", "maps/old/map.bsp", "server.x86_64"]
+    write(replica, "server.cfg", b"hostname mine")
+    write(replica, "saves/world.db", b"save")
+    write(replica, "maps/old/custom.bsp", b"my map")
+
+    os.remove(os.path.join(seed, "maps/old/map.bsp"))
+    os.remove(os.path.join(seed, "maps/keep.bsp"))
+    write(seed, "maps/new.bsp")
+    stats = replicate_tree(seed, [replica], prune=True)
+    assert stats[replica]["removed"] == 2
+    assert set(files(replica)) == {"server.x86_64", "maps/new.bsp", "server.cfg", "saves/world.db",
+                                   "maps/old/custom.bsp", FILE_LIST.replace(os.sep, '/')}
+
+
+def test_prune_removes_directories_it_empties(tmp_path):
+    seed, replica = str(tmp_path / "seed"), str(tmp_path / "replica")
+    write(seed, "server.x86_64")
+    write(seed, "addons/old/plugin.so")
+    write(seed, "mods/old/mod.pak")
+    replicate_tree(seed, [replica], prune=True)
+    write(replica, "mods/old/settings.ini", b"mine")
+    shutil.rmtree(os.path.join(seed, "addons"))
+    shutil.rmtree(os.path.join(seed, "mods"))
+    replicate_tree(seed, [replica], prune=True)
+    assert not os.path.exists(os.path.join(replica, "addons"))
+    assert files(replica)["mods/old/settings.ini"] == b"mine"
+
+
+def test_a_replica_without_a_file_list_prunes_nothing(tmp_path):
+    seed, replica = str(tmp_path / "seed"), str(tmp_path / "replica")
+    write(seed, "server.x86_64")
+    write(replica, "old_build_file.dat")
+    write(replica, "server.cfg")
+    stats = replicate_tree(seed, [replica], prune=True)
+    assert stats[replica]["removed"] == 0
+    assert {"old_build_file.dat", "server.cfg", "server.x86_64"} <= set(files(replica))
+
+
+def test_without_prune_nothing_is_deleted(tmp_path):
+    seed, replica = str(tmp_path / "seed"), str(tmp_path / "replica")
+    write(seed, "a.txt")
+    replicate_tree(seed, [replica], prune=True)
+    os.remove(os.path.join(seed, "a.txt"))
+    stats = replicate_tree(seed, [replica])
+    assert stats[replica]["removed"] == 0 and "a.txt" in files(replica)
+
+
+def test_replica_manifest_points_at_the_replica(tmp_path):
+    seed, replica = str(tmp_path / "seed"), str(tmp_path / "replica")
+    write(seed, "steamapps/appmanifest_896660.acf", Vdf.dumps({"AppState": {
+        "appid": "896660", "StateFlags": "1030", "buildid": "1000", "installdir": "valheim",
+        "LauncherPath": os.path.join(seed, "start.sh"), "BytesDownloaded": "123"}}).encode('utf-8'))
+    write_replica_manifest(seed, replica, "896660")
+    state = Vdf.load(os.path.join(replica, "steamapps", "appmanifest_896660.acf"))["AppState"]
+    assert state["LauncherPath"] == os.path.join(os.path.abspath(replica), "start.sh")
+    assert (state["StateFlags"], state["BytesDownloaded"], state["buildid"]) == ("4", "0", "1000")
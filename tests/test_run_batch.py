@@ -0,0 +1,89 @@
+import os
+import shlex
+import sys
+
+import pytest
+
+from ServerManager import ServerManager
+from SteamCmdManager import SteamCmdManager
+
+FAKE_STEAMCMD = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "FakeSteamCmd.py")
+
+
+def replay(monkeypatch, lines, returncode=0):
+    """Make run_script print `lines` instead of starting SteamCMD; returns the runscripts it was given."""
+    scripts = []
+
+    def run_script(script_lines, on_line, cwd=None):
+        scripts.append(script_lines)
+        for line in lines:
+            on_line(line)
+        return returncode
+
+    monkeypatch.setattr(SteamCmdManager, "run_script", staticmethod(run_script))
+    return scripts
+
+
+def test_output_is_demultiplexed_per_app(monkeypatch, tmp_path):
+    targets = [("740", str(tmp_path / "a")), ("896660", str(tmp_path / "b")), ("740", str(tmp_path / "c"))]
+    scripts = replay(monkeypatch, [
+        "Loading Steam API...OK",
+        " Update state (0x61) downloading, progress: 50.00 (500 / 1000)",
+        "Success! App '740' fully installed.",
+        " Update state (0x61) downloading, progress: 10.00 (100 / 2000)",
+        "ERROR! Timed out waiting for AppInfo update.",
+        "Error! App '896660' state is 0x202 after update job.",
+        " Update state (0x81) verifying update, progress: 20.00 (600 / 3000)",
+        "Success! App '740' fully installed.",
+    ], returncode=8)
+    seen = []
+    results = ServerManager.run_batch(targets, lambda index, model: seen.append((index, model.phase)))
+
+    assert len(scripts) == 1
+    assert [line for line in scripts[0] if line.startswith("app_update")] == ["app_update 740", "app_update 896660",
+                                                                              "app_update 740"]
+    (action_a, code_a, model_a), (_, code_b, model_b), (_, code_c, model_c) = results
+    assert action_a == "install"
+    assert (code_a, model_a.succeeded, model_a.bytes_total) == (0, True, 1000)
+    assert model_b.bytes_total == 2000 and not model_b.succeeded
+    assert code_b == 8 and model_b.error == "App '896660' state is 0x202 after update job."
+    assert (code_c, model_c.phase, model_c.bytes_total) == (0, "verifying", 3000)
+    assert (0, "downloading") in seen and (1, "downloading") in seen and (2, "verifying") in seen
+    assert [ServerManager.succeeded(code, model) for _, code, model in results] == [True, False, True]
+
+
+def test_result_lines_match_the_appid_when_steamcmd_skips_ahead(monkeypatch, tmp_path):
+    targets = [("740", str(tmp_path / "a")), ("896660", str(tmp_path / "b"))]
+    replay(monkeypatch, ["Success! App '896660' already up to date."])
+    (_, code_a, model_a), (_, code_b, model_b) = ServerManager.run_batch(targets)
+    assert code_b == 0 and model_b.succeeded
+    assert not model_a.succeeded and model_a.error == "SteamCMD exited before processing this app"
+
+
+def test_batch_against_fake_steamcmd(monkeypatch, tmp_path):
+    monkeypatch.setenv("STEAMCMD", shlex.join([sys.executable, FAKE_STEAMCMD, "--speed", "1000", "--steps", "2",
+                                               "--size", "4096", "--buildid", "42"]))
+    targets = [("740", str(tmp_path / "a")), ("896660", str(tmp_path / "b"))]
+    results = ServerManager.run_batch(targets)
+    assert [(action, code, model.succeeded) for action, code, model in results] == [("install", 0, True)] * 2
+    for appid, install_path in targets:
+        assert os.path.exists(os.path.join(install_path, "steamapps", f"appmanifest_{appid}.acf"))
+    # Both installs now report the remote build, so a second batch skips them without a session
+    calls = replay(monkeypatch, [])
+    assert [action for action, _, _ in ServerManager.run_batch(targets)] == ["skip", "skip"]
+    assert calls == []
+
+
+@pytest.mark.parametrize("validate, expected", [(False, "app_update 740"), (True, "app_update 740 validate")])
+def test_runscript_validates_only_when_asked(validate, expected):
+    script = ServerManager.construct_runscript([("740", "/srv/a")], validate)
+    assert script[-3:] == ['force_install_dir "/srv/a"', expected, "quit"]
+
+
+def test_install_and_update_server_wrappers(monkeypatch, tmp_path):
+    monkeypatch.setenv("STEAMCMD", shlex.join([sys.executable, FAKE_STEAMCMD, "--speed", "1000", "--steps", "2",
+                                               "--size", "4096"]))
+    install_path = str(tmp_path / "a")
+    assert ServerManager.install("740", install_path) == (True, "Server installed successfully.")
+    assert ServerManager.is_server_installed(install_path, "740")
+    assert ServerManager.update_server("740", install_path, validate=True) == (True, "Server updated successfully.")
@@ -0,0 +1,101 @@
+import random
+import string
+from array import array
+
+import pytest
+
+from AppCatalog import AppCatalog
+from AppClassifier import CATEGORY_NAMES, DEFAULT_CATEGORIES, SERVER
+from SearchIndex import ServerSearchIndex, _legacy_filter
+
+
+def make_names(count=3000, seed=1):
+    rng = random.Random(seed)
+    words = ["server", "dedicated", "counter", "strike", "Ärger", "straße", "ark", "a", "aa"] + [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 6))) for _ in range(300)]
+    return {" ".join(rng.choice(words).title() for _ in range(rng.randint(1, 4))) + f" {i}": i
+            for i in range(count)}
+
+
+@pytest.fixture(scope="module")
+def app_ids():
+    return make_names()
+
+
+@pytest.fixture
+def catalog(app_ids):
+    catalog = AppCatalog.from_pairs(app_ids.items())
+    rng = random.Random(2)
+    catalog.categories = array('B', (rng.choice(list(CATEGORY_NAMES)) for _ in range(len(catalog))))
+    return catalog
+
+
+def linear_search(catalog, query, categories=None):
+    """Catalog positions containing `query`, prefix matches first, each group in catalog (name) order."""
+    query = query.lower()
+    rows = [i for i in range(len(catalog))
+            if (categories is None or catalog.category(i) in categories) and query in catalog.lowered_name(i)]
+    return ([i for i in rows if catalog.lowered_name(i).startswith(query)] +
+            [i for i in rows if not catalog.lowered_name(i).startswith(query)])
+
+
+# Typing, extending, deleting back, retyping, and queries that are substrings but not prefixes of the last one
+SESSIONS = [
+    ["d", "de", "ded", "dedi", "dedicated", "dedicated ", "dedicated s", "dedicated se", "dedicated s", "dedicated",
+     "ded", "d", "", "s"],
+    ["server", "erver", "rver 1", "rver 12", "SERVER 12", "xq", "xqz", "x", ""],
+    ["ä", "är", "ärger", "ÄRGER S", "straß", "strasse", "straße", "e 1", "e 10", "e 1"],
+    ["a", "aa", "aaa", "aa", "a", "a a", "a aa"],
+]
+
+
+@pytest.mark.parametrize("session", SESSIONS)
+def test_matches_a_linear_scan_while_typing(catalog, session):
+    index = ServerSearchIndex(catalog, categories=None)
+    for query in session:
+        assert list(index.search(query)) == linear_search(catalog, query), query
+
+
+@pytest.mark.parametrize("session", SESSIONS)
+def test_matches_the_legacy_filter(catalog, app_ids, session):
+    index = ServerSearchIndex(catalog, categories=None)
+    for query in session:
+        names = [catalog.name(i) for i in index.search(query)]
+        assert sorted(names, key=str.lower) == _legacy_filter(app_ids, query)
+
+
+@pytest.mark.parametrize("categories", [DEFAULT_CATEGORIES, {SERVER, 0}, set(), set(CATEGORY_NAMES)])
+def test_category_filter_matches_a_linear_scan(catalog, categories):
+    index = ServerSearchIndex(catalog, categories=categories)
+    wanted = None if set(categories) >= set(CATEGORY_NAMES) else set(categories)
+    assert list(index.search("")) == linear_search(catalog, "", wanted)
+    for query in SESSIONS[0]:
+        assert list(index.search(query)) == linear_search(catalog, query, wanted), query
+
+
+def test_changing_categories_drops_the_narrowed_buffer(catalog):
+    index = ServerSearchIndex(catalog, categories={SERVER})
+    index.search("de")
+    index.set_categories(None)
+    assert list(index.search("ded")) == linear_search(catalog, "ded")
+    assert len(index) == len(catalog)
+
+
+def test_prefix_matches_come_first(catalog):
+    index = ServerSearchIndex(catalog, categories=None)
+    results = list(index.search("ark"))
+    prefixed = [i for i in results if catalog.lowered_name(i).startswith("ark")]
+    assert prefixed and results[:len(prefixed)] == prefixed
+    assert prefixed == sorted(prefixed)
+
+
+def test_a_cancelled_search_returns_none_and_keeps_the_last_results(catalog):
+    index = ServerSearchIndex(catalog, categories=None)
+    index.search("de")
+    assert index.search("ded", cancelled=lambda: True) is None
+    assert list(index.search("dedi")) == linear_search(catalog, "dedi")
+
+
+def test_an_empty_catalog():
+    index = ServerSearchIndex()
+    assert len(index) == 0 and list(index.search("server")) == []
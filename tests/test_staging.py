@@ -0,0 +1,122 @@
+import os
+
+import pytest
+
+import ServerManager as ServerManagerModule
+import Staging
+import Vdf
+from ServerManager import ServerManager
+from SteamCmdManager import SteamCmdManager
+
+run = SteamCmdManager.run
+
+
+def write(root, relative, data=b"data"):
+    path = os.path.join(root, *relative.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def read(root, relative):
+    with open(os.path.join(root, *relative.split('/')), 'rb') as f:
+        return f.read()
+
+
+def install(root, buildid="1000"):
+    write(root, "steamapps/appmanifest_740.acf",
+          Vdf.dumps({"AppState": {"appid": "740", "StateFlags": "4", "buildid": buildid}}).encode())
+    write(root, "server.bin", b"v1" * 100)
+    write(root, "data/legacy.pak", b"legacy")
+    write(root, "cfg/server.cfg", b"hostname test")
+
+
+def updating(monkeypatch, install_path, changes):
+    """Have SteamCMD apply `changes` to the directory it updates, while the live server writes a save."""
+    def update(args, on_progress=None, cwd=None):
+        standby = args[args.index('+force_install_dir') + 1]
+        changes(standby)
+        write(install_path, "saves/world.db", b"world" * 10)
+        return run(args, on_progress, cwd)
+
+    monkeypatch.setattr(SteamCmdManager, "run", staticmethod(update))
+
+
+def new_build(fake_steamcmd, buildid):
+    fake_steamcmd("--buildid", buildid)
+    ServerManagerModule.remote_builds.invalidate("740")
+
+
+def test_an_update_is_staged_and_flipped(fake_steamcmd, tmp_path, monkeypatch):
+    install_path = str(tmp_path / "server")
+    install(install_path)
+    new_build(fake_steamcmd, "1001")
+
+    def changes(standby):
+        write(standby, "server.bin", b"v2" * 200)
+        os.remove(os.path.join(standby, "data", "legacy.pak"))
+
+    updating(monkeypatch, install_path, changes)
+    assert ServerManager.run_staged_job("740", install_path, workers=2)[:2] == ("update", 0)
+
+    blue, green = (Staging.slot_path(install_path, slot) for slot in Staging.SLOTS)
+    assert os.path.islink(install_path) and Staging.live_slot(install_path) == "green"
+    assert read(install_path, "server.bin") == b"v2" * 200
+    assert not os.path.exists(os.path.join(install_path, "data", "legacy.pak"))
+    # The save the server wrote while SteamCMD worked, and the config, came along
+    assert read(install_path, "saves/world.db") == b"world" * 10
+    assert read(install_path, "cfg/server.cfg") == b"hostname test"
+    assert ServerManager.plan_actions([("740", install_path)]) == ["skip"]
+    # The previous build is untouched in its slot
+    assert read(blue, "server.bin") == b"v1" * 100 and read(blue, "data/legacy.pak") == b"legacy"
+
+    assert Staging.rollback(install_path) == blue
+    assert Staging.live_slot(install_path) == "blue"
+    assert read(install_path, "server.bin") == b"v1" * 100
+    assert Staging.rollback(install_path) == green
+
+
+def test_the_next_update_reuses_the_old_slot_and_prunes_it(fake_steamcmd, tmp_path, monkeypatch):
+    install_path = str(tmp_path / "server")
+    install(install_path)
+    new_build(fake_steamcmd, "1001")
+    updating(monkeypatch, install_path, lambda standby: os.remove(os.path.join(standby, "data", "legacy.pak")))
+    ServerManager.run_staged_job("740", install_path, workers=2)
+
+    new_build(fake_steamcmd, "1002")
+    updating(monkeypatch, install_path, lambda standby: write(standby, "server.bin", b"v3" * 300))
+    assert ServerManager.run_staged_job("740", install_path, workers=2)[:2] == ("update", 0)
+    assert Staging.live_slot(install_path) == "blue"
+    assert read(install_path, "server.bin") == b"v3" * 300
+    # Left over from build 1000 in the blue slot, and gone from build 1001 it was seeded from
+    assert not os.path.exists(os.path.join(install_path, "data", "legacy.pak"))
+    assert read(install_path, "saves/world.db") == b"world" * 10
+
+
+def test_a_fresh_install_is_done_in_place(fake_steamcmd, tmp_path):
+    fake_steamcmd("--buildid", "1000")
+    install_path = str(tmp_path / "server")
+    assert ServerManager.run_staged_job("740", install_path)[:2] == ("install", 0)
+    assert os.path.isdir(install_path) and not os.path.islink(install_path)
+    assert not os.path.exists(Staging.slot_path(install_path, "blue"))
+
+
+def test_rollback_needs_a_staged_install_with_a_previous_build(tmp_path):
+    install_path = str(tmp_path / "server")
+    install(install_path)
+    with pytest.raises(FileNotFoundError, match="is not a staged install"):
+        Staging.rollback(install_path)
+    assert Staging.adopt(install_path) == "blue"
+    assert read(install_path, "server.bin") == b"v1" * 100
+    with pytest.raises(FileNotFoundError, match="no previous build"):
+        Staging.rollback(install_path)
+    assert Staging.live_slot(install_path) == "blue"
+
+
+def test_adopt_refuses_a_stray_slot_directory(tmp_path):
+    install_path = str(tmp_path / "server")
+    install(install_path)
+    os.makedirs(Staging.slot_path(install_path, "blue"))
+    with pytest.raises(FileExistsError):
+        Staging.adopt(install_path)
+    assert not os.path.islink(install_path) and read(install_path, "server.bin") == b"v1" * 100
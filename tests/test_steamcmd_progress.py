@@ -0,0 +1,113 @@
+import os
+import shlex
+import sys
+
+import pytest
+
+from SteamCmdManager import SteamCmdManager
+from SteamCmdProgress import PHASE_RANGES, SteamCmdProgress, parse_app_result
+
+FAKE_STEAMCMD = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "FakeSteamCmd.py")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_update_state_line():
+    model = SteamCmdProgress()
+    assert model.feed(" Update state (0x61) downloading, progress: 25.00 (250 / 1000)")
+    assert model.phase == "downloading"
+    assert (model.bytes_done, model.bytes_total) == (250, 1000)
+    assert model.percent == 25.0
+    start, end = PHASE_RANGES["downloading"]
+    assert model.overall_percent == pytest.approx(start + (end - start) * 0.25)
+    assert model.bytes_downloaded == 250
+
+
+def test_self_update_line():
+    model = SteamCmdProgress()
+    assert model.feed("[ 40%] Downloading update (1,024 of 2,560 KB)...")
+    assert model.phase == "self-update"
+    assert (model.bytes_done, model.bytes_total) == (1024 * 1024, 2560 * 1024)
+
+
+def test_unrelated_lines_are_ignored():
+    model = SteamCmdProgress()
+    assert not model.feed("Loading Steam API...OK")
+    assert not model.feed("")
+    assert model.phase is None and not model.finished
+
+
+def test_rate_eta_and_phase_durations():
+    clock = FakeClock()
+    model = SteamCmdProgress(clock)
+    model.feed(" Update state (0x61) downloading, progress: 0.00 (0 / 1000)")
+    clock.now = 1.0
+    model.feed(" Update state (0x61) downloading, progress: 10.00 (100 / 1000)")
+    assert model.rate == pytest.approx(100.0)
+    assert model.eta == pytest.approx(9.0)
+    clock.now = 3.0
+    model.feed(" Update state (0x81) verifying update, progress: 50.00 (500 / 1000)")
+    assert model.phase == "verifying" and model.rate == 0.0
+    clock.now = 4.0
+    assert model.phase_durations() == {"downloading": pytest.approx(3.0), "verifying": pytest.approx(1.0)}
+
+
+def test_success_finishes_the_app():
+    model = SteamCmdProgress()
+    assert model.feed("Success! App '896660' fully installed.")
+    assert model.succeeded and model.finished and model.error is None
+    assert model.overall_percent == 100.0
+
+
+def test_app_error_finishes_the_app():
+    model = SteamCmdProgress()
+    assert model.feed("Error! App '896660' state is 0x202 after update job.")
+    assert model.finished and not model.succeeded
+    assert model.error == "App '896660' state is 0x202 after update job."
+
+
+def test_unscoped_error_does_not_finish_and_is_cleared_by_success():
+    model = SteamCmdProgress()
+    model.feed("ERROR! Timed out waiting for AppInfo update.")
+    assert model.error == "Timed out waiting for AppInfo update."
+    assert not model.finished
+    model.feed("Success! App '896660' already up to date.")
+    assert model.finished and model.succeeded and model.error is None
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("Success! App '896660' fully installed.", ("896660", True)),
+    ("Success! App '740' already up to date.", ("740", True)),
+    ("Error! App '740' state is 0x602 after update job.", ("740", False)),
+    ("ERROR! Failed to install app '740' (No subscription)", ("740", False)),
+    ("ERROR! Timed out waiting for AppInfo update.", None),
+    (" Update state (0x61) downloading, progress: 1.00 (1 / 100)", None),
+])
+def test_parse_app_result(line, expected):
+    assert parse_app_result(line) == expected
+
+
+def test_replayed_session_drives_the_model(monkeypatch, tmp_path):
+    recording = tmp_path / "install.log"
+    recording.write_text("\n".join([
+        "@0.01  Update state (0x61) downloading, progress: 0.00 (0 / 4096)",
+        "@0.01  Update state (0x61) downloading, progress: 50.00 (2048 / 4096)",
+        "@0.01  Update state (0x81) verifying update, progress: 100.00 (4096 / 4096)",
+        "Success! App '740' fully installed.",
+    ]) + "\n", encoding="utf-8")
+    monkeypatch.setenv("STEAMCMD", shlex.join([sys.executable, FAKE_STEAMCMD, "--speed", "100",
+                                               "--replay", str(recording)]))
+    updates = []
+    returncode, model = SteamCmdManager.run(["+login", "anonymous", "+force_install_dir", str(tmp_path / "srv"),
+                                             "+app_update", "740", "+quit"],
+                                            lambda model: updates.append((model.phase, model.bytes_done)))
+    assert returncode == 0
+    assert updates[:3] == [("downloading", 0), ("downloading", 2048), ("verifying", 4096)]
+    assert model.succeeded and model.finished and model.bytes_downloaded == 2048
+    assert (tmp_path / "srv" / "steamapps" / "appmanifest_740.acf").exists()
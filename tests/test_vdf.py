@@ -0,0 +1,52 @@
+import pytest
+
+import Vdf
+
+MANIFEST = "\n".join([
+    '// Written by Steam',
+    '"AppState"',
+    '{',
+    '\t"appid"\t\t"896660"',
+    '\t"name"\t\t"Valheim \\"Dedicated\\" Server\\\\Beta"',
+    '\t"StateFlags"\t\t"4"',
+    '\t"UserConfig"',
+    '\t{',
+    '\t\t"language"\t\t"english"   // trailing comment',
+    '\t\t"note"\t\t"tab\\there\\nnewline"',
+    '\t}',
+    '\t"InstalledDepots"',
+    '\t{',
+    '\t\t"896661" { "manifest" "123" "size" "456" }',
+    '\t}',
+    '\tunquoted\tvalue [$WIN32]',
+    '}',
+])
+
+
+def test_loads_nested_sections_escapes_and_comments():
+    state = Vdf.loads(MANIFEST)["AppState"]
+    assert state["appid"] == "896660"
+    assert state["name"] == 'Valheim "Dedicated" Server\\Beta'
+    assert state["UserConfig"] == {"language": "english", "note": "tab\there\nnewline"}
+    assert state["InstalledDepots"]["896661"] == {"manifest": "123", "size": "456"}
+    assert state["unquoted"] == "value"
+    assert list(state) == ["appid", "name", "StateFlags", "UserConfig", "InstalledDepots", "unquoted"]
+
+
+def test_dumps_round_trips():
+    data = Vdf.loads(MANIFEST)
+    assert Vdf.loads(Vdf.dumps(data)) == data
+
+
+@pytest.mark.parametrize("text", ['"a" { "b" "c"', '"a" "b" }', '"a" "unterminated', '{ "a" "b" }', '"a"'])
+def test_malformed_documents_raise(text):
+    with pytest.raises(Vdf.VdfError):
+        Vdf.loads(text)
+
+
+def test_get_is_case_insensitive():
+    section = {"appID": "740", "StateFlags": "4"}
+    assert Vdf.get(section, "appid") == "740"
+    assert Vdf.get(section, "stateflags") == "4"
+    assert Vdf.get(section, "StateFlags") == "4"
+    assert Vdf.get(section, "buildid", "none") == "none"
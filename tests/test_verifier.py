@@ -0,0 +1,121 @@
+import json
+import os
+
+import Verifier
+import Vdf
+from FileHashes import hash_file
+from ServerManager import ServerManager
+
+
+def write(root, relative, data=b"data"):
+    path = os.path.join(root, *relative.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def write_manifest(install_path, appid, buildid):
+    write(install_path, f"steamapps/appmanifest_{appid}.acf",
+          Vdf.dumps({"AppState": {"appid": appid, "StateFlags": "4", "buildid": buildid}}).encode())
+
+
+def install(root, buildid="1000"):
+    write_manifest(root, "740", buildid)
+    write(root, "srcds_linux", b"binary" * 1000)
+    write(root, "csgo/pak01_dir.vpk", b"vpk" * 5000)
+    write(root, "csgo/maps/de_dust2.bsp", b"bsp" * 2000)
+    return Verifier.record(root, "740", workers=1)
+
+
+def test_record_writes_the_manifest_beside_the_appmanifest(tmp_path):
+    root = str(tmp_path)
+    assert install(root) == 3
+    assert Verifier.manifest_path(root, "740") == os.path.join(root, "steamapps", "servermanager_hashes_740.json")
+    with open(Verifier.manifest_path(root, "740"), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert (manifest["appid"], manifest["buildid"]) == ("740", "1000")
+    assert sorted(manifest["files"]) == ["csgo/maps/de_dust2.bsp", "csgo/pak01_dir.vpk", "srcds_linux"]
+    assert manifest["files"]["srcds_linux"][2] == hash_file(os.path.join(root, "srcds_linux"))
+
+    write(root, "srcds_linux", b"patched" * 1000)
+    assert Verifier.record(root, "740", workers=1) == 1  # Only the rewritten file is hashed again
+
+
+def test_an_untouched_install_is_clean_without_hashing(tmp_path):
+    root = str(tmp_path)
+    install(root)
+    write(root, "csgo/cfg/server.cfg", b"hostname test")  # Added files are not drift
+    report = Verifier.verify(root, "740", workers=1)
+    assert report == {"clean": True, "reason": None, "checked": 3, "hashed": 0, "missing": [], "modified": []}
+    assert Verifier.verify(root, "740", workers=1, deep=True)["hashed"] == 3
+
+
+def test_drift_is_reported(tmp_path):
+    root = str(tmp_path)
+    install(root)
+    os.remove(os.path.join(root, "csgo", "maps", "de_dust2.bsp"))
+    write(root, "srcds_linux", b"binary" * 999)  # Size changed: modified without hashing
+    path = write(root, "csgo/pak01_dir.vpk", b"VPK" * 5000)  # Same size, new content
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    report = Verifier.verify(root, "740", workers=1)
+    assert not report["clean"] and report["hashed"] == 1
+    assert report["missing"] == ["csgo/maps/de_dust2.bsp"]
+    assert sorted(report["modified"]) == ["csgo/pak01_dir.vpk", "srcds_linux"]
+    assert report["reason"] == "2 modified and 1 missing files"
+
+
+def test_deep_verify_catches_content_changed_behind_the_same_mtime(tmp_path):
+    root = str(tmp_path)
+    install(root)
+    path = os.path.join(root, "srcds_linux")
+    stat = os.stat(path)
+    write(root, "srcds_linux", b"BINARY" * 1000)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert Verifier.verify(root, "740", workers=1)["clean"]
+    assert Verifier.verify(root, "740", workers=1, deep=True)["modified"] == ["srcds_linux"]
+
+
+def test_a_touched_but_unchanged_file_refreshes_the_manifest(tmp_path):
+    root = str(tmp_path)
+    install(root)
+    path = os.path.join(root, "srcds_linux")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert Verifier.verify(root, "740", workers=1)["hashed"] == 1
+    assert Verifier.verify(root, "740", workers=1)["hashed"] == 0
+
+
+def test_a_manifest_for_another_build_is_not_trusted(tmp_path):
+    root = str(tmp_path)
+    assert Verifier.verify(root, "740")["reason"] == "no hash manifest has been recorded"
+    install(root)
+    write_manifest(root, "740", "10001")  # A different size, so the cached appmanifest is re-read
+    report = Verifier.verify(root, "740", workers=1)
+    assert (report["clean"], report["reason"]) == (False, "the hash manifest is for build 1000")
+
+
+def test_validate_only_runs_on_drift(fake_steamcmd, tmp_path):
+    fake_steamcmd("--buildid", "1000")
+    clean, outdated, drifted, unrecorded = (str(tmp_path / name) for name in ("a", "b", "c", "d"))
+    for root in (clean, outdated, drifted):
+        install(root)
+    write_manifest(outdated, "740", "999")
+    Verifier.record(outdated, "740", workers=1)
+    os.remove(os.path.join(drifted, "srcds_linux"))
+    write_manifest(unrecorded, "740", "1000")
+    targets = [("740", clean), ("740", outdated), ("740", drifted), ("740", unrecorded)]
+    assert ServerManager.plan_actions(targets, validate=True) == ["skip", "update", "validate", "validate"]
+    # Without validate, only the build IDs count
+    assert ServerManager.plan_actions(targets) == ["skip", "update", "skip", "skip"]
+
+
+def test_a_successful_run_records_the_manifest(fake_steamcmd, tmp_path):
+    fake_steamcmd("--buildid", "1001")
+    root = str(tmp_path)
+    install(root)
+    action, returncode, _ = ServerManager.run_job("740", root, validate=True)
+    assert (action, returncode) == ("update", 0)
+    assert Verifier.load_manifest(root, "740")["buildid"] == "1001"
+    assert ServerManager.plan_actions([("740", root)], validate=True) == ["skip"]
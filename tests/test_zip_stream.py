@@ -0,0 +1,173 @@
+import http.server
+import io
+import os
+import threading
+import zipfile
+import zlib
+
+import pytest
+
+from SteamCmdManager import SteamCmdManager
+from ZipStream import UnsupportedZip, ZipStreamExtractor
+
+FILES = {"steamcmd.sh": b"#!/bin/sh\nexec linux32/steamcmd \"$@\"\n", "linux32/steamcmd": os.urandom(64 * 1024),
+         "linux32/crashhandler.so": b"\0" * 100000}
+
+
+class Unseekable(io.RawIOBase):
+    """A write-only stream, which makes zipfile write data descriptors the way streaming zippers do."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.data += data
+        return len(data)
+
+
+def make_zip(compression=zipfile.ZIP_DEFLATED, seekable=True):
+    if seekable:
+        out = io.BytesIO()
+    else:
+        out = Unseekable()
+    with zipfile.ZipFile(out, 'w', compression) as archive:
+        archive.writestr("linux32/", b"")
+        for name, data in FILES.items():
+            archive.writestr(name, data)
+    return out.getvalue() if seekable else bytes(out.data)
+
+
+def extracted(root):
+    found = {}
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            with open(path, 'rb') as f:
+                found[os.path.relpath(path, root).replace(os.sep, '/')] = f.read()
+    return found
+
+
+@pytest.mark.parametrize("seekable", [True, False])
+def test_extracts_while_fed_in_small_pieces(tmp_path, seekable):
+    data = make_zip(seekable=seekable)
+    extractor = ZipStreamExtractor(str(tmp_path))
+    for start in range(0, len(data), 1000):
+        extractor.feed(data[start:start + 1000])
+    extractor.close()
+    assert extracted(str(tmp_path)) == FILES
+    assert extractor.files == list(FILES)
+
+
+def test_stored_entries_with_a_data_descriptor_cannot_stream(tmp_path):
+    with pytest.raises(UnsupportedZip):
+        ZipStreamExtractor(str(tmp_path)).feed(make_zip(zipfile.ZIP_STORED, seekable=False))
+
+
+def test_a_corrupt_entry_fails_its_crc(tmp_path):
+    data = bytearray(make_zip(zipfile.ZIP_STORED))
+    position = data.index(FILES["linux32/steamcmd"][:32])
+    data[position] ^= 0xFF
+    with pytest.raises((UnsupportedZip, zlib.error)):
+        ZipStreamExtractor(str(tmp_path)).feed(bytes(data))
+
+
+def test_entries_outside_the_target_are_refused(tmp_path):
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w') as archive:
+        archive.writestr("../escape.txt", b"x")
+    with pytest.raises(UnsupportedZip):
+        ZipStreamExtractor(str(tmp_path / "target")).feed(out.getvalue())
+    assert not (tmp_path / "escape.txt").exists()
+
+
+@pytest.fixture
+def steamcmd_server(tmp_path, monkeypatch):
+    """Serve an archive as the SteamCMD download; set `.body` to choose which."""
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_HEAD(self):
+            self._respond(body=False)
+
+        def do_GET(self):
+            self._respond(body=True)
+
+        def _respond(self, body):
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(served.body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(served.body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    served = type("Served", (), {"body": make_zip()})()
+    monkeypatch.setattr(SteamCmdManager, "STEAMCMD_URL", f"http://127.0.0.1:{server.server_port}/steamcmd.zip")
+    monkeypatch.setattr(SteamCmdManager, "INSTALL_DIR", str(tmp_path / "steamcmd"))
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path / "tmp"))
+    os.makedirs(tmp_path / "tmp")
+    yield served
+    server.shutdown()
+    server.server_close()
+
+
+def leftovers(tmp_path):
+    return sorted(name for name in os.listdir(tmp_path) if name != "steamcmd") + os.listdir(tmp_path / "tmp")
+
+
+def test_install_extracts_while_downloading(steamcmd_server, tmp_path, monkeypatch):
+    def no_second_pass(*args, **kwargs):
+        raise AssertionError("the archive was extracted from disk")
+
+    monkeypatch.setattr("zipfile.ZipFile", no_second_pass)
+    SteamCmdManager._download_and_extract_steamcmd()
+    assert extracted(str(tmp_path / "steamcmd")) == FILES
+    assert leftovers(tmp_path) == ["tmp"]
+
+
+def test_install_falls_back_to_extracting_from_disk(steamcmd_server, tmp_path):
+    steamcmd_server.body = make_zip(zipfile.ZIP_STORED, seekable=False)
+    SteamCmdManager._download_and_extract_steamcmd()
+    assert extracted(str(tmp_path / "steamcmd")) == FILES
+    assert leftovers(tmp_path) == ["tmp"]
+
+
+def test_reinstall_swaps_the_directory_and_keeps_other_files(steamcmd_server, tmp_path):
+    install_dir = tmp_path / "steamcmd"
+    (install_dir / "linux32").mkdir(parents=True)
+    (install_dir / "steamcmd.sh").write_bytes(b"outdated")
+    (install_dir / "package").mkdir()
+    (install_dir / "package" / "steam_cmd_linux.installed").write_bytes(b"self-update")
+    old_inode = os.stat(install_dir).st_ino
+    SteamCmdManager._download_and_extract_steamcmd()
+    assert os.stat(install_dir).st_ino != old_inode  # Swapped as a whole, not patched file by file
+    assert extracted(str(install_dir)) == dict(FILES, **{"package/steam_cmd_linux.installed": b"self-update"})
+    assert leftovers(tmp_path) == ["tmp"]
+
+
+def test_a_failed_download_leaves_the_install_alone(steamcmd_server, tmp_path):
+    install_dir = tmp_path / "steamcmd"
+    install_dir.mkdir()
+    (install_dir / "steamcmd.sh").write_bytes(b"working")
+    steamcmd_server.body = make_zip()[:5000]  # Ends in the middle of an entry
+    with pytest.raises(zipfile.BadZipFile):
+        SteamCmdManager._download_and_extract_steamcmd()
+    assert extracted(str(install_dir)) == {"steamcmd.sh": b"working"}
+    assert leftovers(tmp_path) == ["tmp"]
+
+
+def test_an_install_interrupted_mid_swap_is_restored(tmp_path):
+    install_dir, staging_dir = str(tmp_path / "steamcmd"), str(tmp_path / "staging")
+    os.makedirs(install_dir + ".old")
+    with open(os.path.join(install_dir + ".old", "kept.txt"), 'wb') as f:
+        f.write(b"old")
+    os.makedirs(staging_dir)
+    with open(os.path.join(staging_dir, "steamcmd.sh"), 'wb') as f:
+        f.write(b"new")
+    SteamCmdManager._move_into_place(staging_dir, install_dir)
+    assert extracted(install_dir) == {"kept.txt": b"old", "steamcmd.sh": b"new"}
+    assert sorted(os.listdir(tmp_path)) == ["steamcmd"]